@@ -0,0 +1,165 @@
+"""
+This script benchmarks the data preparation steps on synthetic daily restriction
+datasets of increasing size, so that their scaling can be checked and tracked.
+
+Functions:
+    - synthetic_daily(): Builds a daily dataset with random restriction flags.
+    - bench_active_counts(): Times DataPreparation.active_counts() per dataset size.
+    - bench_timeline(): Times the label layout and both modes of the restriction
+      timeline plot on synthetic summaries with many events.
+    - bench_render(): Renders the figures of many regions sequentially and in a
+      process pool, reporting the time per figure.
+    - main(): Parses the command line and runs the benchmarks.
+
+Usage:
+    python -m coursework1.data_exploration.benchmark --rows 100000 1000000 4000000
+    python -m coursework1.data_exploration.benchmark --render 50 --workers 4
+    python -m coursework1.data_exploration.benchmark --timeline 1000 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Optional
+import numpy as np
+import pandas as pd
+from .main import DataLoader, DataPreparation
+from .render import build_jobs, render_all
+
+DATASETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "datasets")
+
+RESTRICTIONS = [
+    'schools_closed', 'pubs_closed', 'shops_closed', 'eating_places_closed',
+    'stay_at_home', 'household_mixing_indoors_banned', 'wfh', 'rule_of_6_indoors',
+    'curfew', 'eat_out_to_help_out'
+]
+
+def synthetic_daily(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a daily dataset with the layout of the real one and random flags.
+
+    Parameters:
+        rows (int): Number of rows.
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        pd.DataFrame: DataFrame with a 'date' column and one column per restriction.
+    """
+    rng = np.random.default_rng(seed)
+    flags = rng.integers(0, 2, size=(rows, len(RESTRICTIONS)), dtype=np.uint8)
+    daily = pd.DataFrame(flags, columns=RESTRICTIONS)
+    # cycle through ~50 years of days so any number of rows has valid dates
+    days = np.arange(rows) % 18_000
+    daily.insert(0, 'date', (np.datetime64('2000-01-01') + days).astype(str))
+    return daily
+
+def bench_active_counts(sizes: list[int], repeat: int = 3) -> dict[int, float]:
+    """
+    Times active_counts() with its rolling and cumulative variants for each size,
+    reporting the time per row so that linear scaling shows as a flat column.
+
+    Parameters:
+        sizes (list[int]): Numbers of rows to benchmark.
+        repeat (int): Number of runs per size, the fastest being reported.
+
+    Returns:
+        dict[int, float]: Seconds taken for each size.
+    """
+    timings = {}
+    for rows in sizes:
+        daily = synthetic_daily(rows)
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            DataPreparation.active_counts(daily, window=7, cumulative=True)
+            best = min(best, time.perf_counter() - start)
+        timings[rows] = best
+        print(f"active_counts: {rows} rows in {best:.3f}s ({best / rows * 1e9:.0f} ns/row)")
+    return timings
+
+def bench_timeline(sizes: list[int], seed: int = 0) -> dict[int, dict[str, float]]:
+    """
+    Times the label layout and the restriction timeline plot, with one annotation per
+    event and with the labels drawn as a single collection, on synthetic summaries.
+
+    Parameters:
+        sizes (list[int]): Numbers of events to benchmark.
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        dict[int, dict[str, float]]: Seconds taken by each step for each size.
+    """
+    rng = np.random.default_rng(seed)
+    timings = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for events in sizes:
+            summary = pd.DataFrame({
+                'date': (np.datetime64('2020-03-01') + np.sort(rng.integers(0, 700, events)))
+                        .astype(str),
+                'restriction': rng.choice(RESTRICTIONS, events),
+            })
+            prep = DataPreparation(None, None, summary)
+            start = time.perf_counter()
+            data = prep.restriction_timeline_data()
+            timings[events] = {'layout': time.perf_counter() - start}
+            for mode, fast in (('annotate', False), ('collection', True)):
+                start = time.perf_counter()
+                prep.plot_restriction_timeline(data, folder, fast=fast)
+                timings[events][mode] = time.perf_counter() - start
+            print(f"timeline: {events} events on {data['level'].nunique()} levels, "
+                  + ", ".join(f"{step} {secs:.3f}s" for step, secs in timings[events].items()))
+    return timings
+
+def bench_render(regions: int, max_workers: Optional[int] = None) -> dict[str, float]:
+    """
+    Renders every figure for a number of regions, all holding the bundled datasets,
+    first in this process and then in a process pool.
+
+    Parameters:
+        regions (int): Number of regions to render.
+        max_workers (int): Number of worker processes, defaults to the number of CPUs.
+
+    Returns:
+        dict[str, float]: Seconds taken by the sequential and parallel runs.
+    """
+    datasets = DataLoader(
+        os.path.join(DATASETS, "restrictions_daily.csv"),
+        os.path.join(DATASETS, "restrictions_weekly.csv"),
+        os.path.join(DATASETS, "restrictions_summary.csv")
+        ).load_data()
+    timings = {}
+    with tempfile.TemporaryDirectory() as folder:
+        jobs = [job for i in range(regions)
+                for job in build_jobs(f"region_{i}", *datasets, folder)]
+        for mode, parallel in (('sequential', False), ('parallel', True)):
+            start = time.perf_counter()
+            results = render_all(jobs, max_workers=max_workers, parallel=parallel)
+            timings[mode] = time.perf_counter() - start
+            per_kind = {}
+            for res in results:
+                per_kind.setdefault(res.kind, []).append(res.seconds)
+            detail = ", ".join(f"{kind} {sum(s) / len(s):.3f}s" for kind, s in per_kind.items())
+            print(f"render {mode}: {len(jobs)} figures in {timings[mode]:.2f}s ({detail})")
+    return timings
+
+def main() -> None:
+    """Runs the benchmarks on synthetic datasets"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 4_000_000],
+                        help="numbers of rows in the synthetic daily datasets")
+    parser.add_argument('--render', type=int, metavar='REGIONS',
+                        help="benchmark rendering the figures of this many regions instead")
+    parser.add_argument('--timeline', type=int, nargs='+', metavar='EVENTS',
+                        help="benchmark the restriction timeline with these numbers of events instead")
+    parser.add_argument('--workers', type=int, help="number of worker processes for --render")
+    args = parser.parse_args()
+    if args.render:
+        bench_render(args.render, args.workers)
+        return
+    if args.timeline:
+        bench_timeline(args.timeline)
+        return
+    bench_active_counts(args.rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+This module provides the ArtifactCache class, a content-addressed cache for the
+prepared CSV files and figures, so that they are only regenerated when the datasets
+they are built from, or the parameters they are built with, have changed.
+
+Classes:
+    - ArtifactCache: Stores copies of generated files under a key derived from the
+      hashes of their input files and their parameters, restores them on later runs
+      and evicts the least recently used entries beyond a size limit.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Callable, Iterable, Optional
+from .utils import atomic_copy, atomic_write_text
+
+class ArtifactCache:
+    """
+    Content-addressed cache of generated files.
+
+    Each entry holds copies of the files built by one step under a key hashing the
+    name of the step, the contents of its input files and its parameters. A manifest
+    records the entries with their size and last use, the hashes of the input files
+    (reused while a file's size and modification time are unchanged) and the entry
+    each output file was last written from, so up to date outputs are not even copied.
+
+    Attributes:
+        folder (str): Folder holding the manifest and the cached files.
+        max_bytes (int): Total size of the cached files above which entries are evicted.
+        force (bool): Whether to rebuild every step, ignoring the cached entries.
+        hits (int): Number of steps served from the cache.
+        misses (int): Number of steps that were built.
+    """
+    MANIFEST = "manifest.json"
+
+    def __init__(self, folder: str, max_bytes: int = 256 * 2**20, force: bool = False) -> None:
+        """
+        Initializes the ArtifactCache, loading its manifest if the folder holds one.
+
+        Parameters:
+            folder (str): Folder holding the manifest and the cached files.
+            max_bytes (int): Total size of the cached files above which entries are evicted.
+            force (bool): Whether to rebuild every step, ignoring the cached entries.
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+        self._evicted = set()
+        os.makedirs(os.path.join(folder, "objects"), exist_ok=True)
+        try:
+            with open(os.path.join(folder, self.MANIFEST), encoding='utf-8') as file:
+                self._manifest = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._manifest = {}
+        for section in ("entries", "inputs", "outputs"):
+            self._manifest.setdefault(section, {})
+
+    @staticmethod
+    def _stat(path: str) -> list[int]:
+        """Size and modification time of a file, identifying its current version."""
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def file_digest(self, path: str) -> str:
+        """
+        Hashes the contents of a file, reusing the recorded hash while the file's size
+        and modification time are unchanged.
+
+        Parameters:
+            path (str): Path of the file.
+
+        Returns:
+            str: SHA-256 hex digest of the file.
+        """
+        path = os.path.abspath(path)
+        stat = self._stat(path)
+        known = self._manifest["inputs"].get(path)
+        if known and known[:2] == stat:
+            return known[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(2**20), b""):
+                digest.update(block)
+        self._manifest["inputs"][path] = stat + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def key(self, name: str, inputs: Iterable[str], params: Optional[dict] = None) -> str:
+        """
+        Derives the key of a step from its name, input files and parameters.
+
+        Parameters:
+            name (str): Name of the step.
+            inputs (iterable of str): Paths of the files the step reads.
+            params (dict): Parameters the outputs depend on, they must be JSON serializable
+                or have a stable string representation.
+
+        Returns:
+            str: SHA-256 hex digest identifying the step's outputs.
+        """
+        content = {
+            "name": name,
+            "inputs": [self.file_digest(path) for path in inputs],
+            "params": params or {},
+        }
+        return hashlib.sha256(
+            json.dumps(content, sort_keys=True, default=str).encode('utf-8')
+            ).hexdigest()
+
+    def _blob(self, key: str, index: int, output: str) -> str:
+        """Path of the cached copy of an output."""
+        return os.path.join(self.folder, "objects", key, f"{index}-{os.path.basename(output)}")
+
+    def _restore(self, key: str, outputs: list[str]) -> bool:
+        """
+        Writes the cached copies of an entry to the outputs that are not up to date.
+
+        Returns:
+            bool: Whether the entry was found with all of its files.
+        """
+        entry = self._manifest["entries"].get(key)
+        blobs = [self._blob(key, i, output) for i, output in enumerate(outputs)]
+        if entry is None or not all(os.path.exists(blob) for blob in blobs):
+            return False
+        for output, blob in zip(outputs, blobs):
+            path = os.path.abspath(output)
+            current = self._stat(path) if os.path.exists(path) else None
+            if current is None or self._manifest["outputs"].get(path) != [key] + current:
+                atomic_copy(blob, path)
+                self._manifest["outputs"][path] = [key] + self._stat(path)
+        entry["used"] = time.time()
+        return True
+
+    def _store(self, key: str, outputs: list[str]) -> None:
+        """Copies freshly built outputs into a new entry."""
+        size = 0
+        for i, output in enumerate(outputs):
+            atomic_copy(output, self._blob(key, i, output))
+            path = os.path.abspath(output)
+            self._manifest["outputs"][path] = [key] + self._stat(path)
+            size += os.path.getsize(output)
+        self._manifest["entries"][key] = {"size": size, "used": time.time()}
+
+    def run(self, name: str, inputs: Iterable[str], outputs: list[str],
+            build: Callable[[], Any], params: Optional[dict] = None) -> bool:
+        """
+        Makes sure the outputs of a step are up to date, building them only if no entry
+        of the cache matches the step's inputs and parameters.
+
+        Parameters:
+            name (str): Name of the step.
+            inputs (iterable of str): Paths of the files the step reads.
+            outputs (list of str): Paths of the files the step writes.
+            build (callable): Function writing the outputs, called without arguments.
+            params (dict): Parameters the outputs depend on.
+
+        Returns:
+            bool: Whether the outputs were served from the cache.
+
+        Raises:
+            FileNotFoundError: If build did not write every output.
+        """
+        key = self.key(name, inputs, params)
+        if not self.force and self._restore(key, outputs):
+            self.hits += 1
+            self.save()
+            return True
+        build()
+        self._store(key, outputs)
+        self.misses += 1
+        self.evict(keep=key)
+        self.save()
+        return False
+
+    def evict(self, keep: Optional[str] = None) -> list[str]:
+        """
+        Removes the least recently used entries until the cached files fit in max_bytes.
+
+        Parameters:
+            keep (str): Key of an entry never to evict, such as the one just stored.
+
+        Returns:
+            list[str]: Keys of the evicted entries.
+        """
+        entries = self._manifest["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+        evicted = []
+        for key in sorted(entries, key=lambda k: entries[k]["used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= entries.pop(key)["size"]
+            self._evicted.add(key)
+            shutil.rmtree(os.path.join(self.folder, "objects", key), ignore_errors=True)
+            evicted.append(key)
+        return evicted
+
+    def size(self) -> int:
+        """Total size in bytes of the cached files."""
+        return sum(entry["size"] for entry in self._manifest["entries"].values())
+
+    def save(self) -> None:
+        """
+        Writes the manifest, replacing the previous one atomically. Entries recorded on disk
+        by runs sharing the cache since it was loaded are merged in rather than dropped.
+        """
+        path = os.path.join(self.folder, self.MANIFEST)
+        try:
+            with open(path, encoding='utf-8') as file:
+                on_disk = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            on_disk = {}
+        for section in ("entries", "inputs", "outputs"):
+            merged = on_disk.get(section, {})
+            merged.update(self._manifest[section])
+            if section == "entries":
+                # keep the entries of other runs only while their files were not evicted
+                merged = {
+                    key: entry for key, entry in merged.items()
+                    if key in self._manifest[section] or key not in self._evicted
+                }
+            self._manifest[section] = merged
+        atomic_write_text(path, json.dumps(self._manifest))
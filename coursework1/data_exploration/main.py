@@ -4,24 +4,39 @@ main.py
 This script loads, explores, and prepares COVID-19 restriction datasets for analysis.
 It uses the following classes:
 - DataLoader: Loads daily, weekly, and summary data from CSV files.
-- DataExploration: Provides functions for logging data shapes, types, and column names.
+- DataExploration: Provides functions for logging data shapes, types, and column names,
+  and for writing a profiling report of the three datasets.
 - DataPreparation: Generates visualizations, including a cumulative restriction timeline,
   a bar chart for days restrictions were enforced, and a restriction timeline plot.
+  Figures are drawn headlessly on the Agg canvas, without pyplot's global state.
 
 Functions:
-- main(): Executes the data loading, exploration, and preparation workflow.
+- main(): Executes the data loading, exploration, and preparation workflow. Prepared
+  files are only regenerated when their dataset changed, unless --force is given.
 
 Usage:
-Run this script as a standalone program to generate exploration logs and visualizations.
+Run this script as a standalone program to generate exploration logs and visualizations:
+python -m coursework1.data_exploration.main [--force] [--cache-size MB] [--chunksize ROWS]
 """
+import argparse
 import json
+from typing import Any, Iterator, Optional, Union
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from utils import save_to_csv
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PathCollection
+from matplotlib.figure import Figure
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+from ..database_creation.frames import read_columns, read_data, restriction_dtypes
+from .cache import ArtifactCache
+from .profiler import profile_datasets, write_report
+from .utils import ArtifactWriter, atomic_path, save_to_csv
 
 class DataLoader:
     """
-    Loads data from csv to pd.DataFrame
+    Loads data from csv, Parquet or Arrow IPC files to pd.DataFrame
 
     Attributes:
         path_daily (str): Path to the daily data csv file.
@@ -41,17 +56,45 @@ class DataLoader:
         self.path_weekly = path_weekly
         self.path_summary = path_summary
 
-    def load_data(self) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    @staticmethod
+    def compact_dtypes(path: str) -> dict[str, str]:
         """
-        Loads the daily, weekly, and summary datasets from CSV files.
+        Chooses compact data types for the columns of a restriction dataset:
+        uint8 restriction flags, categorical restriction and source names and
+        string dates.
+
+        Parameters:
+        path (str): Path to the dataset CSV, Parquet or Arrow IPC file.
 
         Returns:
-        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-        DataFrames for daily, weekly, and summary datasets.
+        dict[str, str]: Dictionary with column names as keys and data types as values.
+        """
+        return restriction_dtypes(read_columns(path))
+
+    def load_data(self, compact: bool = False, chunksize: Optional[int] = None
+                  ) -> tuple[Union[pd.DataFrame, Iterator[pd.DataFrame]], ...]:
         """
-        daily = pd.read_csv(self.path_daily)
-        weekly = pd.read_csv(self.path_weekly)
-        summary = pd.read_csv(self.path_summary)
+        Loads the daily, weekly, and summary datasets from CSV files, or from Parquet or
+        Arrow IPC files written with utils.save_data, chosen by file extension.
+
+        Parameters:
+        compact (bool): Whether to read the datasets with compact_dtypes().
+        chunksize (int): Number of rows per chunk. When given, each dataset is returned
+        as an iterator over chunks read with compact_dtypes(), so that files larger
+        than memory can be processed.
+
+        Returns:
+        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        DataFrames for daily, weekly, and summary datasets, or iterators over their
+        chunks when chunksize is given.
+        """
+        compact = compact or chunksize is not None
+        paths = (self.path_daily, self.path_weekly, self.path_summary)
+        daily, weekly, summary = (
+            read_data(path, dtype=self.compact_dtypes(path) if compact else None,
+                      chunksize=chunksize)
+            for path in paths
+        )
         return daily, weekly, summary
 
 class DataExploration:
@@ -62,8 +105,15 @@ class DataExploration:
         daily (pd.DataFrame): Daily DataFrame.
         weekly (pd.DataFrame): Weekly DataFrame.
         summary (pd.DataFrame): Summary DataFrame.
+        writer (ArtifactWriter): Writer buffering the summaries written to output files.
+
+    Summaries are written through an ArtifactWriter: an output file holds the summaries
+    written to it by this instance, so re-runs replace it instead of growing it. Without
+    a writer of the caller's, each summary is committed as soon as it is written; with
+    one, the caller commits them all at once.
     """
-    def __init__(self, daily: pd.DataFrame, weekly: pd.DataFrame, summary: pd.DataFrame) -> None:
+    def __init__(self, daily: pd.DataFrame, weekly: pd.DataFrame, summary: pd.DataFrame,
+                 writer: Optional[ArtifactWriter] = None) -> None:
         """
         Initializes DataExploration with daily, weekly, and summary data.
 
@@ -71,10 +121,25 @@ class DataExploration:
         daily (pd.DataFrame): DataFrame containing daily data.
         weekly (pd.DataFrame): DataFrame containing weekly data.
         summary (pd.DataFrame): DataFrame containing summary data.
+        writer (ArtifactWriter): Writer to buffer the summaries in, committed by the caller.
         """
         self.daily = daily
         self.weekly = weekly
         self.summary = summary.dropna()
+        self.writer = writer if writer is not None else ArtifactWriter()
+        self._commit = writer is None
+
+    def _write(self, output_file: str, text: str) -> None:
+        """
+        Appends a summary to the buffered content of an output file.
+
+        Parameters:
+        output_file (str): File path where the summary will be saved.
+        text (str): The summary.
+        """
+        self.writer.append(output_file, text)
+        if self._commit:
+            self.writer.commit()
 
     @staticmethod
     def get_col_names(data: pd.DataFrame) -> list[str]:
@@ -117,7 +182,7 @@ class DataExploration:
         result = {}
         for col in data.columns:
             if pd.api.types.is_integer_dtype(data[col]):
-                result[col] = f"{min(data[col])}-{max(data[col])}"
+                result[col] = f"{data[col].min()}-{data[col].max()}"
             else:
                 result[col] = None
         return result
@@ -129,12 +194,14 @@ class DataExploration:
         Parameters:
         output_file (str): File path where data shapes will be saved.
         """
-        with open(output_file, 'a', encoding='utf-8') as file:
-            file.write("DATA SHAPES\n")
-            file.write(f"daily data shape: {self.daily.shape}\n")
-            file.write(f"weekly data shape: {self.weekly.shape}\n")
-            file.write(f"summary data shape: {self.summary.shape}\n")
-            file.write("\n")
+        self._write(
+            output_file,
+            "DATA SHAPES\n"
+            f"daily data shape: {self.daily.shape}\n"
+            f"weekly data shape: {self.weekly.shape}\n"
+            f"summary data shape: {self.summary.shape}\n"
+            "\n"
+            )
 
     def get_data_types(self, output_file: str) -> None:
         """
@@ -143,18 +210,14 @@ class DataExploration:
         Parameters:
         output_file (str): File path where data types will be saved.
         """
-        with open(output_file, 'a', encoding='utf-8') as file:
-            file.write("DATA TYPES\n")
-            file.write(
-                f"daily data types: {json.dumps(self.get_types(self.daily), indent=2)}\n"
-                )
-            file.write(
-                f"weekly data types: {json.dumps(self.get_types(self.weekly), indent=2)}\n"
-                )
-            file.write(
-                f"summary data types: {json.dumps(self.get_types(self.summary), indent=2)}\n"
-                )
-            file.write("\n")
+        self._write(
+            output_file,
+            "DATA TYPES\n"
+            f"daily data types: {json.dumps(self.get_types(self.daily), indent=2)}\n"
+            f"weekly data types: {json.dumps(self.get_types(self.weekly), indent=2)}\n"
+            f"summary data types: {json.dumps(self.get_types(self.summary), indent=2)}\n"
+            "\n"
+            )
 
     def get_columns(self, output_file: str) -> None:
         """
@@ -163,18 +226,32 @@ class DataExploration:
         Parameters:
         output_file (str): File path where column names will be saved.
         """
-        with open(output_file, 'a', encoding='utf-8') as file:
-            file.write("COLUMNS\n")
-            file.write(
-                f"daily columns: {json.dumps(self.get_col_names(self.daily), indent=2)}\n"
-                )
-            file.write(
-                f"weekly columns: {json.dumps(self.get_col_names(self.weekly), indent=2)}\n"
-                )
-            file.write(
-                f"summary columns: {json.dumps(self.get_col_names(self.summary), indent=2)}\n"
-                )
-            file.write("\n")
+        self._write(
+            output_file,
+            "COLUMNS\n"
+            f"daily columns: {json.dumps(self.get_col_names(self.daily), indent=2)}\n"
+            f"weekly columns: {json.dumps(self.get_col_names(self.weekly), indent=2)}\n"
+            f"summary columns: {json.dumps(self.get_col_names(self.summary), indent=2)}\n"
+            "\n"
+            )
+
+    def write_profile(self, json_path: str, text_path: str) -> dict:
+        """
+        Profiles the daily, weekly and summary data in a single scan and writes the
+        report as JSON and as text, see profiler.profile_datasets.
+
+        Parameters:
+        json_path (str): File path where the JSON report will be saved.
+        text_path (str): File path where the text report will be saved.
+
+        Returns:
+        dict: The report, with dataset names as keys.
+        """
+        report = profile_datasets(
+            {'daily': self.daily, 'weekly': self.weekly, 'summary': self.summary}
+            )
+        write_report(report, json_path, text_path)
+        return report
 
 class DataPreparation:
     """
@@ -198,86 +275,216 @@ class DataPreparation:
         self.weekly = weekly
         self.summary = summary.dropna()
 
+    @staticmethod
+    def flag_columns(data: pd.DataFrame, date_col: str = 'date') -> list[str]:
+        """
+        Finds the restriction flag columns of a dataset.
+
+        Parameters:
+        data (pd.DataFrame): DataFrame with a date column and one flag column per restriction.
+        date_col (str): Name of the date column.
+
+        Returns:
+        list[str]: Names of the integer or boolean columns other than the date column.
+        """
+        return [
+            col for col in data.columns
+            if col != date_col and (pd.api.types.is_integer_dtype(data[col])
+                                    or pd.api.types.is_bool_dtype(data[col]))
+        ]
+
+    @staticmethod
+    def restriction_stats(data: pd.DataFrame, start: Optional[str] = None,
+                          end: Optional[str] = None, date_col: str = 'date') -> pd.DataFrame:
+        """
+        Computes per-restriction statistics over every 0/1 flag column of a dataset in a
+        single vectorized pass over its flag matrix.
+
+        Parameters:
+        data (pd.DataFrame): DataFrame with a date column and one flag column per restriction,
+        in date order.
+        start (str): First date to include, defaults to the first date in data.
+        end (str): Last date to include, defaults to the last date in data.
+        date_col (str): Name of the date column.
+
+        Returns:
+        pd.DataFrame: DataFrame indexed by restriction with columns:
+            'days' (number of rows in place),
+            'longest_streak' (longest run of consecutive rows in place),
+            'transitions' (number of changes between in place and lifted),
+            'first_active' and 'last_active' (dates, NaT if never in place).
+        """
+        dates = pd.to_datetime(data[date_col])
+        keep = np.ones(len(data), dtype=bool)
+        if start is not None:
+            keep &= (dates >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            keep &= (dates <= pd.Timestamp(end)).to_numpy()
+        cols = DataPreparation.flag_columns(data, date_col)
+        flags = data.loc[keep, cols].to_numpy() == 1
+        dates = dates[keep].to_numpy()
+        n_rows, n_cols = flags.shape
+
+        # runs of ones start where the padded column steps 0 -> 1 and end where it steps 1 -> 0
+        padded = np.zeros((n_cols, n_rows + 2), dtype=np.int8)
+        padded[:, 1:-1] = flags.T
+        steps = np.diff(padded, axis=1)
+        start_cols, start_rows = np.nonzero(steps == 1)
+        _, end_rows = np.nonzero(steps == -1)
+        longest = np.zeros(n_cols, dtype=np.int64)
+        np.maximum.at(longest, start_cols, end_rows - start_rows)
+
+        days = flags.sum(axis=0)
+        first = last = np.full(n_cols, np.datetime64('NaT'), dtype=dates.dtype)
+        if n_rows:
+            active = days > 0
+            first = np.where(active, dates[flags.argmax(axis=0)], first)
+            last = np.where(active, dates[n_rows - 1 - flags[::-1].argmax(axis=0)], last)
+        return pd.DataFrame({
+            'days': days.astype(np.int64),
+            'longest_streak': longest,
+            'transitions': np.count_nonzero(np.diff(flags, axis=0), axis=0),
+            'first_active': first,
+            'last_active': last,
+        }, index=pd.Index(cols, name='restriction'))
+
     def num_days_closed(self) -> dict[str,int]:
         """
         Calculates the number of days different types of restrictions were enforced and
         saves the data.
 
-        Parameters:
-        data (pd.DataFrame): DataFrame with restriction data.
-
         Returns:
         dict[str, int]: Dictionary with restriction types as keys and count of
         days enforced as values.
         """
-        schools_closed = self.daily['schools_closed'].tolist().count(1)
-        pubs_closed = self.daily['pubs_closed'].tolist().count(1)
-        shops_closed = self.daily['shops_closed'].tolist().count(1)
-        eating_closed = self.daily['eating_places_closed'].tolist().count(1)
-        mixing = self.daily['household_mixing_indoors_banned'].tolist().count(1)
-        wfh = self.daily['wfh'].tolist().count(1)
-        rule6 = self.daily['rule_of_6_indoors'].tolist().count(1)
-        curfew = self.daily['curfew'].tolist().count(1)
-        eat_out = self.daily['eat_out_to_help_out'].tolist().count(1)
-        res = {
-            'schools': schools_closed,
-            'pubs_closed': pubs_closed,
-            'shops_closed': shops_closed,
-            'eating_closed': eating_closed,
-            'mixing': mixing,
-            'wfh': wfh,
-            'rule6': rule6,
-            'curfew': curfew,
-            'eat_out': eat_out
+        aliases = {
+            'schools_closed': 'schools',
+            'eating_places_closed': 'eating_closed',
+            'household_mixing_indoors_banned': 'mixing',
+            'rule_of_6_indoors': 'rule6',
+            'eat_out_to_help_out': 'eat_out'
         }
-        return res
+        days = self.restriction_stats(self.daily)['days']
+        return {aliases.get(restr, restr): int(count) for restr, count in days.items()}
 
     @staticmethod
-    def plot_num_days_closed(data_dict: dict, folder_path: str) -> None:
+    def figure(figsize: tuple[float, float], fig: Optional[Figure] = None) -> Figure:
+        """
+        Returns a blank figure drawn on the non-interactive Agg canvas.
+
+        Figures are not registered with pyplot, so they are freed as soon as they are no
+        longer referenced instead of accumulating until closed.
+
+        Parameters:
+        figsize (tuple): Width and height of the figure in inches.
+        fig (Figure): Figure to clear and reuse instead of creating a new one.
+
+        Returns:
+        Figure: The blank figure.
+        """
+        if fig is None:
+            fig = Figure(figsize=figsize)
+            FigureCanvasAgg(fig)
+        else:
+            fig.clear()
+            fig.set_size_inches(figsize)
+        return fig
+
+    @staticmethod
+    def plot_num_days_closed(data_dict: dict, folder_path: str,
+                             fig: Optional[Figure] = None) -> Figure:
         """
         Creates and saves a bar chart showing the number of days each restriction was enforced.
 
         Parameters:
         data_dict (dict): Dictionary with restriction types and counts of days enforced.
         folder_path (str): Path where the plot image will be saved.
+        fig (Figure): Figure to reuse, a new one is created if not given.
+
+        Returns:
+        Figure: The figure the chart was drawn on.
         """
         names = list(data_dict.keys())
         values = list(data_dict.values())
 
-        plt.figure(figsize=(10, 6))
-        plt.bar(names, values, color='skyblue')
+        fig = DataPreparation.figure((10, 6), fig)
+        axis = fig.add_subplot()
+        axis.bar(names, values, color='skyblue')
+
+        axis.set_xlabel('Restriction Type')
+        axis.set_ylabel('Total number of days enforced:')
+        axis.set_title('Bar Chart')
 
-        plt.xlabel('Restriction Type')
-        plt.ylabel('Total number of days enforced:')
-        plt.title('Bar Chart')
+        axis.tick_params(axis='x', labelrotation=45)
+        for label in axis.get_xticklabels():
+            label.set_horizontalalignment('right')
+
+        fig.tight_layout()
+        with atomic_path(f'{folder_path}/num_days_closed.png') as tmp_path:
+            fig.savefig(tmp_path)
+        return fig
+
+    @staticmethod
+    def active_counts(data: pd.DataFrame, date_col: str = 'date', window: Optional[int] = None,
+                      cumulative: bool = False) -> pd.DataFrame:
+        """
+        Counts the restrictions in place on each day, without modifying data.
 
-        plt.xticks(rotation=45, ha='right')
+        Parameters:
+        data (pd.DataFrame): DataFrame with a date column and one flag column per restriction.
+        date_col (str): Name of the date column.
+        window (int): Number of days of a trailing rolling mean of the counts to add.
+        Shorter windows are used for the first days.
+        cumulative (bool): Whether to add the running total of the counts.
 
-        plt.tight_layout()
-        plt.savefig(f'{folder_path}/num_days_closed.png')
+        Returns:
+        pd.DataFrame: DataFrame with columns 'date' and 'active', plus 'rolling' when a
+        window is given and 'cumulative' when requested.
+
+        Raises:
+        ValueError: If window is not positive.
+        """
+        flags = data[DataPreparation.flag_columns(data, date_col)].to_numpy()
+        counts = (flags == 1).sum(axis=1, dtype=np.int64)
+        res = pd.DataFrame({
+            'date': pd.to_datetime(data[date_col]).to_numpy(),
+            'active': counts.astype(np.min_scalar_type(flags.shape[1]))
+        })
+        if window is not None or cumulative:
+            totals = np.cumsum(counts)
+            if window is not None:
+                if window < 1:
+                    raise ValueError(f"window must be a positive number of days, got {window}")
+                lagged = np.zeros_like(totals)
+                lagged[window:] = totals[:len(totals) - window]
+                sizes = np.minimum(np.arange(1, len(totals) + 1), window)
+                res['rolling'] = (totals - lagged) / sizes
+            if cumulative:
+                res['cumulative'] = totals
+        return res
 
     @staticmethod
     def cumulative_timeline_data(data: pd.DataFrame) -> dict:
         """
-        Creates a line plot showing the cumulative number of restrictions enforced in time.
+        Collects the number of restrictions enforced on each day, for the timeline plot.
+        data is not modified.
 
         Parameters:
         data (pd.DataFrame): DataFrame with restriction data including date and restriction columns.
-        folder_path (str): Path where the plot image will be saved.
+
+        Returns:
+        dict: Dictionary with the dates under 'x_vals' and the number of restrictions
+        in place on each of them under 'y_vals'.
         """
-        data['date'] = pd.to_datetime(data['date'])  # Ensure date column is in datetime format
-        data['row_sum'] = data.apply(
-            lambda row: sum([x for x in row if isinstance(x, int)]), axis=1
-            )
-        x_values = data['date'].tolist()
-        y_values = data['row_sum'].tolist()
+        counts = DataPreparation.active_counts(data)
         return {
-            "x_vals": x_values,
-            "y_vals": y_values
+            "x_vals": counts['date'].tolist(),
+            "y_vals": counts['active'].astype(int).tolist()
         }
 
     @staticmethod
-    def plot_cumulative_timeline(xy_dict: dict, folder_path: str) -> None:
+    def plot_cumulative_timeline(xy_dict: dict, folder_path: str,
+                                 fig: Optional[Figure] = None) -> Figure:
         """
         Generates and saves a cumulative timeline plot of restrictions enforced over time.
 
@@ -291,108 +498,244 @@ class DataPreparation:
                         - 'x_vals': List of values for the x-axis.
                         - 'y_vals': List of values for the y-axis.
         - folder_path (str): The folder path where the plot image will be saved.
+        - fig (Figure): Figure to reuse, a new one is created if not given.
+
+        Returns:
+        - Figure: The figure the plot was drawn on.
         """
         x_values = xy_dict['x_vals']
         y_values = xy_dict['y_vals']
-        plt.figure(figsize=(10, 6))
-        plt.plot(x_values, y_values, color='skyblue')
+        fig = DataPreparation.figure((10, 6), fig)
+        axis = fig.add_subplot()
+        axis.plot(x_values, y_values, color='skyblue')
 
-        plt.xlabel('Restriction Type')
-        plt.ylabel('Total number of restrictions enforced:')
-        plt.title('Total number of restrictions enforced per day')
+        axis.set_xlabel('Restriction Type')
+        axis.set_ylabel('Total number of restrictions enforced:')
+        axis.set_title('Total number of restrictions enforced per day')
 
-        plt.xticks(rotation=45, ha='right')
+        axis.tick_params(axis='x', labelrotation=45)
+        for label in axis.get_xticklabels():
+            label.set_horizontalalignment('right')
 
-        plt.tight_layout()
-        plt.savefig(f'{folder_path}/cumulative_timeline.png')
+        fig.tight_layout()
+        with atomic_path(f'{folder_path}/cumulative_timeline.png') as tmp_path:
+            fig.savefig(tmp_path)
+        return fig
 
-    def restriction_timeline_data(self) -> pd.DataFrame:
+    @staticmethod
+    def label_levels(dates: pd.Series, spacing: Optional[float] = None) -> np.ndarray:
         """
-        Creates and saves a timeline plot showing the sequence of restrictions over time.
+        Lays out the labels of a timeline so that labels on the same level do not overlap,
+        using the fewest levels possible.
+
+        Each label is taken to cover spacing days from its date. Once sorted by date, the
+        number of earlier labels still covering a label's date is found for all labels at
+        once with a binary search. Since every label covers the same length of time, two
+        overlapping labels are never more than that maximum count apart in date order, so
+        cycling through one more level than it keeps overlapping labels apart. Levels
+        alternate above and below the axis: 1, -1, 3, -3, 5, ...
 
         Parameters:
-        folder_path (str): Path where the plot image will be saved.
+        dates (pd.Series): Date of each label, missing dates are put on the first level.
+        spacing (float): Number of days a label covers, defaults to a 60th of the dates' span
+        and at least one day.
+
+        Returns:
+        np.ndarray: Level of each label, aligned with dates.
+        """
+        days = pd.to_datetime(pd.Series(dates)).to_numpy('datetime64[s]')
+        present = ~np.isnat(days)
+        levels = np.ones(len(days), dtype=np.int64)
+        if not present.any():
+            return levels
+        # missing dates are left out of the span and the packing, on the first level
+        days = days[present].astype(np.int64) / 86400
+        order = np.argsort(days, kind='stable')
+        starts = days[order]
+        if spacing is None:
+            spacing = max((starts[-1] - starts[0]) / 60, 1)
+        overlaps = np.arange(len(starts)) - np.searchsorted(starts + spacing, starts, side='right')
+        slots = np.empty(len(starts), dtype=np.int64)
+        slots[order] = np.arange(len(starts)) % (overlaps.max() + 1)
+        levels[present] = np.where(slots % 2 == 0, 1, -1) * (2 * (slots // 2) + 1)
+        return levels
+
+    def restriction_timeline_data(self, spacing: Optional[float] = None) -> pd.DataFrame:
+        """
+        Collects the summary events with the level of their label on the timeline plot.
+
+        Parameters:
+        spacing (float): Number of days a label covers, see label_levels.
+
+        Returns:
+        pd.DataFrame: DataFrame with columns 'date', 'restriction' and 'level'.
         """
-        levels = [-5, -3, -1, 1, 3, 5]
-        self.summary = self.summary.copy()
-        self.summary.loc[:, 'level'] = [levels[i % len(levels)] for i in range(len(self.summary))]
-        data = self.summary[['date','restriction','level']]
-        data.loc[:, 'date'] = pd.to_datetime(data['date'], errors='coerce')
+        data = self.summary[['date','restriction']].copy()
+        data['date'] = pd.to_datetime(data['date'], errors='coerce')
+        data['level'] = self.label_levels(data['date'], spacing)
         return data
 
     @staticmethod
-    def plot_restriction_timeline(data: pd.DataFrame, folder_path: str) -> None:
+    def _label_collection(labels: np.ndarray, dates: np.ndarray, levels: np.ndarray,
+                          axis: Any, fontsize: float = 5, rotation: float = 25) -> PathCollection:
         """
-        Plots a cumulative timeline graph of restrictions enforced over time
-        and saves it as a PNG file.
+        Builds the labels of a timeline as a single collection of text outlines, which
+        is much faster to draw than one text artist per label. The outline of each
+        distinct label is only computed once.
 
         Parameters:
-        - xy_dict (dict): A dictionary containing x and y values for the plot.
-            Expected keys are 'x_vals' for the x-axis data (dates)
-            and 'y_vals' for the y-axis data (restriction counts).
-        - folder_path (str): The folder path where the plot image will be saved.
+        labels (np.ndarray): Text of each label.
+        dates (np.ndarray): Date of each label.
+        levels (np.ndarray): Level of each label, labels are drawn above positive levels
+        and below negative ones.
+        axis (Axes): Axes the labels are drawn on.
+        fontsize (float): Font size of the labels in points.
+        rotation (float): Rotation of the labels in degrees.
+
+        Returns:
+        PathCollection: The labels, positioned in data coordinates.
+        """
+        outlines = {}
+        paths = []
+        for label, level in zip(labels, levels):
+            if (label, level > 0) not in outlines:
+                path = TextPath((0, 0), str(label), size=fontsize)
+                box = path.get_extents()
+                shift = Affine2D().translate(-(box.x0 + box.x1) / 2,
+                                             -box.y0 if level > 0 else -box.y1)
+                rotate = Affine2D().rotate_deg(rotation)
+                outlines[label, level > 0] = path.transformed(shift + rotate)
+            paths.append(outlines[label, level > 0])
+        offsets = np.column_stack((mdates.date2num(dates), levels))
+        return PathCollection(
+            paths, offsets=offsets, offset_transform=axis.transData,
+            transform=Affine2D().scale(1 / 72) + axis.figure.dpi_scale_trans,
+            facecolors='black', linewidths=0
+            )
+
+    @staticmethod
+    def plot_restriction_timeline(data: pd.DataFrame, folder_path: str,
+                                  fig: Optional[Figure] = None, fast: bool = False) -> Figure:
         """
-        _,  axis = plt.subplots(figsize=(18,9))
-        axis.plot(data['date'], [0,]*len(data), "-o", color="black", markerfacecolor="white")
-        axis.set_ylim(-7,7)
-
-        for i in range(len(data)):
-            date, event, level = data['date'][i], data['restriction'][i], data['level'][i]
-            y_offset = level + 0.5 * (-1)**i  # Stagger labels slightly
-            axis.annotate(
-                event,
-                xy=(date, 0.1 if level>0 else -0.1),
-                xytext=(date, y_offset),
-                textcoords='data',
-                ha = "center",
-                va = 'bottom' if level > 0 else 'top',
-                fontsize=5,
-                rotation=25,
-                arrowprops=dict(arrowstyle="-", color="red", linewidth=0.5)
+        Plots a timeline of the restriction events and saves it as a PNG file.
+
+        Parameters:
+        - data (pd.DataFrame): DataFrame with columns 'date', 'restriction' and 'level',
+            as returned by restriction_timeline_data.
+        - folder_path (str): The folder path where the plot image will be saved.
+        - fig (Figure): Figure to reuse, a new one is created if not given.
+        - fast (bool): Whether to draw the stems and labels as two collections rather than
+            one annotation per event, for timelines with many events.
+
+        Returns:
+        - Figure: The figure the timeline was drawn on.
+        """
+        fig = DataPreparation.figure((18, 9), fig)
+        axis = fig.add_subplot()
+        dates = data['date'].to_numpy()
+        labels = data['restriction'].to_numpy()
+        levels = data['level'].to_numpy()
+        axis.plot(dates, np.zeros(len(data)), "-o", color="black", markerfacecolor="white")
+        height = np.abs(levels).max(initial=5) + 2
+        axis.set_ylim(-height, height)
+
+        if fast:
+            axis.vlines(dates, np.where(levels > 0, 0.1, -0.1), levels, color="red", linewidth=0.5)
+            axis.add_collection(
+                DataPreparation._label_collection(labels, dates, levels, axis), autolim=False
                 )
+        else:
+            for date, event, level in zip(dates, labels, levels):
+                axis.annotate(
+                    event,
+                    xy=(date, 0.1 if level>0 else -0.1),
+                    xytext=(date, level),
+                    textcoords='data',
+                    ha = "center",
+                    va = 'bottom' if level > 0 else 'top',
+                    fontsize=5,
+                    rotation=25,
+                    arrowprops=dict(arrowstyle="-", color="red", linewidth=0.5)
+                    )
 
         axis.spines[['left', 'top', 'bottom', 'right']].set_visible(False)
         axis.yaxis.set_visible(False)
-        plt.savefig(f'{folder_path}/restriction_timeline.png')
+        with atomic_path(f'{folder_path}/restriction_timeline.png') as tmp_path:
+            fig.savefig(tmp_path)
+        return fig
 
 def main() -> None:
-    """Loads, explores and prepares the data"""
+    """Loads, explores and prepares the data, skipping prepared files that are up to date"""
+    parser = argparse.ArgumentParser(description="Explores and prepares the restriction datasets")
+    parser.add_argument('--force', action='store_true',
+                        help="regenerate every prepared file even if it is up to date")
+    parser.add_argument('--cache-size', type=int, default=256,
+                        help="size in MB above which cached files are evicted")
+    parser.add_argument('--chunksize', type=int, default=100_000,
+                        help="number of rows read at a time when profiling the datasets")
+    args = parser.parse_args()
+
     # Dataset Attribution:
     # Contains public sector information licensed under the Open Government Licence v3.0.
     # Source:
     # COVID-19 Restrictions Timeseries dataset, Greater London Authority (GLA), London Datastore
-    data_loader = DataLoader(
+    paths = (
         "coursework1/datasets/restrictions_daily.csv",
         "coursework1/datasets/restrictions_weekly.csv",
         "coursework1/datasets/restrictions_summary.csv"
         )
+    data_loader = DataLoader(*paths)
+    folder_path = "coursework1/data_exploration/prepared_data/figs"
+    data_path = "coursework1/data_exploration/prepared_data"
+
+    # Data Exploration Profile, profiled chunk by chunk in a single scan of each file
+    report = profile_datasets(
+        dict(zip(('daily', 'weekly', 'summary'), data_loader.load_data(chunksize=args.chunksize)))
+        )
+    write_report(report, f'{data_path}/profile.json', f'{data_path}/profile.txt')
+
     daily, weekly, summary = data_loader.load_data()
 
-    # Data Exploration Summaries
-    output_file = "coursework1/data_exploration/prepared_data/data.txt"
-    explo = DataExploration(daily, weekly, summary)
-    explo.get_data_shapes(output_file) # dataframe shapes
-    explo.get_data_types(output_file) # dataframe data types
-    explo.get_columns(output_file) # column names
+    # Data Exploration Summaries, buffered and written to data.txt in one commit
+    with ArtifactWriter() as writer:
+        explo = DataExploration(daily, weekly, summary, writer=writer)
+        explo.get_data_shapes(f'{data_path}/data.txt') # dataframe shapes
+        explo.get_data_types(f'{data_path}/data.txt') # dataframe data types
+        explo.get_columns(f'{data_path}/data.txt') # column names
 
     # Data Preparation
-    folder_path = "coursework1/data_exploration/prepared_data/figs"
-    data_path = "coursework1/data_exploration/prepared_data"
     prep = DataPreparation(daily, weekly, summary)
+    cache = ArtifactCache(f"{data_path}/.cache", max_bytes=args.cache_size * 2**20,
+                          force=args.force)
 
-    # plot timeline graph
-    timeline_data = prep.cumulative_timeline_data(daily)
-    save_to_csv(timeline_data, 'timeline_data.csv', data_path)
+    # timeline data
+    cache.run(
+        'timeline_data', paths[:1], [f'{data_path}/timeline_data.csv'],
+        lambda: save_to_csv(prep.cumulative_timeline_data(daily), 'timeline_data.csv', data_path)
+        )
 
-    # plot number of days closed bar chart
-    num_days_closed = prep.num_days_closed()
-    save_to_csv(num_days_closed, 'num_days_closed.csv', data_path)
-    prep.plot_num_days_closed(num_days_closed, folder_path)
+    # number of days closed bar chart
+    def num_days_closed() -> None:
+        data = prep.num_days_closed()
+        save_to_csv(data, 'num_days_closed.csv', data_path)
+        prep.plot_num_days_closed(data, folder_path)
+    cache.run(
+        'num_days_closed', paths[:1],
+        [f'{data_path}/num_days_closed.csv', f'{folder_path}/num_days_closed.png'],
+        num_days_closed
+        )
 
-    # plot restriction timelime
-    restriction_data = prep.restriction_timeline_data()
-    save_to_csv(restriction_data, 'restriction_data.csv', data_path)
-    prep.plot_restriction_timeline(restriction_data, folder_path)
+    # restriction timelime
+    def restriction_timeline() -> None:
+        data = prep.restriction_timeline_data()
+        save_to_csv(data, 'restriction_data.csv', data_path)
+        prep.plot_restriction_timeline(data, folder_path)
+    cache.run(
+        'restriction_timeline', paths[2:],
+        [f'{data_path}/restriction_data.csv', f'{folder_path}/restriction_timeline.png'],
+        restriction_timeline
+        )
+    print(f"Prepared files: {cache.hits} up to date, {cache.misses} regenerated")
 
 if __name__ == "__main__":
     main()
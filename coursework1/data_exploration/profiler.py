@@ -0,0 +1,237 @@
+"""
+This script profiles the restriction datasets in a single scan of each, computing
+their shapes, data types, value ranges, null counts, cardinalities and flag
+frequencies, and writes them as one JSON report and one text report.
+
+The datasets may be given as DataFrames or as iterators over chunks, so that files
+larger than memory can be profiled.
+
+Classes:
+    - DatasetProfile: Accumulates the statistics of one dataset over its chunks.
+
+Functions:
+    - profile_datasets(): Profiles several datasets into a single report.
+    - format_report(): Renders a report as text.
+    - write_report(): Writes a report as JSON and as text, each in a single write.
+    - main(): Profiles CSV files given on the command line.
+
+Usage:
+    python -m coursework1.data_exploration.profiler --chunksize 100000
+"""
+import argparse
+import json
+import os
+from typing import Any, Iterable, Optional, Union
+import numpy as np
+import pandas as pd
+from .utils import atomic_write_text
+
+class DatasetProfile:
+    """
+    Statistics of a dataset, updated one chunk at a time.
+
+    Attributes:
+        max_distinct (int): Number of distinct values of a column above which its
+            cardinality is no longer tracked exactly, bounding memory.
+        rows (int): Number of rows seen.
+        columns (list[str]): Column names, in order.
+    """
+    def __init__(self, max_distinct: int = 100_000) -> None:
+        """
+        Initializes an empty DatasetProfile.
+
+        Parameters:
+            max_distinct (int): Number of distinct values of a column above which its
+                cardinality is reported as a lower bound.
+        """
+        self.max_distinct = max_distinct
+        self.rows = 0
+        self.columns = []
+        self._dtypes = {}
+        self._nulls = {}
+        self._min = {}
+        self._max = {}
+        self._distinct = {}
+        self._capped = {}
+        self._ones = {}
+        self._flag = {}
+
+    @staticmethod
+    def _values(col: pd.Series) -> Union[pd.Series, pd.Index]:
+        """Non-null values of a column, a categorical column giving its observed categories."""
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            codes = col.cat.codes.to_numpy()
+            return col.cat.categories[np.unique(codes[codes >= 0])]
+        return col.dropna()
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """
+        Adds a chunk of the dataset to the statistics.
+
+        Parameters:
+            chunk (pd.DataFrame): Next rows of the dataset.
+        """
+        if not self.columns:
+            self.columns = list(chunk.columns)
+        self.rows += len(chunk)
+        nulls = chunk.isna().sum()
+        for col in chunk.columns:
+            series = chunk[col]
+            self._dtypes.setdefault(col, set()).add(str(series.dtype))
+            self._nulls[col] = self._nulls.get(col, 0) + int(nulls[col])
+            values = self._values(series)
+            if len(values) == 0:
+                continue
+            self._update_range(col, values)
+            self._update_distinct(col, values)
+            numeric = pd.api.types.is_numeric_dtype(series.dtype)
+            if numeric and not pd.api.types.is_bool_dtype(series.dtype):
+                array = values.to_numpy()
+                ones = int(np.count_nonzero(array == 1))
+                is_flag = ones + int(np.count_nonzero(array == 0)) == len(array)
+            else:
+                ones, is_flag = 0, False
+            self._flag[col] = self._flag.get(col, True) and is_flag
+            self._ones[col] = self._ones.get(col, 0) + ones
+
+    def _update_range(self, col: str, values: Union[pd.Series, pd.Index]) -> None:
+        """Updates the smallest and largest values of a column, if they can be compared."""
+        try:
+            low, high = values.min(), values.max()
+            if col in self._min:
+                low, high = min(low, self._min[col]), max(high, self._max[col])
+        except TypeError:
+            low = high = None
+        self._min[col], self._max[col] = low, high
+
+    def _update_distinct(self, col: str, values: Union[pd.Series, pd.Index]) -> None:
+        """Adds the distinct values of a chunk until max_distinct is exceeded."""
+        if self._capped.get(col):
+            return
+        seen = self._distinct.setdefault(col, set())
+        seen.update(pd.unique(values.to_numpy() if isinstance(values, pd.Series) else values))
+        if len(seen) > self.max_distinct:
+            self._capped[col] = True
+            self._distinct[col] = len(seen)
+
+    @staticmethod
+    def _plain(value: Any) -> Any:
+        """Converts NumPy and pandas scalars to JSON serializable values."""
+        if value is None or isinstance(value, (str, bool, int, float)):
+            return value
+        if isinstance(value, np.generic):
+            return value.item()
+        return str(value)
+
+    def report(self) -> dict[str, Any]:
+        """
+        Collects the statistics of the dataset.
+
+        Returns:
+            dict[str, Any]: Dictionary with the shape of the dataset and, for every
+            column, its data type, null count, range, cardinality (with whether it is
+            exact) and, for 0/1 flag columns, the frequency of 1s among non-null rows.
+        """
+        columns = {}
+        for col in self.columns:
+            distinct = self._distinct.get(col, set())
+            non_null = self.rows - self._nulls[col]
+            columns[col] = {
+                'dtype': '|'.join(sorted(self._dtypes[col])),
+                'nulls': self._nulls[col],
+                'min': self._plain(self._min.get(col)),
+                'max': self._plain(self._max.get(col)),
+                'distinct': distinct if isinstance(distinct, int) else len(distinct),
+                'distinct_exact': not self._capped.get(col, False),
+                'flag_frequency': (
+                    self._ones[col] / non_null if self._flag.get(col) and non_null else None
+                    ),
+            }
+        return {'shape': [self.rows, len(self.columns)], 'columns': columns}
+
+def profile_datasets(datasets: dict[str, Union[pd.DataFrame, Iterable[pd.DataFrame]]],
+                     max_distinct: int = 100_000) -> dict[str, dict[str, Any]]:
+    """
+    Profiles several datasets, each in a single scan.
+
+    Parameters:
+        datasets (dict): Dataset names mapped to DataFrames or iterators over chunks.
+        max_distinct (int): Number of distinct values of a column above which its
+            cardinality is reported as a lower bound.
+
+    Returns:
+        dict[str, dict[str, Any]]: Dataset names mapped to their DatasetProfile reports.
+    """
+    report = {}
+    for name, data in datasets.items():
+        profile = DatasetProfile(max_distinct)
+        for chunk in [data] if isinstance(data, pd.DataFrame) else data:
+            profile.update(chunk)
+        report[name] = profile.report()
+    return report
+
+def format_report(report: dict[str, dict[str, Any]], width: int = 40) -> str:
+    """
+    Renders a report as text, with one table of column statistics per dataset.
+
+    Parameters:
+        report (dict): Report returned by profile_datasets.
+        width (int): Number of characters above which ranges are shortened.
+
+    Returns:
+        str: The text report.
+    """
+    sections = []
+    for name, profile in report.items():
+        table = pd.DataFrame.from_dict(profile['columns'], orient='index')
+        for bound in ('min', 'max'):
+            table[bound] = [
+                f"{str(value)[:width - 3]}..." if len(str(value)) > width else value
+                for value in table[bound]
+            ]
+        table['distinct'] = [
+            f"{n}" if exact else f">{n}"
+            for n, exact in zip(table['distinct'], table.pop('distinct_exact'))
+        ]
+        sections.append(
+            f"{name.upper()}\nshape: {tuple(profile['shape'])}\n"
+            f"{table.to_string(na_rep='-', float_format=lambda x: f'{x:.3f}')}\n"
+            )
+    return "\n".join(sections)
+
+def write_report(report: dict[str, dict[str, Any]], json_path: Optional[str] = None,
+                 text_path: Optional[str] = None) -> None:
+    """
+    Writes a report as JSON and as text, each file in a single atomic write.
+
+    Parameters:
+        report (dict): Report returned by profile_datasets.
+        json_path (str): Path of the JSON report, not written if not given.
+        text_path (str): Path of the text report, not written if not given.
+    """
+    for path, content in ((json_path, lambda: json.dumps(report, indent=2)),
+                          (text_path, lambda: format_report(report))):
+        if path is not None:
+            atomic_write_text(path, content())
+
+def main() -> None:
+    """Profiles the restriction datasets and writes the reports"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('paths', nargs='*', help="CSV files to profile, named after the file",
+                        default=["coursework1/datasets/restrictions_daily.csv",
+                                 "coursework1/datasets/restrictions_weekly.csv",
+                                 "coursework1/datasets/restrictions_summary.csv"])
+    parser.add_argument('--chunksize', type=int, help="number of rows read at a time")
+    parser.add_argument('--json', default="coursework1/data_exploration/prepared_data/profile.json",
+                        help="path of the JSON report")
+    parser.add_argument('--text', default="coursework1/data_exploration/prepared_data/profile.txt",
+                        help="path of the text report")
+    args = parser.parse_args()
+    datasets = {
+        os.path.splitext(os.path.basename(path))[0]: pd.read_csv(path, chunksize=args.chunksize)
+        for path in args.paths
+    }
+    write_report(profile_datasets(datasets), args.json, args.text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+This script renders the DataPreparation figures for many regions at once, drawing
+them headlessly with the object-oriented Figure API on the Agg canvas and spreading
+the region/plot jobs across a process pool.
+
+Classes:
+    - RenderJob: One figure to render, for a region and a kind of plot.
+    - RenderResult: Where a figure was saved and how long it took to render.
+
+Functions:
+    - build_jobs(): Prepares the data of every plot of a region and returns its jobs.
+    - render_job(): Renders a single job, reusing a figure per process and plot kind.
+    - render_all(): Renders many jobs, in a process pool or in the current process.
+    - main(): Renders the figures of the bundled datasets and reports render times.
+
+Usage:
+    python -m coursework1.data_exploration.render --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple, Optional
+import pandas as pd
+from matplotlib.figure import Figure
+from .main import DataLoader, DataPreparation
+
+PLOTS = {
+    'num_days_closed': DataPreparation.plot_num_days_closed,
+    'cumulative_timeline': DataPreparation.plot_cumulative_timeline,
+    'restriction_timeline': DataPreparation.plot_restriction_timeline,
+}
+
+# figures kept by each process for reuse, keyed by plot kind
+_FIGURES: dict[str, Figure] = {}
+
+class RenderJob(NamedTuple):
+    """
+    One figure to render.
+
+    Attributes:
+        region (str): Name of the region, the figure is saved in a sub folder named after it.
+        kind (str): Key of the plot in PLOTS.
+        data (Any): Prepared data passed to the plot method.
+        folder_path (str): Folder holding the sub folder of every region.
+    """
+    region: str
+    kind: str
+    data: Any
+    folder_path: str
+
+class RenderResult(NamedTuple):
+    """
+    Outcome of a rendered job.
+
+    Attributes:
+        region (str): Name of the region.
+        kind (str): Key of the plot in PLOTS.
+        path (str): Path of the saved image.
+        seconds (float): Time taken to draw and save the figure.
+    """
+    region: str
+    kind: str
+    path: str
+    seconds: float
+
+def build_jobs(region: str, daily: pd.DataFrame, weekly: pd.DataFrame, summary: pd.DataFrame,
+               folder_path: str) -> list[RenderJob]:
+    """
+    Prepares the data of every plot in PLOTS for a region.
+
+    Parameters:
+        region (str): Name of the region.
+        daily (pd.DataFrame): Daily dataset of the region.
+        weekly (pd.DataFrame): Weekly dataset of the region.
+        summary (pd.DataFrame): Summary dataset of the region.
+        folder_path (str): Folder holding the sub folder of every region.
+
+    Returns:
+        list[RenderJob]: One job per plot.
+    """
+    prep = DataPreparation(daily, weekly, summary)
+    data = {
+        'num_days_closed': prep.num_days_closed(),
+        'cumulative_timeline': prep.cumulative_timeline_data(daily),
+        'restriction_timeline': prep.restriction_timeline_data(),
+    }
+    return [RenderJob(region, kind, data[kind], folder_path) for kind in PLOTS]
+
+def render_job(job: RenderJob) -> RenderResult:
+    """
+    Renders and saves a single figure. Each process keeps one figure per plot kind and
+    clears it between jobs, so rendering many regions does not grow memory.
+
+    Parameters:
+        job (RenderJob): The figure to render.
+
+    Returns:
+        RenderResult: Where the figure was saved and how long it took.
+
+    Raises:
+        KeyError: If the kind of plot is unknown.
+    """
+    plot = PLOTS[job.kind]
+    folder = os.path.join(job.folder_path, job.region)
+    os.makedirs(folder, exist_ok=True)
+    start = time.perf_counter()
+    _FIGURES[job.kind] = plot(job.data, folder, fig=_FIGURES.get(job.kind))
+    seconds = time.perf_counter() - start
+    return RenderResult(job.region, job.kind, os.path.join(folder, f'{job.kind}.png'), seconds)
+
+def render_all(jobs: list[RenderJob], max_workers: Optional[int] = None,
+               parallel: bool = True) -> list[RenderResult]:
+    """
+    Renders many figures, spreading them across a process pool.
+
+    Parameters:
+        jobs (list[RenderJob]): The figures to render.
+        max_workers (int): Number of worker processes, defaults to the number of CPUs.
+        parallel (bool): Whether to use a process pool rather than render in this process.
+
+    Returns:
+        list[RenderResult]: One result per job, in the order of jobs.
+    """
+    if not parallel or len(jobs) < 2:
+        return [render_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(render_job, jobs, chunksize=max(1, len(jobs) // 64)))
+
+def main() -> None:
+    """Renders the figures of the bundled datasets and prints the time taken by each"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--folder', default="coursework1/data_exploration/prepared_data/figs",
+                        help="folder in which a sub folder is written per region")
+    parser.add_argument('--region', default="london", help="name of the bundled region")
+    parser.add_argument('--workers', type=int, help="number of worker processes")
+    parser.add_argument('--sequential', action='store_true',
+                        help="render in this process instead of a process pool")
+    args = parser.parse_args()
+
+    data_loader = DataLoader(
+        "coursework1/datasets/restrictions_daily.csv",
+        "coursework1/datasets/restrictions_weekly.csv",
+        "coursework1/datasets/restrictions_summary.csv"
+        )
+    jobs = build_jobs(args.region, *data_loader.load_data(), args.folder)
+    start = time.perf_counter()
+    results = render_all(jobs, max_workers=args.workers, parallel=not args.sequential)
+    for res in results:
+        print(f"{res.region}/{res.kind}: {res.seconds:.3f}s -> {res.path}")
+    print(f"Rendered {len(results)} figures in {time.perf_counter() - start:.3f}s")
+
+if __name__ == "__main__":
+    main()
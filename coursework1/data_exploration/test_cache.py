@@ -0,0 +1,63 @@
+"""
+Tests for the content-addressed cache of prepared files.
+"""
+import os
+import pytest
+from coursework1.data_exploration.cache import ArtifactCache
+
+
+@pytest.fixture
+def source(tmp_path):
+    """An input file of a step."""
+    path = tmp_path / "input.csv"
+    path.write_text("a,b\n1,2\n")
+    return path
+
+
+def writer(path, calls, content="output"):
+    """Build function writing content to path and counting its calls."""
+    def build():
+        calls.append(path)
+        path.write_text(content)
+    return build
+
+
+def test_step_is_skipped_until_its_input_changes(tmp_path, source):
+    out, calls = tmp_path / "out.csv", []
+    assert not ArtifactCache(str(tmp_path / "cache")).run("step", [source], [out], writer(out, calls))
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    assert cache.run("step", [source], [out], writer(out, calls))
+    assert len(calls) == 1 and cache.hits == 1
+    source.write_text("a,b\n3,4\n")
+    assert not cache.run("step", [source], [out], writer(out, calls))
+    assert len(calls) == 2
+
+
+def test_parameters_and_force_rebuild(tmp_path, source):
+    out, calls = tmp_path / "out.csv", []
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    cache.run("step", [source], [out], writer(out, calls), params={"window": 7})
+    assert not cache.run("step", [source], [out], writer(out, calls), params={"window": 14})
+    forced = ArtifactCache(str(tmp_path / "cache"), force=True)
+    assert not forced.run("step", [source], [out], writer(out, calls), params={"window": 14})
+    assert len(calls) == 3
+
+
+def test_outputs_are_restored_from_the_cache(tmp_path, source):
+    out, calls = tmp_path / "out.csv", []
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    cache.run("step", [source], [out], writer(out, calls, "first"))
+    os.remove(out)
+    assert cache.run("step", [source], [out], writer(out, calls))
+    assert out.read_text() == "first" and len(calls) == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, source):
+    cache = ArtifactCache(str(tmp_path / "cache"), max_bytes=250)
+    for i in range(4):
+        out = tmp_path / f"out{i}.csv"
+        cache.run(f"step{i}", [source], [out], writer(out, [], "x" * 100))
+    assert cache.size() <= 250
+    assert cache.run("step3", [source], [tmp_path / "out3.csv"], writer(out, []))
+    assert not cache.run("step0", [source], [tmp_path / "out0.csv"],
+                         writer(tmp_path / "out0.csv", []))
@@ -0,0 +1,111 @@
+"""
+Tests for the data exploration and preparation classes.
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from coursework1.data_exploration.main import DataLoader, DataPreparation
+
+DATASETS = os.path.join(os.path.dirname(__file__), "..", "datasets")
+
+
+@pytest.fixture(scope="module")
+def datasets():
+    """The bundled daily, weekly and summary datasets."""
+    return DataLoader(
+        os.path.join(DATASETS, "restrictions_daily.csv"),
+        os.path.join(DATASETS, "restrictions_weekly.csv"),
+        os.path.join(DATASETS, "restrictions_summary.csv")
+    ).load_data()
+
+
+def naive_stats(column):
+    """Loop-based reference for the statistics of one flag column."""
+    flags = column.tolist()
+    longest = current = 0
+    for flag in flags:
+        current = current + 1 if flag == 1 else 0
+        longest = max(longest, current)
+    transitions = sum(a != b for a, b in zip(flags, flags[1:]))
+    return flags.count(1), longest, transitions
+
+
+def test_restriction_stats_match_loops(datasets):
+    daily = datasets[0]
+    stats = DataPreparation.restriction_stats(daily)
+    assert stats.index.tolist() == daily.columns[1:].tolist()
+    for restr, row in stats.iterrows():
+        assert (row['days'], row['longest_streak'], row['transitions']) == naive_stats(daily[restr])
+        active = daily.loc[daily[restr] == 1, 'date']
+        assert row['first_active'] == pd.Timestamp(active.iloc[0])
+        assert row['last_active'] == pd.Timestamp(active.iloc[-1])
+
+
+def test_restriction_stats_date_range(datasets):
+    daily = datasets[0]
+    stats = DataPreparation.restriction_stats(daily, start='2020-09-01', end='2020-12-31')
+    in_range = daily[(daily['date'] >= '2020-09-01') & (daily['date'] <= '2020-12-31')]
+    assert stats['days'].to_dict() == in_range.iloc[:, 1:].sum().to_dict()
+    assert stats.loc['eat_out_to_help_out', 'first_active'] is pd.NaT
+
+
+def test_num_days_closed_covers_every_restriction(datasets):
+    days = DataPreparation(*datasets).num_days_closed()
+    assert len(days) == 10
+    assert days['stay_at_home'] == datasets[0]['stay_at_home'].sum()
+    assert days['schools'] == datasets[0]['schools_closed'].sum()
+
+
+def test_cumulative_timeline_data_does_not_modify_input(datasets):
+    daily = datasets[0]
+    before = daily.copy()
+    timeline = DataPreparation.cumulative_timeline_data(daily)
+    pd.testing.assert_frame_equal(daily, before)
+    assert timeline['y_vals'] == daily.iloc[:, 1:].sum(axis=1).tolist()
+    assert timeline['x_vals'][0] == pd.Timestamp(daily['date'].iloc[0])
+
+
+def test_active_counts_variants(datasets):
+    daily = datasets[0]
+    counts = DataPreparation.active_counts(daily, window=7, cumulative=True)
+    active = daily.iloc[:, 1:].sum(axis=1)
+    assert counts['cumulative'].tolist() == active.cumsum().tolist()
+    expected = active.rolling(7, min_periods=1).mean()
+    assert counts['rolling'].to_numpy() == pytest.approx(expected.to_numpy())
+    with pytest.raises(ValueError):
+        DataPreparation.active_counts(daily, window=0)
+
+
+def test_label_levels_keep_labels_on_a_level_apart():
+    rng = np.random.default_rng(0)
+    dates = pd.Series(pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 300, 500), 'D'))
+    levels = DataPreparation.label_levels(dates, spacing=10)
+    # levels alternate sides: 1, -1, 3, -3, ...
+    assert set(np.abs(levels)) == set(range(1, np.abs(levels).max() + 1, 2))
+    days = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+    for level in np.unique(levels):
+        gaps = np.diff(np.sort(days[levels == level]))
+        assert (gaps >= 10).all()
+    # no fewer levels can be used than labels sharing a 10 day window
+    crowded = max(((days >= d) & (days < d + 10)).sum() for d in days)
+    assert len(np.unique(levels)) == crowded
+
+
+def test_missing_dates_do_not_stretch_the_label_layout(datasets):
+    dates = pd.to_datetime(datasets[2]['date'], errors='coerce').dropna()
+    expected = DataPreparation.label_levels(dates)
+    with_missing = pd.concat([dates.iloc[:1], pd.Series([pd.NaT]), dates.iloc[1:]],
+                             ignore_index=True)
+    levels = DataPreparation.label_levels(with_missing)
+    assert levels[1] == 1
+    assert np.delete(levels, 1).tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_plot_restriction_timeline_modes(datasets, tmp_path, fast):
+    data = DataPreparation(*datasets).restriction_timeline_data()
+    fig = DataPreparation.plot_restriction_timeline(data, str(tmp_path), fast=fast)
+    axis = fig.axes[0]
+    assert len(axis.texts) == (0 if fast else len(data))
+    assert (tmp_path / "restriction_timeline.png").stat().st_size > 0
@@ -0,0 +1,56 @@
+"""
+Tests for the single scan dataset profiler.
+"""
+import json
+import os
+import pandas as pd
+import pytest
+from coursework1.data_exploration.profiler import profile_datasets, write_report
+
+DATASETS = os.path.join(os.path.dirname(__file__), "..", "datasets")
+PATHS = {
+    name: os.path.join(DATASETS, f"restrictions_{name}.csv")
+    for name in ("daily", "weekly", "summary")
+}
+
+
+@pytest.fixture(scope="module")
+def report():
+    """Profile of the bundled datasets read whole."""
+    return profile_datasets({name: pd.read_csv(path) for name, path in PATHS.items()})
+
+
+def test_profile_matches_pandas(report):
+    daily = pd.read_csv(PATHS["daily"])
+    assert report["daily"]["shape"] == list(daily.shape)
+    for col in daily.columns[1:]:
+        stats = report["daily"]["columns"][col]
+        assert stats["dtype"] == str(daily[col].dtype)
+        assert stats["min"] == daily[col].min() and stats["max"] == daily[col].max()
+        assert stats["distinct"] == daily[col].nunique()
+        assert stats["flag_frequency"] == pytest.approx(daily[col].mean())
+    summary = pd.read_csv(PATHS["summary"])
+    for col, stats in report["summary"]["columns"].items():
+        assert stats["nulls"] == summary[col].isna().sum()
+    assert report["summary"]["columns"]["restriction"]["flag_frequency"] is None
+
+
+def test_chunked_profile_matches_whole_profile(report):
+    chunked = profile_datasets(
+        {name: pd.read_csv(path, chunksize=50) for name, path in PATHS.items()}
+        )
+    assert chunked == report
+
+
+def test_cardinality_is_capped(report):
+    capped = profile_datasets({"daily": pd.read_csv(PATHS["daily"])}, max_distinct=10)
+    stats = capped["daily"]["columns"]["date"]
+    assert not stats["distinct_exact"] and stats["distinct"] > 10
+    assert report["daily"]["columns"]["date"]["distinct_exact"]
+
+
+def test_write_report(report, tmp_path):
+    write_report(report, str(tmp_path / "profile.json"), str(tmp_path / "profile.txt"))
+    assert json.loads((tmp_path / "profile.json").read_text()) == report
+    text = (tmp_path / "profile.txt").read_text()
+    assert "DAILY" in text and "schools_closed" in text
@@ -0,0 +1,34 @@
+"""
+Tests for the headless figure rendering pipeline.
+"""
+import os
+import matplotlib.pyplot as plt
+import pytest
+from coursework1.data_exploration.main import DataLoader
+from coursework1.data_exploration.render import PLOTS, build_jobs, render_all
+
+DATASETS = os.path.join(os.path.dirname(__file__), "..", "datasets")
+
+
+@pytest.fixture(scope="module")
+def datasets():
+    """The bundled daily, weekly and summary datasets."""
+    return DataLoader(
+        os.path.join(DATASETS, "restrictions_daily.csv"),
+        os.path.join(DATASETS, "restrictions_weekly.csv"),
+        os.path.join(DATASETS, "restrictions_summary.csv")
+    ).load_data()
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_render_all_saves_every_figure_per_region(datasets, tmp_path, parallel):
+    jobs = build_jobs("a", *datasets, str(tmp_path)) + build_jobs("b", *datasets, str(tmp_path))
+    results = render_all(jobs, max_workers=2, parallel=parallel)
+    assert [(res.region, res.kind) for res in results] == [(j.region, j.kind) for j in jobs]
+    for res in results:
+        assert res.path == os.path.join(str(tmp_path), res.region, f"{res.kind}.png")
+        assert os.path.getsize(res.path) > 0
+        assert res.seconds > 0
+    assert len(results) == 2 * len(PLOTS)
+    # figures are never registered with pyplot, so none are left open
+    assert not plt.get_fignums()
@@ -0,0 +1,95 @@
+"""
+Tests for the writers and readers of prepared data.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pytest
+from coursework1.data_exploration.main import DataExploration, DataLoader
+from coursework1.data_exploration.utils import WRITERS, ArtifactWriter, atomic_path, read_data, save_data, to_frame
+
+DATASETS = os.path.join(os.path.dirname(__file__), "..", "datasets")
+
+
+def test_dicts_become_columns_or_a_single_row():
+    assert to_frame({"x_vals": [1, 2, 3], "y_vals": [4, 5, 6]}).shape == (3, 2)
+    assert to_frame({"wfh": 3, "curfew": 1}).shape == (1, 2)
+
+
+@pytest.mark.parametrize("fmt", list(WRITERS))
+def test_datasets_round_trip_with_their_types(tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    names = ("daily", "weekly", "summary")
+    csv_paths = [os.path.join(DATASETS, f"restrictions_{name}.csv") for name in names]
+    expected = DataLoader(*csv_paths).load_data(compact=True)
+    paths = [save_data(data, name, str(tmp_path), fmt) for data, name in zip(expected, names)]
+    assert paths[0].endswith(WRITERS[fmt][1])
+    for data, loaded in zip(expected, DataLoader(*paths).load_data(compact=True)):
+        pd.testing.assert_frame_equal(loaded, data)
+    chunks = read_data(paths[0], chunksize=500)
+    assert sum(len(chunk) for chunk in chunks) == len(expected[0])
+
+
+def test_atomic_path_leaves_destination_untouched_on_error(tmp_path):
+    path = tmp_path / "out.csv"
+    path.write_text("old")
+    with pytest.raises(RuntimeError):
+        with atomic_path(str(path)) as tmp:
+            assert tmp.endswith(".csv") and os.path.dirname(tmp) == str(tmp_path)
+            with open(tmp, "w", encoding="utf-8") as file:
+                file.write("partial")
+            raise RuntimeError
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["out.csv"]
+
+
+def test_atomic_path_gives_files_the_usual_permissions(tmp_path):
+    plain = tmp_path / "plain.txt"
+    plain.write_text("x")
+    with atomic_path(str(tmp_path / "out.txt")) as tmp:
+        with open(tmp, "w", encoding="utf-8") as file:
+            file.write("x")
+    assert os.stat(tmp_path / "out.txt").st_mode == os.stat(plain).st_mode
+
+
+def test_artifact_writer_batches_and_replaces(tmp_path):
+    with ArtifactWriter(str(tmp_path)) as writer:
+        writer.append("log.txt", "a\n")
+        writer.append("log.txt", "b\n")
+        writer.write("other.txt", "x")
+        assert not os.listdir(tmp_path)
+    assert (tmp_path / "log.txt").read_text() == "a\nb\n"
+    with ArtifactWriter(str(tmp_path)) as writer:
+        writer.append("log.txt", "c\n")
+    assert (tmp_path / "log.txt").read_text() == "c\n"
+
+
+def write_run(args):
+    """Writes one run's lines to a shared file through an ArtifactWriter."""
+    folder, run = args
+    with ArtifactWriter(folder) as writer:
+        for line in range(200):
+            writer.append("shared.txt", f"run {run} line {line}\n")
+
+
+def test_parallel_runs_never_interleave(tmp_path):
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(write_run, [(str(tmp_path), run) for run in range(8)]))
+    lines = (tmp_path / "shared.txt").read_text().splitlines()
+    assert len(lines) == 200
+    assert len({line.split(" line ")[0] for line in lines}) == 1
+    assert os.listdir(tmp_path) == ["shared.txt"]
+
+
+def test_exploration_summaries_do_not_grow_on_rerun(tmp_path):
+    names = ("daily", "weekly", "summary")
+    datasets = DataLoader(*[os.path.join(DATASETS, f"restrictions_{name}.csv")
+                            for name in names]).load_data()
+    output_file = str(tmp_path / "data.txt")
+    for _ in range(2):
+        explo = DataExploration(*datasets)
+        explo.get_data_shapes(output_file)
+        explo.get_columns(output_file)
+    text = (tmp_path / "data.txt").read_text()
+    assert text.count("DATA SHAPES") == 1 and text.count("COLUMNS") == 1
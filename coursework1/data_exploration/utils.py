@@ -1,19 +1,194 @@
 """
-This module provides a utility function to save various data types to a CSV file.
+This module provides utility functions to save and load data as CSV, Parquet or Arrow IPC files.
 
 The `save_to_csv` function allows users to save a `pandas.DataFrame` or a dictionary to a CSV file.
 It automatically converts the dictionary to a DataFrame before saving and supports specifying the
 file name and file path for the output CSV.
+
+The `save_data` function writes through a pluggable writer chosen by format, so that prepared
+data can also be written to columnar Parquet or Arrow IPC files, compressed and keeping their
+column types, and `read_data` reads any of these formats back, whole or in chunks.
+Parquet and Arrow IPC require the optional pyarrow package.
+
+Every file is written atomically with `atomic_path`: it is written to a temporary file in
+the destination directory, flushed to disk and renamed over the destination, so readers and
+concurrent pipeline runs never see a partially written file. `ArtifactWriter` buffers many
+small text writes and writes each file once, atomically.
 """
-from typing import Any
+import io
+import os
+import secrets
+import shutil
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Union
 import pandas as pd
+# files are read by the same reader as the database loader, re-exported here for callers of utils
+from ..database_creation.frames import (  # pylint: disable=unused-import
+    file_format, import_pyarrow, read_columns, read_data
+)
+
+def _create_temp(folder: str, name: str) -> str:
+    """
+    Creates an empty file with a unique name next to name in folder and returns its path.
+    It is opened with mode 0o666 for the process umask to restrict, like any new file.
+    """
+    prefix, suffix = f".{name}.", os.path.splitext(name)[1]
+    while True:
+        tmp_path = os.path.join(folder, f"{prefix}{secrets.token_hex(8)}{suffix}")
+        try:
+            fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return tmp_path
+
+def _fsync_dir(path: str) -> None:
+    """Flushes a directory entry to disk, where the platform supports it."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """
+    Context manager yielding a temporary path to write a file to instead of path. When the
+    block exits normally the temporary file is flushed to disk and renamed to path in one
+    atomic step, otherwise it is removed and path is left untouched.
+
+    The temporary file is created in the destination directory, so the rename never crosses
+    file systems, with a unique name ending in the same extension as path, so writers that
+    infer the format from the extension keep working.
+
+    Parameters:
+    - path (str): Path of the file to write.
+
+    Yields:
+    - str: Temporary path to write the file to.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    name = os.path.basename(path)
+    tmp_path = _create_temp(folder, name)
+    try:
+        yield tmp_path
+        with open(tmp_path, 'rb') as file:
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(folder)
+
+def atomic_write_text(path: str, text: str) -> None:
+    """
+    Writes text to a file atomically, replacing its previous content.
+
+    Parameters:
+    - path (str): Path of the file.
+    - text (str): Content of the file.
+    """
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+def atomic_copy(src: str, dst: str) -> None:
+    """
+    Copies a file atomically, so that dst is either its previous or its new version.
+
+    Parameters:
+    - src (str): Path of the file to copy.
+    - dst (str): Path of the copy.
+    """
+    with atomic_path(dst) as tmp_path:
+        shutil.copyfile(src, tmp_path)
+
+class ArtifactWriter:
+    """
+    Buffers small text writes to several files and writes each file once, atomically.
+
+    Text written or appended to a path is kept in memory, and commit() replaces each file
+    changed since the last commit with everything written to it through the writer.
+    Re-running a pipeline therefore rewrites its files rather than growing them, and runs
+    writing to the same files in parallel never interleave their output: each file holds
+    the complete output of one of the runs.
+
+    Used as a context manager, changed files are committed when the block exits normally
+    and left untouched if it raises.
+
+    Attributes:
+        folder (str): Directory relative paths are resolved against.
+    """
+    def __init__(self, folder: str = '.') -> None:
+        """
+        Initializes an ArtifactWriter with no buffered writes.
+
+        Parameters:
+        - folder (str): Directory relative paths are resolved against.
+        """
+        self.folder = folder
+        self._buffers: dict[str, io.StringIO] = {}
+        self._changed: set[str] = set()
+
+    def write(self, path: str, text: str) -> None:
+        """
+        Replaces the buffered content of a file with text.
+
+        Parameters:
+        - path (str): Path of the file.
+        - text (str): Content of the file.
+        """
+        path = os.path.join(self.folder, path)
+        self._buffers[path] = io.StringIO()
+        self._buffers[path].write(text)
+        self._changed.add(path)
+
+    def append(self, path: str, text: str) -> None:
+        """
+        Adds text to the buffered content of a file.
+
+        Parameters:
+        - path (str): Path of the file.
+        - text (str): Text to add.
+        """
+        path = os.path.join(self.folder, path)
+        self._buffers.setdefault(path, io.StringIO()).write(text)
+        self._changed.add(path)
+
+    def commit(self) -> list[str]:
+        """
+        Writes every file changed since the last commit atomically.
+
+        Returns:
+        - list[str]: Paths of the written files.
+        """
+        written = sorted(self._changed)
+        for path in written:
+            atomic_write_text(path, self._buffers[path].getvalue())
+        self._changed.clear()
+        return written
+
+    def __enter__(self) -> "ArtifactWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        if exc_type is None:
+            self.commit()
+
 def save_to_csv(data: Any, file_name: str, path: str):
     """
     Saves data to a CSV file, supporting both DataFrames and dictionaries.
 
     This function takes a `pandas.DataFrame` or a dictionary as input and saves it as a CSV file.
     If a dictionary is provided, it is first converted to a single-row DataFrame before saving.
-    The resulting CSV file is saved to the specified path with the given file name.
+    The resulting CSV file is saved atomically to the specified path with the given file name.
 
     Parameters:
     - data (Any): The data to save, which can be either a `pandas.DataFrame` or a dictionary.
@@ -25,7 +200,95 @@ def save_to_csv(data: Any, file_name: str, path: str):
     """
     path = f"{path}/{file_name}"
     if isinstance(data, pd.DataFrame):
-        data.to_csv(path, index=False)
+        converted_data = data
     elif isinstance(data, dict):
         converted_data = pd.DataFrame([data])
-        converted_data.to_csv(path, index=False)
+    else:
+        return
+    with atomic_path(path) as tmp_path:
+        converted_data.to_csv(tmp_path, index=False)
+
+def _write_csv(data: pd.DataFrame, path: str, compression: Optional[str]) -> None:
+    """Writes a CSV file, uncompressed by default."""
+    data.to_csv(path, index=False, compression=compression)
+
+def _write_parquet(data: pd.DataFrame, path: str, compression: Optional[str]) -> None:
+    """Writes a Parquet file, snappy-compressed by default."""
+    import_pyarrow()
+    data.to_parquet(path, index=False, compression=compression or 'snappy')
+
+def _write_arrow(data: pd.DataFrame, path: str, compression: Optional[str]) -> None:
+    """Writes an Arrow IPC file, lz4-compressed by default."""
+    import_pyarrow()
+    data.reset_index(drop=True).to_feather(path, compression=compression or 'lz4')
+
+# writers by format: function(DataFrame, path, compression) and file extension
+WRITERS: dict[str, tuple[Callable[[pd.DataFrame, str, Optional[str]], None], str]] = {
+    'csv': (_write_csv, '.csv'),
+    'parquet': (_write_parquet, '.parquet'),
+    'arrow': (_write_arrow, '.arrow'),
+}
+
+def register_writer(fmt: str, writer: Callable[[pd.DataFrame, str, Optional[str]], None],
+                    extension: str) -> None:
+    """
+    Adds a format that save_data can write.
+
+    Parameters:
+    - fmt (str): Name of the format.
+    - writer (callable): Function writing a DataFrame to a path with a compression codec,
+      which is None for the format's default.
+    - extension (str): Extension of the files of this format, including the dot.
+    """
+    WRITERS[fmt] = (writer, extension)
+
+def to_frame(data: Union[pd.DataFrame, dict]) -> pd.DataFrame:
+    """
+    Converts data to a DataFrame. A dictionary of equally long sequences becomes one
+    column per key, any other dictionary becomes a single row.
+
+    Parameters:
+    - data (pd.DataFrame or dict): The data to convert.
+
+    Returns:
+    - pd.DataFrame: The data as a DataFrame.
+
+    Raises:
+    - TypeError: If data is neither a DataFrame nor a dictionary.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data
+    if not isinstance(data, dict):
+        raise TypeError(f"Cannot save data of type {type(data).__name__}")
+    lengths = {
+        len(value) if pd.api.types.is_list_like(value) else None for value in data.values()
+    }
+    if len(lengths) == 1 and None not in lengths:
+        return pd.DataFrame(data)
+    return pd.DataFrame([data])
+
+def save_data(data: Union[pd.DataFrame, dict], file_name: str, path: str, fmt: str = 'csv',
+              compression: Optional[str] = None) -> str:
+    """
+    Saves data atomically with the writer of a format, adding the format's extension to the
+    file name.
+
+    Parameters:
+    - data (pd.DataFrame or dict): The data to save, see to_frame for dictionaries.
+    - file_name (str): The name of the file, without path or extension.
+    - path (str): The directory path where the file will be saved.
+    - fmt (str): Format of the file, a key of WRITERS.
+    - compression (str): Compression codec, such as 'gzip' for CSV, 'snappy' or 'zstd' for
+      Parquet and 'lz4' or 'zstd' for Arrow IPC. Each format's default is used if omitted.
+
+    Returns:
+    - str: Path of the saved file.
+
+    Raises:
+    - KeyError: If the format has no writer.
+    """
+    writer, extension = WRITERS[fmt]
+    file_path = os.path.join(path, file_name + extension)
+    with atomic_path(file_path) as tmp_path:
+        writer(to_frame(data), tmp_path, compression)
+    return file_path
@@ -0,0 +1,228 @@
+"""
+This script benchmarks the database creation pipeline on synthetic restriction
+datasets, so that regressions in ingest time can be tracked as the data grows.
+
+Functions:
+    - write_synthetic_datasets(): Writes daily, weekly and summary CSV files with a
+      given number of rows and random restriction flags.
+    - bench_reshape(): Times the wide-to-long reshaping performed by Frames.
+    - bench_insert(): Populates a database and reports rows/sec per table.
+    - bench_formats(): Converts the datasets to Parquet and Arrow IPC and compares the
+      time taken to load them in each format, whole and in chunks.
+    - bench_append(): Times incremental updates appending the same number of days
+      to databases holding increasingly long histories.
+    - main(): Parses the command line and runs the benchmarks.
+
+Usage:
+    python coursework1/database_creation/benchmark.py --rows 1000000
+    python coursework1/database_creation/benchmark.py --rows 1000000 --formats
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Optional
+import numpy as np
+import pandas as pd
+from frames import FLAG_COLUMNS, Frames, read_restrictions
+from create_db import Tables
+
+def write_synthetic_datasets(folder: str, rows: int, seed: int = 0) -> tuple[str, str, str]:
+    """
+    Writes synthetic daily, weekly and summary datasets with the same layout as the
+    real restriction files.
+
+    Parameters:
+        folder (str): Directory the CSV files are written to.
+        rows (int): Number of rows in the daily dataset.
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        tuple[str, str, str]: Paths to the daily, weekly and summary CSV files.
+    """
+    rng = np.random.default_rng(seed)
+    keys = pd.Series(np.arange(rows)).map('d{:09d}'.format)
+    flags = rng.integers(0, 2, size=(rows, len(FLAG_COLUMNS)), dtype=np.int8)
+    daily = pd.DataFrame(flags, columns=FLAG_COLUMNS)
+    daily.insert(0, 'date', keys)
+
+    weekly = daily.iloc[::7].rename(columns={'date': 'week_start'})
+
+    n_events = max(1, rows // 50)
+    summary = daily.sample(n=n_events, random_state=seed).sort_index()
+    summary.insert(1, 'restriction', 'synthetic event')
+    summary.insert(2, 'source', [f'source-{i % 100}' for i in range(n_events)])
+
+    paths = tuple(os.path.join(folder, f"restrictions_{name}.csv")
+                  for name in ('daily', 'weekly', 'summary'))
+    for frame, path in zip((daily, weekly, summary), paths):
+        frame.to_csv(path, index=False)
+    return paths
+
+def bench_reshape(frames: Frames) -> dict[str, float]:
+    """
+    Times the construction of the three restriction DataFrames.
+
+    Parameters:
+        frames (Frames): Frames instance loaded with the datasets to reshape.
+
+    Returns:
+        dict[str, float]: Seconds taken per restriction DataFrame.
+    """
+    timings = {}
+    for name in ('get_daily_restriction_df', 'get_weekly_restriction_df',
+                 'get_summary_restriction_df'):
+        start = time.perf_counter()
+        res = getattr(frames, name)()
+        timings[name] = time.perf_counter() - start
+        print(f"{name}: {len(res)} rows in {timings[name]:.3f}s")
+    return timings
+
+def bench_insert(db_path: str, paths: tuple[str, str, str], parallel: bool = False,
+                 chunksize: Optional[int] = None, memory: bool = False) -> dict[str, float]:
+    """
+    Populates every table through the bulk insert path with load-time PRAGMAs.
+
+    Parameters:
+        db_path (str): Path to the (empty) SQLite database to populate.
+        paths (tuple[str, str, str]): Paths to the daily, weekly and summary CSV files.
+        parallel (bool): Whether to build the restriction tables in a process pool.
+        chunksize (int): Rows per chunk to stream the daily and weekly datasets in.
+        memory (bool): Whether to trace the peak memory allocated, which slows the load.
+
+    Returns:
+        dict[str, float]: Rows per second achieved for each table.
+    """
+    tables = Tables(
+        db_path, *paths,
+        pragmas={'journal_mode': 'MEMORY', 'synchronous': 'OFF', 'cache_size': -64000},
+        parallel=parallel, chunksize=chunksize
+        )
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    tables.generate()
+    print(f"generate: {time.perf_counter() - start:.3f}s")
+    if memory:
+        print(f"peak memory: {tracemalloc.get_traced_memory()[1] / 2**20:,.1f} MiB")
+        tracemalloc.stop()
+    for table, rate in tables.insert_rates.items():
+        print(f"{table}: {rate:,.0f} rows/s")
+    return tables.insert_rates
+
+def bench_formats(paths: tuple[str, str, str], chunksize: int = 100_000
+                  ) -> dict[str, dict[str, float]]:
+    """
+    Converts the CSV datasets to Parquet and Arrow IPC files, keeping the compact column
+    types read_restrictions gives them, then times loading the three datasets from each
+    format with read_restrictions, whole and in chunks, and building Frames from them.
+
+    Parameters:
+        paths (tuple[str, str, str]): Paths to the daily, weekly and summary CSV files.
+        chunksize (int): Rows per chunk of the chunked reads.
+
+    Returns:
+        dict[str, dict[str, float]]: Seconds taken by each read for each format.
+    """
+    formats = {'csv': paths}
+    for fmt, extension, writer in (
+            ('parquet', '.parquet', lambda df, path: df.to_parquet(path, compression='snappy')),
+            ('arrow', '.arrow', lambda df, path: df.to_feather(path, compression='lz4'))):
+        formats[fmt] = tuple(os.path.splitext(path)[0] + extension for path in paths)
+        for src, dst in zip(paths, formats[fmt]):
+            writer(read_restrictions(src), dst)
+
+    timings = {}
+    for fmt, fmt_paths in formats.items():
+        size = sum(os.path.getsize(path) for path in fmt_paths)
+        start = time.perf_counter()
+        for path in fmt_paths:
+            read_restrictions(path)
+        whole = time.perf_counter() - start
+        start = time.perf_counter()
+        for path in fmt_paths:
+            for _ in read_restrictions(path, chunksize=chunksize):
+                pass
+        chunked = time.perf_counter() - start
+        start = time.perf_counter()
+        Frames(*fmt_paths)
+        frames = time.perf_counter() - start
+        timings[fmt] = {'whole': whole, 'chunked': chunked, 'frames': frames}
+        print(f"{fmt}: {size / 2**20:,.1f} MiB, load {whole:.3f}s, "
+              f"chunked load {chunked:.3f}s, Frames {frames:.3f}s")
+    return timings
+
+def bench_append(folder: str, histories: list[int], new_rows: int) -> dict[int, float]:
+    """
+    Times Tables.update() appending new_rows days to databases that already hold
+    each of the given numbers of days. The database writes only cover the appended
+    days, so their cost stays flat as history grows; what remains is a vectorized
+    comparison of the dataset keys against those already stored.
+
+    Parameters:
+        folder (str): Directory for the synthetic datasets and databases.
+        histories (list[int]): Numbers of days already loaded before the append.
+        new_rows (int): Number of days appended.
+
+    Returns:
+        dict[int, float]: Seconds taken by the update for each history size.
+    """
+    timings = {}
+    for history in histories:
+        run_folder = os.path.join(folder, f"append_{history}")
+        os.makedirs(run_folder)
+        paths = write_synthetic_datasets(run_folder, history + new_rows)
+        daily, summary = pd.read_csv(paths[0]), pd.read_csv(paths[2])
+        daily.iloc[:history].to_csv(paths[0], index=False)
+        summary[summary['date'].isin(daily['date'].iloc[:history])].to_csv(paths[2], index=False)
+        db_path = os.path.join(run_folder, "bench.db")
+        Tables(db_path, *paths).generate()
+
+        daily.to_csv(paths[0], index=False)
+        summary.to_csv(paths[2], index=False)
+        tables = Tables(db_path, *paths)
+        start = time.perf_counter()
+        tables.update()
+        timings[history] = time.perf_counter() - start
+        print(f"append {new_rows} days to {history} days of history: {timings[history]:.3f}s "
+              f"(DailyRestriction insert {tables.insert_rates['DailyRestriction']:,.0f} rows/s)")
+    return timings
+
+def main() -> None:
+    """Runs the benchmarks on synthetic datasets"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--rows', type=int, default=1_000_000,
+                        help="number of rows in the synthetic daily dataset")
+    parser.add_argument('--skip-insert', action='store_true',
+                        help="only benchmark the DataFrame reshaping")
+    parser.add_argument('--parallel', action='store_true',
+                        help="build the restriction tables in a process pool")
+    parser.add_argument('--chunksize', type=int,
+                        help="stream the daily and weekly datasets in chunks of this many rows")
+    parser.add_argument('--memory', action='store_true',
+                        help="trace the peak memory of the insert benchmark")
+    parser.add_argument('--formats', action='store_true',
+                        help="compare load times from CSV, Parquet and Arrow IPC files instead")
+    parser.add_argument('--append', type=int, nargs='*', metavar='HISTORY',
+                        help="benchmark incremental appends onto these history sizes instead")
+    parser.add_argument('--new-rows', type=int, default=1000,
+                        help="number of days appended by the incremental benchmark")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        if args.append is not None:
+            bench_append(folder, args.append or [10_000, 100_000, 1_000_000], args.new_rows)
+            return
+        paths = write_synthetic_datasets(folder, args.rows)
+        if args.formats:
+            bench_formats(paths, args.chunksize or 100_000)
+            return
+        if args.chunksize is None:
+            bench_reshape(Frames(*paths))
+        if not args.skip_insert:
+            bench_insert(os.path.join(folder, "bench.db"), paths, parallel=args.parallel,
+                         chunksize=args.chunksize, memory=args.memory)
+
+if __name__ == "__main__":
+    main()
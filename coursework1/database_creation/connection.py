@@ -0,0 +1,120 @@
+"""
+This script provides the ConnectionPool class, which hands out persistent SQLite
+connections that can be shared by DatabaseManager, Tables and Queries instead of
+opening a new connection for every operation.
+
+Classes:
+    - ConnectionPool: Keeps one open connection per thread for a database and
+      provides context-managed transactions on it.
+"""
+from contextlib import contextmanager
+from typing import Any, Iterator
+import sqlite3
+import threading
+
+class ConnectionPool:
+    """
+    Pool of persistent SQLite connections to a single database, one per thread.
+
+    A thread's connection is opened on first use and reused by every later call made
+    from that thread, so many small queries do not pay the cost of connecting each time.
+    SQLite connections must not be used concurrently, which is why threads never share one.
+
+    Attributes:
+        _db (str): Path to the SQLite database.
+        _connect_kwargs (dict): Extra keyword arguments passed to sqlite3.connect.
+        _local (threading.local): Holds the connection and transaction depth of each thread.
+        _connections (list): Every connection opened by the pool, so they can be closed.
+    """
+    def __init__(self, db_path: str, **connect_kwargs: Any) -> None:
+        """
+        Initializes the ConnectionPool with the path to the database.
+
+        Parameters:
+            db_path (str): Path to the SQLite database file.
+            connect_kwargs: Extra keyword arguments passed to sqlite3.connect.
+        """
+        self._db = db_path
+        self._connect_kwargs = connect_kwargs
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    @property
+    def db_path(self) -> str:
+        """Path to the SQLite database the pool connects to."""
+        return self._db
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection, opening it on first use.
+
+        Returns:
+            sqlite3.Connection: Connection owned by the calling thread.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._db, check_same_thread=False, **self._connect_kwargs)
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def in_transaction(self) -> bool:
+        """Whether the calling thread is inside a transaction() block."""
+        return getattr(self._local, 'depth', 0) > 0
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Context manager yielding the calling thread's connection inside a transaction.
+
+        The transaction is committed when the outermost block exits normally and rolled
+        back if it exits with an exception. Nested blocks join the enclosing transaction
+        under a SAVEPOINT: a nested block exiting with an exception only undoes its own
+        changes, and the enclosing block decides what happens to the rest.
+
+        Yields:
+            sqlite3.Connection: Connection owned by the calling thread.
+        """
+        conn = self.connection()
+        self._local.depth += 1
+        savepoint = None
+        try:
+            if self._local.depth > 1:
+                if not conn.in_transaction:
+                    # a savepoint outside a transaction would commit on release
+                    conn.execute("BEGIN")
+                savepoint = f"nested_{self._local.depth}"
+                conn.execute(f"SAVEPOINT {savepoint}")
+            yield conn
+        except BaseException:
+            if savepoint is not None:
+                if conn.in_transaction:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+            elif self._local.depth == 1:
+                conn.rollback()
+            raise
+        else:
+            if savepoint is not None:
+                conn.execute(f"RELEASE {savepoint}")
+            elif self._local.depth == 1:
+                conn.commit()
+        finally:
+            self._local.depth -= 1
+
+    def close(self) -> None:
+        """Closes every connection opened by the pool."""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def __enter__(self) -> "ConnectionPool":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
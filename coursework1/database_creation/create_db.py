@@ -18,10 +18,23 @@ Functions:
 Usage:
     Run this script as a standalone program to create the database structure, insert
     data from specified CSV files, and display the resulting tables in the database.
+    Pass --incremental to only add new dates, weeks and summary events to an existing
+    database, or --parallel to build the restriction tables in a process pool.
 """
-from typing import Any
+import argparse
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain, islice
+from typing import Any, Iterable, Iterator, Optional
+import re
 import sqlite3
+import time
+import numpy as np
+import pandas as pd
+from connection import ConnectionPool
 from frames import Frames
+from restriction_set import RestrictionSet
+from streaming import iter_batches, open_stream, print_pages
 class DatabaseManager:
     """
     Manages database operations such as creating tables, inserting data,
@@ -29,21 +42,25 @@ class DatabaseManager:
 
     Attributes:
         _db (str): Path to the SQLite database.
+        _pool (ConnectionPool): Pool providing the connections used by every operation.
     """
-    def __init__(self, db_path: str) -> None:
+    def __init__(self, db_path: str, pool: Optional[ConnectionPool] = None) -> None:
         """
         Initializes the DatabaseManager with the path to the database.
 
         Parameters:
             db_path (str): Path to the SQLite database file.
+            pool (ConnectionPool): Pool to share with other objects. A private pool
+                                   over db_path is created when omitted.
         """
         self._db = db_path
+        self._pool = pool if pool is not None else ConnectionPool(db_path)
 
     def show_tables(self) -> None:
         """
         Connects to an SQLite database and prints all table names.
         """
-        with sqlite3.connect(self._db) as conn:
+        with self._pool.transaction() as conn:
             try:
                 cursor = conn.cursor()
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
@@ -64,7 +81,7 @@ class DatabaseManager:
         Parameters:
             table: The name of the table to retrieve the fields from.
         """
-        with sqlite3.connect(self._db) as conn:
+        with self._pool.transaction() as conn:
             try:
                 cursor = conn.cursor()
                 cursor.execute(f"PRAGMA table_info({table});")
@@ -78,28 +95,51 @@ class DatabaseManager:
             except sqlite3.Error as err:
                 print(f"An error occurred: {err}")
 
-    def read_table_vals(self, table: str) -> None:
+    def iter_query(self, query: str, params: Any = (), batch_size: int = 10_000,
+                   output: str = 'rows') -> Iterator[Any]:
         """
-        Connects to an SQLite database and prints all the values in a given table.
+        Runs a query and yields its result in batches fetched with fetchmany, so that
+        memory use is bounded by batch_size however large the result.
+
+        Parameters:
+            query (str): The query, with ? or :name placeholders for params.
+            params (sequence or dict): Parameters bound to the query.
+            batch_size (int): Number of rows fetched at a time.
+            output (str): 'rows', 'frame' or 'numpy', see streaming.iter_batches.
+
+        Yields:
+            list[tuple], pd.DataFrame or np.ndarray: The next batch of rows.
+        """
+        yield from iter_batches(self._pool.connection(), query, params, batch_size, output)
+
+    def read_table_vals(self, table: str, page_size: int = 50,
+                        max_pages: Optional[int] = None) -> None:
+        """
+        Connects to an SQLite database and prints all the values in a given table,
+        page by page. Rows are streamed from the database rather than loaded at once.
 
         Parameters:
             table: The name of the table to retrieve the values from.
+            page_size (int): Number of rows per page.
+            max_pages (int): Number of pages after which printing stops, all are
+                             printed if not given.
         """
-        with sqlite3.connect(self._db) as conn:
+        try:
+            columns, batches = open_stream(
+                self._pool.connection(), f"SELECT * FROM {table}", batch_size=page_size
+                )
             try:
-                cursor = conn.cursor()
-                cursor.execute(f"SELECT * FROM {table}")
-                rows = cursor.fetchall()
-                column_names = [description[0] for description in cursor.description]
-                if rows:
-                    print(f"Values in the table '{table}':")
-                    print(f"{' | '.join(column_names)}")
-                    for row in rows:
-                        print(row)
-                else:
+                rows = (row for batch in batches for row in batch)
+                first = next(rows, None)
+                if first is None:
                     print(f"The table '{table}' is empty or does not exist.")
-            except sqlite3.Error as err:
-                print(f"An error occurred: {err}")
+                    return
+                print(f"Values in the table '{table}':")
+                print_pages(chain([first], rows), columns, page_size, max_pages)
+            finally:
+                batches.close()
+        except sqlite3.Error as err:
+            print(f"An error occurred: {err}")
 
     def delete_table(self, table_name: str) -> None:
         """
@@ -107,29 +147,51 @@ class DatabaseManager:
 
         Parameters:
             table_name (str): The name of the table to delete.
+
+        Raises:
+            sqlite3.DatabaseError: If the table could not be dropped.
         """
-        with sqlite3.connect(self._db) as conn:
+        with self._pool.transaction() as conn:
             cursor = conn.cursor()
             try:
                 cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
-                conn.commit()
                 print(f"Table '{table_name}' has been deleted from the database '{self._db}'.")
             except sqlite3.DatabaseError as db_err:
                 print(f"Database error occurred: {db_err}")
+                raise
 
-    def insert_data(self, table_name: str, data: list[tuple[Any, ...]]) -> None:
+    def insert_data(self, table_name: str, data: Iterable[tuple[Any, ...]], bulk: bool = False,
+                    chunk_size: int = 10_000, pragmas: Optional[dict[str, Any]] = None,
+                    upsert: bool = False) -> Optional[float]:
         """
         Inserts data into an SQLite table.
 
+        By default every row is executed on its own. In bulk mode the rows are streamed
+        through executemany in chunks of chunk_size inside one explicit transaction, so
+        data may be any iterable (e.g. a generator) and is never fully materialised.
+        Either every row is inserted or, on error, none are and the error is raised.
+
         Parameters:
         - table_name (str): Name of the table to insert data into.
-        - data (list of tuples): List of tuples, each tuple represents a row of data.
+        - data (iterable of tuples): Tuples, each tuple represents a row of data.
                                 Example: [(1, '2023-01-01'), (2, '2023-01-02')]
+        - bulk (bool): Whether to use the bulk, transactional insert path.
+        - chunk_size (int): Number of rows passed to each executemany call in bulk mode.
+        - pragmas (dict): PRAGMAs set for the duration of a bulk load and restored
+                          afterwards. Example: {'journal_mode': 'MEMORY', 'synchronous': 'OFF',
+                          'cache_size': -64000}
+        - upsert (bool): Whether rows replace existing rows with the same primary key
+                         or unique index key instead of failing.
+
+        Returns:
+        - float: The insertion rate in rows per second in bulk mode, None otherwise.
         """
-        with sqlite3.connect(self._db) as conn:
+        if bulk:
+            return self._bulk_insert(table_name, data, chunk_size, pragmas or {}, upsert)
+        data = list(data)
+        with self._pool.transaction() as conn:
             cursor = conn.cursor()
-            placeholders = ', '.join(['?' for _ in data[0]])
-            insert_sql = f"INSERT INTO {table_name} VALUES ({placeholders})"
+            insert_sql = self._insert_sql(table_name, len(data[0]), upsert)
 
             try:
                 for row in data:
@@ -137,29 +199,185 @@ class DatabaseManager:
                 print(f"Inserted {len(data)} rows into '{table_name}' successfully.")
             except sqlite3.Error as e:
                 print(f"An error occurred: {e}")
-            finally:
-                conn.commit()
+                raise
+        return None
+
+    @staticmethod
+    def _insert_sql(table_name: str, n_cols: int, upsert: bool) -> str:
+        """
+        Builds the parameterized INSERT statement for a table.
+
+        Parameters:
+            table_name (str): Name of the table to insert data into.
+            n_cols (int): Number of values per row.
+            upsert (bool): Whether conflicting rows are replaced.
+
+        Returns:
+            str: The INSERT statement.
+        """
+        placeholders = ', '.join(['?'] * n_cols)
+        verb = "INSERT OR REPLACE" if upsert else "INSERT"
+        return f"{verb} INTO {table_name} VALUES ({placeholders})"
+
+    def _bulk_insert(self, table_name: str, data: Iterable[tuple[Any, ...]], chunk_size: int,
+                     pragmas: dict[str, Any], upsert: bool = False) -> Optional[float]:
+        """
+        Streams rows into a table with executemany inside a single pooled transaction.
+        Inside an enclosing transaction, the load runs under a savepoint that is rolled
+        back if it fails, so it never leaves part of the rows behind.
 
-    def create_table(self, table_name: str, cols_dict: dict[str, str]) -> None:
+        Parameters:
+            table_name (str): Name of the table to insert data into.
+            data (iterable of tuples): Rows to insert.
+            chunk_size (int): Number of rows per executemany call.
+            pragmas (dict): PRAGMAs to set for the duration of the load.
+            upsert (bool): Whether conflicting rows are replaced.
+
+        Returns:
+            float: The insertion rate in rows per second.
+
+        Raises:
+            ValueError: If pragmas are given inside an enclosing transaction, where
+                some of them, such as journal_mode, cannot be changed.
+            sqlite3.Error: If the load failed, after rolling it back.
+        """
+        if pragmas and self._pool.in_transaction():
+            raise ValueError("PRAGMAs cannot be set for a bulk load inside a transaction")
+        rows = iter(data)
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            print(f"No rows to insert into '{table_name}'.")
+            return 0.0
+        insert_sql = self._insert_sql(table_name, len(chunk[0]), upsert)
+
+        cursor = self._pool.connection().cursor()
+        previous = {}
+        count = 0
+        start = time.perf_counter()
+        try:
+            for name, value in pragmas.items():
+                previous[name] = cursor.execute(f"PRAGMA {name};").fetchone()[0]
+                cursor.execute(f"PRAGMA {name} = {value};")
+            with self._pool.transaction():
+                while chunk:
+                    cursor.executemany(insert_sql, chunk)
+                    count += len(chunk)
+                    chunk = list(islice(rows, chunk_size))
+        except sqlite3.Error as e:
+            print(f"An error occurred: {e}")
+            raise
+        finally:
+            for name, value in previous.items():
+                cursor.execute(f"PRAGMA {name} = {value};")
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed > 0 else float('inf')
+        print(f"Inserted {count} rows into '{table_name}' successfully ({rate:,.0f} rows/s).")
+        return rate
+
+    def create_table(self, table_name: str, cols_dict: dict[str, str],
+                     if_not_exists: bool = False) -> None:
         """
         Creates a table in the database with specified columns.
 
         Parameters:
             table_name (str): Name of the table to create.
             cols_dict (dict): Column names as keys and data types as values.
+            if_not_exists (bool): Whether an existing table is silently kept.
+
+        Raises:
+            sqlite3.Error: If the table could not be created.
         """
-        with sqlite3.connect(self._db) as conn:
+        # foreign_keys cannot be changed inside a transaction, so it is set before
+        self._pool.connection().execute("PRAGMA foreign_keys = ON;")
+        with self._pool.transaction() as conn:
             cursor = conn.cursor()
-            cursor.execute("PRAGMA foreign_keys = ON;")
             cols_str = f"({', '.join([f'{col_name} {constraint.upper()}' for col_name, constraint in cols_dict.items()])})"
-            query = f"CREATE TABLE {table_name} {cols_str}"
+            create = "CREATE TABLE IF NOT EXISTS" if if_not_exists else "CREATE TABLE"
+            query = f"{create} {table_name} {cols_str}"
             try:
                 cursor.execute(query)
                 print(f"Table '{table_name}' created successfully.")
             except sqlite3.Error as err:
                 print(f"An error occurred: {err}")
-            finally:
-                conn.commit()
+                raise
+
+    def create_index(self, table_name: str, cols: Iterable[str], unique: bool = False) -> None:
+        """
+        Creates an index over columns of a table unless it already exists.
+
+        Parameters:
+            table_name (str): Name of the table to index.
+            cols (iterable of str): Indexed column names.
+            unique (bool): Whether the indexed columns must be unique.
+
+        Raises:
+            sqlite3.Error: If the index could not be created.
+        """
+        cols = list(cols)
+        index_name = f"idx_{table_name}_{'_'.join(cols)}"
+        create = "CREATE UNIQUE INDEX" if unique else "CREATE INDEX"
+        with self._pool.transaction() as conn:
+            try:
+                conn.execute(
+                    f"{create} IF NOT EXISTS {index_name} ON {table_name} ({', '.join(cols)});"
+                    )
+            except sqlite3.Error as err:
+                print(f"An error occurred: {err}")
+                raise
+
+    def read_column_map(self, table_name: str, key_col: str, id_col: str) -> dict[Any, int]:
+        """
+        Reads a mapping from a key column to an ID column of a table.
+
+        Parameters:
+            table_name (str): Name of the table to read.
+            key_col (str): Column holding the keys.
+            id_col (str): Column holding the IDs.
+
+        Returns:
+            dict: Keys mapped to IDs, empty if the table does not exist.
+        """
+        with self._pool.transaction() as conn:
+            try:
+                return dict(conn.execute(f"SELECT {key_col}, {id_col} FROM {table_name};"))
+            except sqlite3.OperationalError:
+                return {}
+
+class _LazyFrame:
+    """
+    Descriptor for a DataFrame of Tables that is built with a Frames method on first
+    access and cached until it is invalidated or the datasets change on disk.
+
+    Attributes:
+        getter (str): Name of the Frames method building the DataFrame.
+        name (str): Name of the attribute the descriptor is bound to.
+    """
+    def __init__(self, getter: str) -> None:
+        """
+        Initializes the descriptor with the method building the DataFrame.
+
+        Parameters:
+            getter (str): Name of the Frames method building the DataFrame.
+        """
+        self.getter = getter
+        self.name = getter
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, obj: Optional["Tables"], objtype: Optional[type] = None) -> Any:
+        if obj is None:
+            return self
+        obj.check_datasets()
+        if self.name not in obj._frames_cache:
+            obj._frames_cache[self.name] = getattr(obj, self.getter)()
+        return obj._frames_cache[self.name]
+
+    def __set__(self, obj: "Tables", value: pd.DataFrame) -> None:
+        obj._frames_cache[self.name] = value
+
+    def __delete__(self, obj: "Tables") -> None:
+        obj._frames_cache.pop(self.name, None)
 
 class Tables(Frames):
     """
@@ -171,8 +389,91 @@ class Tables(Frames):
         daily_path (str): Path to the daily dataset CSV file.
         weekly_path (str): Path to the weekly dataset CSV file.
         summary_path (str): Path to the summary dataset CSV file.
+        bulk (bool): Whether tables are populated through the bulk insert path.
+        chunk_size (int): Rows per executemany call when loading in bulk.
+        pragmas (dict): PRAGMAs set for the duration of each bulk load.
+        insert_rates (dict): Rows per second achieved for each table loaded in bulk.
+        _pool (ConnectionPool): Pool shared by every table operation.
+        _manager (DatabaseManager): Manager used to create and populate the tables.
+        SCHEMA (dict): Columns of every table, in foreign-key order.
+        FACT_KEYS (dict): Columns identifying the date, week or summary event a row of
+                          each restriction table belongs to.
+        FRAMES (dict): Attribute holding the DataFrame of each table and the Frames
+                       method building it.
+        parallel (bool): Whether generate() builds the restriction DataFrames in a
+                         process pool while writing tables as they become ready.
+        masks (bool): Whether generate() also populates the DailyRestrictionMask table.
+        max_workers (int): Maximum number of worker processes in parallel mode.
+        _frames_cache (dict): DataFrames built so far, by attribute name.
+        _fingerprint (tuple): Modification time and size of each dataset when loaded.
+
+    The DataFrames listed in FRAMES are built on first access and cached, so callers
+    that only populate some tables never build the others.
     """
-    def __init__(self, db_path: str, daily_path: str, weekly_path: str, summary_path: str) -> None:
+    SCHEMA = {
+        "Date": {
+            "date": "TEXT NOT NULL",
+            "date_id":"INTEGER PRIMARY KEY",
+        },
+        "Week": {
+            "week_start": "TEXT NOT NULL",
+            "week_id":"INTEGER PRIMARY KEY",
+        },
+        "Restriction": {
+            "restriction": "TEXT NOT NULL",
+            "restriction_id":"INTEGER PRIMARY KEY",
+        },
+        "Source": {
+            "source": "TEXT NOT NULL",
+            "source_id":"INTEGER PRIMARY KEY",
+        },
+        "DailyRestriction": {
+            "date_id": "INTEGER NOT NULL REFERENCES Date(date_id)",
+            "restriction_id": "INTEGER NOT NULL REFERENCES Restriction(restriction_id)",
+            "in_place": "INTEGER NOT NULL CHECK (in_place <= 1 AND in_place >= 0)"
+        },
+        "WeeklyRestriction": {
+            "week_id": "INTEGER NOT NULL REFERENCES Week(week_id)",
+            "restriction_id": "INTEGER NOT NULL REFERENCES Restriction(restriction_id)",
+            "in_place": "INTEGER NOT NULL CHECK (in_place <= 1 AND in_place >= 0)"
+        },
+        "SummaryRestriction": {
+            "date_id": "INTEGER NOT NULL REFERENCES Date(date_id)",
+            "restriction_id": "INTEGER NOT NULL REFERENCES Restriction(restriction_id)",
+            "source_id": "INTEGER NOT NULL REFERENCES Source(source_id)",
+            "in_place": "INTEGER NOT NULL CHECK (in_place <= 1 AND in_place >= 0)"
+        },
+    }
+    FACT_KEYS = {
+        "DailyRestriction": ("date_id",),
+        "WeeklyRestriction": ("week_id",),
+        "SummaryRestriction": ("date_id", "source_id"),
+    }
+
+    FRAMES = {
+        "Date": ("date_df", "get_date_df"),
+        "Week": ("week_df", "get_week_df"),
+        "Restriction": ("restriction_df", "get_restriction_df"),
+        "Source": ("source_df", "get_source_df"),
+        "DailyRestriction": ("daily_restriction_df", "get_daily_restriction_df"),
+        "WeeklyRestriction": ("weekly_restriction_df", "get_weekly_restriction_df"),
+        "SummaryRestriction": ("summary_restriction_df", "get_summary_restriction_df"),
+    }
+
+    date_df = _LazyFrame("get_date_df")
+    week_df = _LazyFrame("get_week_df")
+    restriction_df = _LazyFrame("get_restriction_df")
+    source_df = _LazyFrame("get_source_df")
+    daily_restriction_df = _LazyFrame("get_daily_restriction_df")
+    weekly_restriction_df = _LazyFrame("get_weekly_restriction_df")
+    summary_restriction_df = _LazyFrame("get_summary_restriction_df")
+
+    def __init__(self, db_path: str, daily_path: str, weekly_path: str, summary_path: str,
+                 bulk: bool = True, chunk_size: int = 10_000,
+                 pragmas: Optional[dict[str, Any]] = None,
+                 pool: Optional[ConnectionPool] = None, parallel: bool = False,
+                 max_workers: Optional[int] = None, chunksize: Optional[int] = None,
+                 masks: bool = False) -> None:
         """
         Initializes the Tables class with database path and dataset paths.
 
@@ -181,137 +482,511 @@ class Tables(Frames):
             daily_path (str): Path to the daily dataset CSV file.
             weekly_path (str): Path to the weekly dataset CSV file.
             summary_path (str): Path to the summary dataset CSV file.
+            bulk (bool): Whether tables are populated through the bulk insert path.
+            chunk_size (int): Rows per executemany call when loading in bulk.
+            pragmas (dict): PRAGMAs set for the duration of each bulk load.
+            pool (ConnectionPool): Pool to share with other objects. A private pool
+                                   over db_path is created when omitted.
+            parallel (bool): Whether generate() builds the restriction DataFrames in a
+                             process pool.
+            max_workers (int): Maximum number of worker processes in parallel mode.
+            chunksize (int): Rows per chunk to stream the daily and weekly datasets in,
+                             see generate_streaming().
+            masks (bool): Whether generate() also populates the DailyRestrictionMask table.
         """
-        super().__init__(daily_path=daily_path, weekly_path=weekly_path, summary_path=summary_path)
+        self._paths = (daily_path, weekly_path, summary_path)
+        self._frames_cache = {}
+        self._fingerprint = self._dataset_fingerprint()
+        super().__init__(
+            daily_path=daily_path, weekly_path=weekly_path, summary_path=summary_path,
+            chunksize=chunksize
+            )
         self._db = db_path
-        self.date_df = self.get_date_df()
-        self.week_df = self.get_week_df()
-        self.source_df = self.get_source_df()
-        self.restriction_df = self.get_restriction_df()
-        self.summary_restriction_df = self.get_summary_restriction_df()
-        self.daily_restriction_df = self.get_daily_restriction_df()
-        self.weekly_restriction_df = self.get_weekly_restriction_df()
+        self.bulk = bulk
+        self.chunk_size = chunk_size
+        self.pragmas = pragmas
+        self.insert_rates = {}
+        self._pool = pool if pool is not None else ConnectionPool(db_path)
+        self._manager = DatabaseManager(db_path, pool=self._pool)
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.masks = masks
+
+    def _dataset_fingerprint(self) -> tuple[tuple[int, int], ...]:
+        """
+        Reads the modification time and size of each dataset file.
+
+        Returns:
+            tuple: (mtime in nanoseconds, size in bytes) of each dataset.
+        """
+        return tuple((stat.st_mtime_ns, stat.st_size) for stat in map(os.stat, self._paths))
+
+    def invalidate(self) -> None:
+        """Drops every cached DataFrame so that they are rebuilt on next access."""
+        self._frames_cache.clear()
+
+    def check_datasets(self) -> bool:
+        """
+        Reloads the datasets and drops every cached DataFrame if any dataset file has
+        changed on disk since it was loaded. ID mappings are rebuilt from the new data.
+
+        Returns:
+            bool: Whether the datasets were reloaded.
+        """
+        fingerprint = self._dataset_fingerprint()
+        if fingerprint == self._fingerprint:
+            return False
+        self._fingerprint = fingerprint
+        self.invalidate()
+        daily_path, weekly_path, summary_path = self._paths
+        super().__init__(
+            daily_path=daily_path, weekly_path=weekly_path, summary_path=summary_path,
+            chunksize=self.chunksize
+            )
+        return True
+
+    def _insert(self, manager: DatabaseManager, table_name: str, data: pd.DataFrame,
+                cols: dict[str, str], upsert: bool = False) -> Optional[float]:
+        """
+        Inserts the rows of a DataFrame into a table, recording the insertion rate
+        when loading in bulk.
+
+        Parameters:
+            manager (DatabaseManager): Manager connected to the database.
+            table_name (str): Name of the table to insert data into.
+            data (pd.DataFrame): DataFrame holding a column for every table column.
+            cols (dict): Columns of the table, used to insert values in table order.
+            upsert (bool): Whether conflicting rows are replaced.
+
+        Returns:
+            float: The insertion rate in rows per second in bulk mode, None otherwise.
+        """
+        rows = data[list(cols)].itertuples(index=False, name=None)
+        rate = manager.insert_data(
+            table_name, rows, bulk=self.bulk, chunk_size=self.chunk_size,
+            pragmas=self.pragmas, upsert=upsert
+            )
+        if rate is not None:
+            self.insert_rates[table_name] = rate
+        return rate
 
     def t_date(self) -> None:
         """Creates and populates the 'Date' table with data from date_df."""
-        manager = DatabaseManager(self._db)
-        cols = {
-            "date": "TEXT NOT NULL",
-            "date_id":"INTEGER PRIMARY KEY",
-        }
+        manager = self._manager
+        cols = self.SCHEMA["Date"]
         manager.create_table("Date", cols)
-        data = list(self.date_df.itertuples(index=False, name=None))
-        manager.insert_data("Date", data)
+        self._insert(manager, "Date", self.date_df, cols)
 
     def t_week(self) -> None:
         """Creates and populates the 'Week' table with data from week_df."""
-        manager = DatabaseManager(self._db)
-        cols = {
-            "week_start": "TEXT NOT NULL",
-            "week_id":"INTEGER PRIMARY KEY",
-        }
+        manager = self._manager
+        cols = self.SCHEMA["Week"]
         manager.create_table("Week", cols)
-        data = list(self.week_df.itertuples(index=False, name=None))
-        manager.insert_data("Week", data)
+        self._insert(manager, "Week", self.week_df, cols)
 
     def t_restriction(self) -> None:
         """Creates and populates the 'Restriction' table with data from restriction_df."""
-        manager = DatabaseManager(self._db)
-        cols = {
-            "restriction": "TEXT NOT NULL",
-            "restriction_id":"INTEGER PRIMARY KEY",
-        }
+        manager = self._manager
+        cols = self.SCHEMA["Restriction"]
         manager.create_table("Restriction", cols)
-        data = list(self.restriction_df.itertuples(index=False, name=None))
-        manager.insert_data("Restriction", data)
+        self._insert(manager, "Restriction", self.restriction_df, cols)
 
     def t_source(self) -> None:
         """Creates and populates the 'Source' table with data from source_df."""
-        manager = DatabaseManager(self._db)
-        cols = {
-            "source": "TEXT NOT NULL",
-            "source_id":"INTEGER PRIMARY KEY",
-        }
+        manager = self._manager
+        cols = self.SCHEMA["Source"]
         manager.create_table("Source", cols)
-        data = list(self.source_df.itertuples(index=False, name=None))
-        manager.insert_data("Source", data)
+        self._insert(manager, "Source", self.source_df, cols)
 
     def t_daily_restriction(self) -> None:
         """
         Creates and populates the 'DailyRestriction' table with data
         from daily_restriction_df.
         """
-        manager = DatabaseManager(self._db)
-        cols = {
-            "date_id": "INTEGER NOT NULL REFERENCES Date(date_id)",
-            "restriction_id": "INTEGER NOT NULL REFERENCES Restriction(restriction_id)",
-            "in_place": "INTEGER NOT NULL CHECK (in_place <= 1 AND in_place >= 0)"
-        }
+        manager = self._manager
+        cols = self.SCHEMA["DailyRestriction"]
         manager.create_table("DailyRestriction", cols)
-        data = list(self.daily_restriction_df.itertuples(index=False, name=None))
-        manager.insert_data("DailyRestriction", data)
+        self._insert(manager, "DailyRestriction", self.daily_restriction_df, cols)
 
     def t_weekly_restriction(self) -> None:
         """
         Creates and populates the 'WeeklyRestriction' table with data
         from weekly_restriction_df.
         """
-        manager = DatabaseManager(self._db)
-        cols = {
-            "week_id": "INTEGER NOT NULL REFERENCES Week(week_id)",
-            "restriction_id": "INTEGER NOT NULL REFERENCES Restriction(restriction_id)",
-            "in_place": "INTEGER NOT NULL CHECK (in_place <= 1 AND in_place >= 0)"
-        }
+        manager = self._manager
+        cols = self.SCHEMA["WeeklyRestriction"]
         manager.create_table("WeeklyRestriction", cols)
-        data = list(self.weekly_restriction_df.itertuples(index=False, name=None))
-        manager.insert_data("WeeklyRestriction", data)
+        self._insert(manager, "WeeklyRestriction", self.weekly_restriction_df, cols)
 
     def t_summary_restriction(self) -> None:
         """
         Creates and populates the 'SummaryRestriction' table with data
         from summary_restriction_df.
         """
-        manager = DatabaseManager(self._db)
-        cols = {
-            "date_id": "INTEGER NOT NULL REFERENCES Date(date_id)",
-            "restriction_id": "INTEGER NOT NULL REFERENCES Restriction(restriction_id)",
-            "source_id": "INTEGER NOT NULL REFERENCES Source(source_id)",
-            "in_place": "INTEGER NOT NULL CHECK (in_place <= 1 AND in_place >= 0)"
-        }
+        manager = self._manager
+        cols = self.SCHEMA["SummaryRestriction"]
         manager.create_table("SummaryRestriction", cols)
-        data = list(self.summary_restriction_df.itertuples(index=False, name=None))
-        manager.insert_data("SummaryRestriction", data)
+        self._insert(manager, "SummaryRestriction", self.summary_restriction_df, cols)
 
-    def generate(self) -> None:
+    def t_daily_restriction_mask(self, data: Optional[pd.DataFrame] = None) -> None:
+        """
+        Creates the 'DailyRestrictionMask' table if missing and populates it with one
+        bitmask of the restrictions in place per date (bit i for the i-th restriction_id),
+        a compact alternative to the rows of 'DailyRestriction'.
+
+        Parameters:
+            data (pd.DataFrame): Rows of daily_restriction_df to build the masks from,
+                                 upserting them. Defaults to the whole DailyRestriction
+                                 table.
+        """
+        manager = self._manager
+        cols = {
+            "date_id": "INTEGER PRIMARY KEY REFERENCES Date(date_id)",
+            "mask": "INTEGER NOT NULL"
+        }
+        manager.create_table("DailyRestrictionMask", cols, if_not_exists=True)
+        if data is None:
+            with self._pool.transaction() as conn:
+                masks = RestrictionSet.from_db(conn, labels=False)
+        else:
+            restrictions = {restr_id: restr for restr, restr_id in self.restrs_map.items()}
+            masks = RestrictionSet.from_long(data, 'date_id', restrictions)
+        if len(masks):
+            self._insert(
+                manager, "DailyRestrictionMask", masks.to_frame('date_id'), cols, upsert=True
+                )
+
+    def generate(self, incremental: bool = False) -> None:
         """
         Calls methods to create and populate all tables in the database
-        based on the data provided in the DataFrames.
+        based on the data provided in the DataFrames, then indexes the
+        FACT_KEYS columns of the restriction tables. With masks enabled the
+        DailyRestrictionMask table is populated last.
+
+        Parameters:
+            incremental (bool): Whether to only add the rows missing from an
+                                existing database, see update().
+
+        In parallel mode the tables are built and written by generate_parallel(),
+        and when a chunksize is set they are streamed by generate_streaming().
+
+        Raises:
+            ValueError: If an incremental update is requested while streaming.
+        """
+        if self.chunksize is not None:
+            if incremental:
+                raise ValueError("Incremental updates need the datasets loaded, not streamed")
+            self.generate_streaming()
+        elif incremental:
+            self.update()
+        elif self.parallel:
+            self.generate_parallel()
+        else:
+            self.t_date()
+            self.t_week()
+            self.t_restriction()
+            self.t_source()
+            self.t_daily_restriction()
+            self.t_weekly_restriction()
+            self.t_summary_restriction()
+            for table_name, key in self.FACT_KEYS.items():
+                self._manager.create_index(table_name, key)
+        if self.masks:
+            self.t_daily_restriction_mask(self.daily_restriction_df if incremental else None)
+
+    def dependencies(self) -> dict[str, set[str]]:
         """
-        self.t_date()
-        self.t_week()
-        self.t_restriction()
-        self.t_source()
-        self.t_daily_restriction()
-        self.t_weekly_restriction()
-        self.t_summary_restriction()
+        Reads the foreign-key dependencies between tables from SCHEMA.
 
+        Returns:
+            dict[str, set[str]]: The tables each table references.
+        """
+        return {
+            table_name: {
+                ref for constraint in cols.values()
+                for ref in re.findall(r"REFERENCES\s+(\w+)\s*\(", constraint, re.IGNORECASE)
+                if ref != table_name
+            }
+            for table_name, cols in self.SCHEMA.items()
+        }
+
+    def generate_streaming(self) -> None:
+        """
+        Creates and populates all tables while streaming the daily and weekly datasets
+        in chunks of chunksize rows. Each chunk is mapped to IDs and inserted before the
+        next one is read, so memory use depends on the chunk size and the number of
+        distinct dates and weeks rather than on the size of the files.
+        """
+        manager = self._manager
+        for table_name, cols in self.SCHEMA.items():
+            manager.create_table(table_name, cols)
+        self._insert(manager, "Restriction", self.restriction_df, self.SCHEMA["Restriction"])
+        self._insert(manager, "Source", self.source_df, self.SCHEMA["Source"])
+
+        streams = (
+            ("Date", "DailyRestriction", 'date', self.iter_daily, self.dates_map,
+             self.get_daily_restriction_df),
+            ("Week", "WeeklyRestriction", 'week_start', self.iter_weekly, self.weeks_map,
+             self.get_weekly_restriction_df),
+        )
+        for key_table, fact_table, key_col, chunks, key_map, get_fact_df in streams:
+            id_col = next(iter(self.FACT_KEYS[fact_table]))
+            totals = {key_table: [0, 0.0], fact_table: [0, 0.0]}
+            for chunk, new_keys in chunks():
+                keys = pd.DataFrame({key_col: new_keys, id_col: [key_map[k] for k in new_keys]})
+                for table_name, data in ((key_table, keys), (fact_table, get_fact_df(chunk))):
+                    if data.empty:
+                        continue
+                    rate = self._insert(manager, table_name, data, self.SCHEMA[table_name])
+                    if rate:
+                        totals[table_name][0] += len(data)
+                        totals[table_name][1] += len(data) / rate
+            for table_name, (rows, seconds) in totals.items():
+                if seconds > 0:
+                    self.insert_rates[table_name] = rows / seconds
+        self.invalidate()
+
+        self._insert(
+            manager, "SummaryRestriction", self.summary_restriction_df,
+            self.SCHEMA["SummaryRestriction"]
+            )
+        for table_name, key in self.FACT_KEYS.items():
+            manager.create_index(table_name, key)
+
+    def _frames_snapshot(self) -> Frames:
+        """
+        Copies the datasets and ID mappings into a plain Frames object that can be
+        sent to worker processes, leaving out connections and built DataFrames.
+
+        Returns:
+            Frames: Frames object sharing this object's datasets and mappings.
+        """
+        snapshot = Frames.__new__(Frames)
+        for attr in ('daily', 'weekly', 'summary',
+                     'dates_map', 'weeks_map', 'restrs_map', 'sources_map'):
+            setattr(snapshot, attr, getattr(self, attr))
+        return snapshot
+
+    def _write_table(self, table_name: str) -> None:
+        """
+        Creates a table and populates it with its DataFrame from FRAMES.
+
+        Parameters:
+            table_name (str): Name of the table to write.
+        """
+        cols = self.SCHEMA[table_name]
+        self._manager.create_table(table_name, cols)
+        self._insert(self._manager, table_name, getattr(self, self.FRAMES[table_name][0]), cols)
+
+    def generate_parallel(self) -> None:
+        """
+        Creates and populates all tables, building the restriction DataFrames in a
+        process pool while this process acts as the single database writer.
+
+        Tables are written as soon as their DataFrame is ready and every table they
+        reference has been written, so the dimension tables are written while the
+        restriction DataFrames are still being built, and each restriction table is
+        written while the others are still being prepared.
+
+        Raises:
+            ValueError: If the foreign keys in SCHEMA form a cycle.
+        """
+        deps = self.dependencies()
+        snapshot = self._frames_snapshot()
+        written = set()
+        pending = list(self.SCHEMA)
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(getattr(snapshot, getter)): table_name
+                for table_name, (_, getter) in self.FRAMES.items()
+                if table_name in self.FACT_KEYS
+            }
+            ready = {table_name for table_name in self.SCHEMA if table_name not in self.FACT_KEYS}
+            while pending:
+                writable = [t for t in pending if t in ready and deps[t] <= written]
+                if writable:
+                    for table_name in writable:
+                        self._write_table(table_name)
+                        written.add(table_name)
+                        pending.remove(table_name)
+                    continue
+                outstanding = [future for future, t in futures.items() if t not in ready]
+                if not outstanding:
+                    raise ValueError(f"Circular foreign keys between tables {pending}")
+                done, _ = wait(outstanding, return_when=FIRST_COMPLETED)
+                for future in done:
+                    table_name = futures[future]
+                    setattr(self, self.FRAMES[table_name][0], future.result())
+                    ready.add(table_name)
+        for table_name, key in self.FACT_KEYS.items():
+            self._manager.create_index(table_name, key)
+
+    @staticmethod
+    def _extend_map(existing: dict[Any, int], keys: Iterable[Any]) -> tuple[dict[Any, int], list]:
+        """
+        Extends a key to ID mapping read from the database with new keys, keeping every
+        existing ID and numbering new keys after the largest one in order of appearance.
+
+        Parameters:
+            existing (dict): Keys mapped to the IDs already stored in the database.
+            keys (iterable): Keys found in the datasets.
+
+        Returns:
+            tuple[dict, list]: The extended mapping and the keys that were added to it.
+        """
+        keys = pd.unique(np.asarray(list(keys) if isinstance(keys, dict) else keys, dtype=object))
+        new = keys[~pd.Index(keys).isin(pd.Index(list(existing), dtype=object))].tolist()
+        next_id = max(existing.values(), default=-1) + 1
+        res = dict(existing)
+        res.update(zip(new, range(next_id, next_id + len(new))))
+        return res, new
+
+    def update(self) -> None:
+        """
+        Incrementally brings an existing database up to date with the datasets.
+
+        Dates, weeks, restrictions and sources keep the IDs already stored in the database,
+        new ones are numbered after them and upserted by ID. Restriction rows are only
+        built and inserted for the dates, weeks and summary events (see _missing_events)
+        missing from their table, so re-running an update is harmless and its cost depends
+        on the size of the delta rather than of the history. Missing tables are created
+        first, along with indexes on the FACT_KEYS columns.
+        """
+        manager = self._manager
+        for table_name, cols in self.SCHEMA.items():
+            manager.create_table(table_name, cols, if_not_exists=True)
+        for table_name, key in self.FACT_KEYS.items():
+            manager.create_index(table_name, key)
+
+        self.dates_map, new_dates = self._extend_map(
+            manager.read_column_map("Date", "date", "date_id"), self.daily['date']
+            )
+        self.weeks_map, new_weeks = self._extend_map(
+            manager.read_column_map("Week", "week_start", "week_id"), self.weekly['week_start']
+            )
+        self.restrs_map, new_restrs = self._extend_map(
+            manager.read_column_map("Restriction", "restriction", "restriction_id"),
+            self.restrs_map
+            )
+        self.sources_map, new_sources = self._extend_map(
+            manager.read_column_map("Source", "source", "source_id"), self.summary['source'].unique()
+            )
+        self.date_df = self.get_date_df()
+        self.week_df = self.get_week_df()
+        self.restriction_df = self.get_restriction_df()
+        self.source_df = self.get_source_df()
+
+        daily_keys = pd.DataFrame({'date_id': self.daily['date'].map(self.dates_map)})
+        weekly_keys = pd.DataFrame({'week_id': self.weekly['week_start'].map(self.weeks_map)})
+        self.daily_restriction_df = self.get_daily_restriction_df(
+            self.daily[self._missing_keys("DailyRestriction", daily_keys)]
+            )
+        self.weekly_restriction_df = self.get_weekly_restriction_df(
+            self.weekly[self._missing_keys("WeeklyRestriction", weekly_keys)]
+            )
+        self.summary_restriction_df = self.get_summary_restriction_df(
+            self.summary[self._missing_events()]
+            )
+
+        updates = [
+            ("Date", self.date_df[self.date_df['date'].isin(new_dates)]),
+            ("Week", self.week_df[self.week_df['week_start'].isin(new_weeks)]),
+            ("Restriction", self.restriction_df[self.restriction_df['restriction'].isin(new_restrs)]),
+            ("Source", self.source_df[self.source_df['source'].isin(new_sources)]),
+            ("DailyRestriction", self.daily_restriction_df),
+            ("WeeklyRestriction", self.weekly_restriction_df),
+            ("SummaryRestriction", self.summary_restriction_df),
+        ]
+        for table_name, data in updates:
+            if data.empty:
+                print(f"'{table_name}' is up to date.")
+            else:
+                upsert = table_name not in self.FACT_KEYS
+                self._insert(manager, table_name, data, self.SCHEMA[table_name], upsert=upsert)
+
+    def _missing_keys(self, table_name: str, keys: pd.DataFrame) -> np.ndarray:
+        """
+        Finds which dates or weeks a restriction table does not hold yet.
+
+        Parameters:
+            table_name (str): DailyRestriction or WeeklyRestriction.
+            keys (pd.DataFrame): FACT_KEYS columns of the dataset rows to check.
+
+        Returns:
+            np.ndarray: Boolean mask, True for the rows missing from the table.
+        """
+        cols = ', '.join(self.FACT_KEYS[table_name])
+        with self._pool.transaction() as conn:
+            loaded = pd.read_sql_query(f"SELECT DISTINCT {cols} FROM {table_name};", conn)
+        loaded = pd.MultiIndex.from_frame(loaded.astype(np.int64))
+        return ~pd.MultiIndex.from_frame(keys.astype(np.int64)).isin(loaded)
+
+    def _missing_events(self) -> np.ndarray:
+        """
+        Finds which summary events SummaryRestriction does not hold yet.
+
+        The table keeps no name for an event, only one row per restriction, so events
+        are matched on their date, source and restriction flags. Several events on the
+        same date from the same source, such as the two on 2021-12-13, are told apart
+        by their flags, and identical ones by how many times they occur. The stored
+        events are rebuilt in insertion order: the n-th row of a restriction for a date
+        and source belongs to the n-th event.
+
+        Returns:
+            np.ndarray: Boolean mask over the summary rows, True for the missing events.
+        """
+        restr_ids = list(self.restrs_map.values())
+        with self._pool.transaction() as conn:
+            loaded = pd.read_sql_query(
+                "SELECT date_id, source_id, restriction_id, in_place "
+                "FROM SummaryRestriction ORDER BY rowid;", conn)
+        loaded['event'] = loaded.groupby(['date_id', 'source_id', 'restriction_id']).cumcount()
+        loaded = loaded.pivot(index=['date_id', 'source_id', 'event'],
+                              columns='restriction_id', values='in_place')
+        loaded = loaded.reindex(columns=restr_ids).fillna(-1)
+        loaded = loaded.reset_index(['date_id', 'source_id'])
+        events = pd.DataFrame({
+            'date_id': self.summary['date'].map(self.dates_map).to_numpy(),
+            'source_id': self.summary['source'].map(self.sources_map).to_numpy()
+        })
+        events[restr_ids] = self.summary[list(self.restrs_map)].to_numpy()
+
+        def index(data: pd.DataFrame) -> pd.MultiIndex:
+            """Events with their occurrence among identical ones, as a MultiIndex."""
+            data = data.astype(np.int64).reset_index(drop=True)
+            data['occurrence'] = data.groupby(list(data.columns)).cumcount()
+            return pd.MultiIndex.from_frame(data)
+
+        return ~index(events).isin(index(loaded))
 
 def main() -> None:
     """Creates and populates the database based on the ERD"""
+    parser = argparse.ArgumentParser(description="Creates and populates the COVID-19 database.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only add the rows missing from an existing database")
+    parser.add_argument('--parallel', action='store_true',
+                        help="build the restriction tables in a process pool")
+    parser.add_argument('--masks', action='store_true',
+                        help="also store one restriction bitmask per date")
+    args = parser.parse_args()
     db_path = "coursework1/database_creation/covid.db"
     daily_path = "coursework1/datasets/restrictions_daily.csv"
     weekly_path = "coursework1/datasets/restrictions_weekly.csv"
     summary_path = "coursework1/datasets/restrictions_summary.csv"
-    manager = DatabaseManager(db_path)
-    tables = Tables(
-        db_path,
-        daily_path=daily_path,
-        weekly_path=weekly_path,
-        summary_path=summary_path
-        )
-
-    tables.generate()
-    manager.show_tables()
+    with ConnectionPool(db_path) as pool:
+        manager = DatabaseManager(db_path, pool=pool)
+        tables = Tables(
+            db_path,
+            daily_path=daily_path,
+            weekly_path=weekly_path,
+            summary_path=summary_path,
+            pool=pool,
+            parallel=args.parallel,
+            masks=args.masks
+            )
+
+        tables.generate(incremental=args.incremental)
+        manager.show_tables()
 
 if __name__ == "__main__":
     main()
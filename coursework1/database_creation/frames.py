@@ -7,12 +7,170 @@ Classes:
     - Frames: Loads daily, weekly, and summary datasets and provides methods to
       retrieve processed DataFrames for dates, weeks, restrictions, sources, and
       various restriction summaries.
+
+Functions:
+    - read_data(): Reads a CSV, Parquet or Arrow IPC file, either whole or in chunks.
+    - restriction_dtypes(): Chooses compact column types for a restriction dataset.
+    - read_restrictions(): Reads a restriction dataset from a CSV, Parquet or Arrow IPC
+      file with compact column types, either whole or in chunks.
 """
+from typing import Any, Iterable, Iterator, Optional, Union
+import numpy as np
 import pandas as pd
 
+KEY_COLUMNS = ('date', 'week_start')
+TEXT_COLUMNS = ('restriction', 'source')
+# the 0/1 flag columns of the restriction datasets, one per restriction
+FLAG_COLUMNS = (
+    'schools_closed', 'pubs_closed', 'shops_closed', 'eating_places_closed',
+    'stay_at_home', 'household_mixing_indoors_banned', 'wfh', 'rule_of_6_indoors',
+    'curfew', 'eat_out_to_help_out'
+)
+
+def import_pyarrow() -> Any:
+    """
+    Imports pyarrow with its Parquet module, needed to read and write Parquet and Arrow
+    IPC files.
+
+    Returns:
+        module: The pyarrow module.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet  # pylint: disable=import-outside-toplevel,unused-import
+    except ImportError as error:
+        raise ImportError("Parquet and Arrow IPC files require pyarrow: pip install pyarrow"
+                          ) from error
+    return pyarrow
+
+def file_format(path: str) -> str:
+    """
+    Finds the format of a file from its extension, ignoring a compression suffix.
+
+    Parameters:
+        path (str): Path of the file.
+
+    Returns:
+        str: 'parquet', 'arrow' or 'csv'.
+    """
+    name = path.lower()
+    if name.endswith('.parquet'):
+        return 'parquet'
+    if name.endswith(('.arrow', '.feather', '.ipc')):
+        return 'arrow'
+    return 'csv'
+
+def read_columns(path: str) -> list[str]:
+    """
+    Reads the column names of a CSV, Parquet or Arrow IPC file without reading its rows.
+
+    Parameters:
+        path (str): Path of the file.
+
+    Returns:
+        list[str]: Column names.
+    """
+    fmt = file_format(path)
+    if fmt == 'parquet':
+        return list(import_pyarrow().parquet.read_schema(path).names)
+    if fmt == 'arrow':
+        pyarrow = import_pyarrow()
+        with pyarrow.memory_map(path) as source:
+            return list(pyarrow.ipc.open_file(source).schema.names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def _arrow_batches(path: str, fmt: str, chunksize: int) -> Iterator[Any]:
+    """Record batches of at most chunksize rows of a Parquet or Arrow IPC file."""
+    pyarrow = import_pyarrow()
+    if fmt == 'parquet':
+        yield from pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunksize)
+        return
+    with pyarrow.memory_map(path) as source:
+        reader = pyarrow.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for start in range(0, batch.num_rows, chunksize):
+                yield batch.slice(start, chunksize)
+
+def read_data(path: str, dtype: Optional[dict[str, str]] = None, chunksize: Optional[int] = None
+              ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """
+    Reads a CSV, Parquet or Arrow IPC file, choosing the reader from the file's extension.
+    Arrow IPC files are memory-mapped rather than read.
+
+    Parameters:
+        path (str): Path of the file.
+        dtype (dict): Column names mapped to the data types to convert them to.
+        chunksize (int): Number of rows per chunk. When given, an iterator over chunks
+                         is returned.
+
+    Returns:
+        pd.DataFrame or iterator of pd.DataFrame: The data, or an iterator over chunks of it.
+    """
+    fmt = file_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path, dtype=dtype, chunksize=chunksize)
+    if chunksize is not None:
+        return (
+            batch.to_pandas().astype(dtype or {})
+            for batch in _arrow_batches(path, fmt, chunksize)
+        )
+    pyarrow = import_pyarrow()
+    if fmt == 'parquet':
+        data = pd.read_parquet(path)
+    else:
+        with pyarrow.memory_map(path) as source:
+            data = pyarrow.ipc.open_file(source).read_all().to_pandas()
+    return data.astype(dtype) if dtype else data
+
+def restriction_dtypes(columns: Iterable[str]) -> dict[str, str]:
+    """
+    Chooses compact data types for the columns of a restriction dataset: uint8
+    restriction flags, categorical restriction and source names and string dates.
+    Columns that are none of these are left out, so they keep the types inferred by
+    the reader rather than being wrapped into uint8.
+
+    Parameters:
+        columns (iterable of str): Column names of the dataset.
+
+    Returns:
+        dict[str, str]: Column names mapped to their data types.
+    """
+    dtypes = {}
+    for col in columns:
+        if col in KEY_COLUMNS:
+            dtypes[col] = 'string'
+        elif col in TEXT_COLUMNS:
+            dtypes[col] = 'category'
+        elif col in FLAG_COLUMNS:
+            dtypes[col] = 'uint8'
+    return dtypes
+
+def read_restrictions(path: str, chunksize: Optional[int] = None
+                      ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """
+    Reads a restriction dataset with the compact column types of restriction_dtypes.
+
+    Besides CSV, datasets can be read from Parquet (.parquet) and Arrow IPC (.arrow,
+    .feather) files, which need the optional pyarrow package.
+
+    Parameters:
+        path (str): Path to the dataset CSV, Parquet or Arrow IPC file.
+        chunksize (int): Number of rows per chunk. The whole file is read when omitted.
+
+    Returns:
+        pd.DataFrame or iterator of pd.DataFrame: The dataset, or an iterator over
+        chunks of it when chunksize is given.
+    """
+    return read_data(path, dtype=restriction_dtypes(read_columns(path)), chunksize=chunksize)
+
 class Frames:
     """
-    Loads and processes COVID-19 restriction data from daily, weekly, and summary CSV files.
+    Loads and processes COVID-19 restriction data from daily, weekly, and summary CSV files
+    (or Parquet and Arrow IPC files, see read_restrictions).
 
     Attributes:
         daily (pd.DataFrame): DataFrame containing daily restriction data.
@@ -22,8 +180,16 @@ class Frames:
         weeks_map (dict): Maps week start dates to unique IDs for the weekly dataset.
         restrs_map (dict): Maps restriction types to unique IDs.
         sources_map (dict): Maps source names to unique IDs.
+        daily_path (str): Path to the daily dataset CSV file.
+        weekly_path (str): Path to the weekly dataset CSV file.
+        chunksize (int): Rows per chunk when the daily and weekly datasets are streamed.
+
+    When a chunksize is given the daily and weekly datasets are not loaded: daily and
+    weekly are None, dates_map and weeks_map start empty, and the datasets are read
+    chunk by chunk with iter_daily() and iter_weekly() instead.
     """
-    def __init__(self, daily_path: str, weekly_path: str, summary_path: str) -> None:
+    def __init__(self, daily_path: str, weekly_path: str, summary_path: str,
+                 chunksize: Optional[int] = None) -> None:
         """
         Initializes the Frames class by loading and processing the daily, weekly,
         and summary CSV datasets.
@@ -32,17 +198,77 @@ class Frames:
             daily_path (str): Path to the daily dataset CSV file.
             weekly_path (str): Path to the weekly dataset CSV file.
             summary_path (str): Path to the summary dataset CSV file.
+            chunksize (int): Rows per chunk to stream the daily and weekly datasets
+                             in, instead of loading them.
         """
-        self.daily = pd.read_csv(daily_path)
-        self.weekly = pd.read_csv(weekly_path)
-        self.summary =  pd.read_csv(summary_path).dropna()
-        self.dates_map = {date: idx for idx, date in enumerate(self.daily['date'].tolist())}
-        self.weeks_map = {
-            week_start: idx for idx, week_start in enumerate(self.weekly['week_start'].tolist())
-            }
+        self.daily_path = daily_path
+        self.weekly_path = weekly_path
+        self.chunksize = chunksize
+        self.summary = read_restrictions(summary_path).dropna()
+        if chunksize is None:
+            self.daily = read_restrictions(daily_path)
+            self.weekly = read_restrictions(weekly_path)
+            self.dates_map = {date: idx for idx, date in enumerate(self.daily['date'].tolist())}
+            self.weeks_map = {
+                week_start: idx for idx, week_start in enumerate(self.weekly['week_start'].tolist())
+                }
+        else:
+            self.daily = None
+            self.weekly = None
+            self.dates_map = {}
+            self.weeks_map = {}
         self.restrs_map = {restr: i for i, restr in enumerate(self.summary.columns.tolist()[3:])}
         self.sources_map = {s: i for i, s in enumerate(set(self.summary['source']))}
 
+    @staticmethod
+    def _iter_chunks(path: str, key_col: str, key_map: dict,
+                     chunksize: int) -> Iterator[tuple[pd.DataFrame, list]]:
+        """
+        Streams a dataset in chunks, adding the keys first seen in each chunk to key_map
+        with their row number as ID.
+
+        Parameters:
+            path (str): Path to the dataset CSV file.
+            key_col (str): Column holding the date/week of each row.
+            key_map (dict): Mapping extended in place with the new keys.
+            chunksize (int): Number of rows per chunk.
+
+        Yields:
+            tuple[pd.DataFrame, list]: Each chunk and the keys first seen in it.
+        """
+        offset = 0
+        for chunk in read_restrictions(path, chunksize=chunksize):
+            new = []
+            for idx, key in enumerate(chunk[key_col].tolist(), start=offset):
+                if key not in key_map:
+                    key_map[key] = idx
+                    new.append(key)
+            offset += len(chunk)
+            yield chunk, new
+
+    def iter_daily(self) -> Iterator[tuple[pd.DataFrame, list]]:
+        """
+        Streams the daily dataset in chunks of chunksize rows, extending dates_map.
+
+        Unlike a full load, where a repeated date takes the ID of its last row, a
+        streamed date keeps the ID of its first row.
+
+        Yields:
+            tuple[pd.DataFrame, list]: Each chunk and the dates first seen in it.
+        """
+        yield from self._iter_chunks(self.daily_path, 'date', self.dates_map, self.chunksize)
+
+    def iter_weekly(self) -> Iterator[tuple[pd.DataFrame, list]]:
+        """
+        Streams the weekly dataset in chunks of chunksize rows, extending weeks_map.
+
+        Yields:
+            tuple[pd.DataFrame, list]: Each chunk and the week starts first seen in it.
+        """
+        yield from self._iter_chunks(
+            self.weekly_path, 'week_start', self.weeks_map, self.chunksize
+            )
+
     def get_date_df(self) -> pd.DataFrame:
         """
         Retrieves a DataFrame mapping each unique date to a date ID.
@@ -79,10 +305,45 @@ class Frames:
         """
         return pd.DataFrame(list(self.sources_map.items()), columns=['source', 'source_id'])
 
-    def get_summary_restriction_df(self) -> pd.DataFrame:
+    def _melt_restrictions(self, data: pd.DataFrame, key_col: str, key_map: dict,
+                           key_name: str) -> pd.DataFrame:
+        """
+        Reshapes a wide restriction table (one flag column per restriction) into the
+        long (key, restriction_id, in_place) layout used by the restriction tables.
+
+        The output is row-major, i.e. every restriction of the first row is emitted
+        before the second row, matching the order the tables have always been filled in.
+
+        Parameters:
+            data (pd.DataFrame): Wide DataFrame holding the restriction flag columns.
+            key_col (str): Column of data holding the date/week the row refers to.
+            key_map (dict): Maps values of key_col to their IDs.
+            key_name (str): Name of the ID column in the output.
+
+        Returns:
+            pd.DataFrame: DataFrame with columns key_name, 'restriction_id' and 'in_place'.
+        """
+        restrs = list(self.restrs_map.keys())
+        n_restrs = len(restrs)
+        keys = data[key_col].map(key_map)
+        if keys.isna().any():
+            raise KeyError(f"No ID for {key_col} values {data[key_col][keys.isna()].unique().tolist()}")
+        keys = keys.to_numpy(dtype=np.int64)
+        restr_ids = np.fromiter(self.restrs_map.values(), dtype=np.int64, count=n_restrs)
+        flags = data[restrs].to_numpy().astype(np.int64).ravel()
+        return pd.DataFrame({
+            key_name: np.repeat(keys, n_restrs),
+            'restriction_id': np.tile(restr_ids, len(data)),
+            'in_place': flags
+        })
+
+    def get_summary_restriction_df(self, data: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
         Retrieves a DataFrame summarizing restrictions with date, source, and restriction IDs.
 
+        Parameters:
+            data (pd.DataFrame): Subset of the summary rows to use, defaults to all of them.
+
         Returns:
             pd.DataFrame: DataFrame with columns:
                 'date_id',
@@ -90,58 +351,34 @@ class Frames:
                 'restriction_id',
                 'in_place'.
         """
-        dates_lst = self.summary['date'].tolist()
-        sources_lst = self.summary['source'].tolist()
-        source_ids = [self.sources_map[src] for src in sources_lst]
-        res = []
-        for i, date in enumerate(dates_lst):
-            for restr in self.restrs_map.keys():
-                res.append(
-                    {
-                        'date_id':self.dates_map[date],
-                        'source_id':source_ids[i],
-                        'restriction_id':self.restrs_map[restr],
-                        'in_place': int(self.summary[restr][i])
-                    }
-                )
-        return pd.DataFrame(res)
-
-    def get_daily_restriction_df(self) -> pd.DataFrame:
+        data = self.summary if data is None else data
+        res = self._melt_restrictions(data, 'date', self.dates_map, 'date_id')
+        source_ids = data['source'].map(self.sources_map).to_numpy(dtype=np.int64)
+        res.insert(1, 'source_id', np.repeat(source_ids, len(self.restrs_map)))
+        return res
+
+    def get_daily_restriction_df(self, data: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
         Retrieves a DataFrame of daily restrictions with date and restriction IDs.
 
+        Parameters:
+            data (pd.DataFrame): Subset of the daily rows to use, defaults to all of them.
+
         Returns:
             pd.DataFrame: DataFrame with columns 'date_id', 'restriction_id', and 'in_place'.
         """
-        dates_lst = self.daily['date'].tolist()
-        res = []
-        for i, date in enumerate(dates_lst):
-            for restr in self.restrs_map.keys():
-                res.append(
-                    {
-                        'date_id':self.dates_map[date],
-                        'restriction_id':self.restrs_map[restr],
-                        'in_place': int(self.daily[restr][i])
-                    }
-                    )
-        return pd.DataFrame(res)
-
-    def get_weekly_restriction_df(self) -> pd.DataFrame:
+        data = self.daily if data is None else data
+        return self._melt_restrictions(data, 'date', self.dates_map, 'date_id')
+
+    def get_weekly_restriction_df(self, data: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
         Retrieves a DataFrame of weekly restrictions with week start date and restriction IDs.
 
+        Parameters:
+            data (pd.DataFrame): Subset of the weekly rows to use, defaults to all of them.
+
         Returns:
             pd.DataFrame: DataFrame with columns 'week_id', 'restriction_id', and 'in_place'.
         """
-        weeks_lst = self.weekly['week_start'].tolist()
-        res = []
-        for i, week in enumerate(weeks_lst):
-            for restr in self.restrs_map.keys():
-                res.append(
-                    {
-                        'week_id':self.weeks_map[week],
-                        'restriction_id':self.restrs_map[restr],
-                        'in_place': int(self.weekly[restr][i])
-                    }
-                )
-        return pd.DataFrame(res)
+        data = self.weekly if data is None else data
+        return self._melt_restrictions(data, 'week_start', self.weeks_map, 'week_id')
@@ -0,0 +1,279 @@
+"""
+This script provides the RestrictionSet class, a compact representation of restriction
+data holding one integer bitmask per date (bit i set when the i-th restriction, by ID,
+is in place) instead of one row per date and restriction. Set queries over it run as
+vectorized NumPy bit operations.
+
+Classes:
+    - RestrictionSet: Bitmasks of the restrictions in place on each date, built from
+      the wide datasets, the long restriction tables or the database, with helpers
+      for the restrictions active on a date, the dates on which restrictions were
+      active together and per-restriction totals.
+"""
+from typing import Any, Iterable, Mapping, Optional, Sequence, Union
+import sqlite3
+import numpy as np
+import pandas as pd
+
+MASK_DTYPES = (np.uint8, np.uint16, np.uint32, np.uint64)
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    """
+    Counts the set bits of every mask.
+
+    Parameters:
+        masks (np.ndarray): Array of unsigned integer masks.
+
+    Returns:
+        np.ndarray: Number of set bits in each mask.
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(masks).astype(np.int64)
+    bits = np.unpackbits(masks.reshape(-1, 1).view(np.uint8), axis=1)
+    return bits.sum(axis=1, dtype=np.int64)
+
+class RestrictionSet:
+    """
+    Restrictions in place on each date, stored as one bitmask per date.
+
+    Attributes:
+        keys (np.ndarray): Date (or date ID) of each mask.
+        masks (np.ndarray): Bitmask of each date, of the smallest unsigned type that
+            holds one bit per restriction.
+        restrictions (list[str]): Restriction names, bit i standing for restrictions[i].
+        restriction_ids (list[int]): Restriction IDs, bit i standing for restriction_ids[i].
+    """
+    def __init__(self, keys: Sequence[Any], masks: np.ndarray, restrictions: Sequence[str],
+                 restriction_ids: Optional[Sequence[int]] = None) -> None:
+        """
+        Initializes the RestrictionSet with the masks of each date.
+
+        Parameters:
+            keys (sequence): Date (or date ID) of each mask.
+            masks (np.ndarray): Bitmask of each date.
+            restrictions (sequence of str): Restriction names in bit order.
+            restriction_ids (sequence of int): Restriction IDs in bit order, defaults to
+                the bit positions.
+
+        Raises:
+            ValueError: If there are more than 64 restrictions, keys and masks differ in
+                length or restrictions and restriction_ids do.
+        """
+        self.restrictions = list(restrictions)
+        self.restriction_ids = (list(range(len(self.restrictions))) if restriction_ids is None
+                                else [int(restr_id) for restr_id in restriction_ids])
+        if len(self.restriction_ids) != len(self.restrictions):
+            raise ValueError(f"Got {len(self.restriction_ids)} IDs for "
+                             f"{len(self.restrictions)} restrictions")
+        dtype = self.mask_dtype(len(self.restrictions))
+        self.keys = np.asarray(keys)
+        self.masks = np.asarray(masks).astype(dtype, copy=False)
+        if len(self.keys) != len(self.masks):
+            raise ValueError(f"Got {len(self.keys)} keys for {len(self.masks)} masks")
+        self._bits = {restr: i for i, restr in enumerate(self.restrictions)}
+        self._index = None
+
+    @staticmethod
+    def mask_dtype(n_restrictions: int) -> type:
+        """
+        Chooses the smallest unsigned integer type with a bit per restriction.
+
+        Parameters:
+            n_restrictions (int): Number of restrictions.
+
+        Returns:
+            type: NumPy unsigned integer type.
+
+        Raises:
+            ValueError: If there are more than 64 restrictions.
+        """
+        for dtype in MASK_DTYPES:
+            if n_restrictions <= np.iinfo(dtype).bits:
+                return dtype
+        raise ValueError(f"Cannot pack {n_restrictions} restrictions into 64 bits")
+
+    @classmethod
+    def from_wide(cls, data: pd.DataFrame, key_col: str,
+                  restrictions: Optional[Sequence[str]] = None) -> "RestrictionSet":
+        """
+        Builds the masks from a wide dataset holding one 0/1 column per restriction,
+        such as the daily or weekly dataset.
+
+        Parameters:
+            data (pd.DataFrame): Wide dataset.
+            key_col (str): Column holding the date of each row.
+            restrictions (sequence of str): Restriction columns in bit order, defaults to
+                every column other than key_col.
+
+        Returns:
+            RestrictionSet: One mask per row of data.
+        """
+        if restrictions is None:
+            restrictions = [col for col in data.columns if col != key_col]
+        dtype = cls.mask_dtype(len(restrictions))
+        weights = (np.ones(1, dtype=dtype) << np.arange(len(restrictions), dtype=dtype))
+        flags = data[list(restrictions)].to_numpy(dtype=dtype) != 0
+        masks = (flags * weights).sum(axis=1, dtype=dtype)
+        return cls(data[key_col].to_numpy(), masks, restrictions)
+
+    @classmethod
+    def from_long(cls, data: pd.DataFrame, key_col: str,
+                  restrictions: Union[Mapping[int, str], Sequence[str]]) -> "RestrictionSet":
+        """
+        Builds the masks from a long restriction table with one row per date and
+        restriction, such as daily_restriction_df. Rows repeated for a date are OR-ed.
+
+        The restrictions get one bit each in order of ID, so the IDs need not start at
+        0 nor be contiguous.
+
+        Parameters:
+            data (pd.DataFrame): DataFrame with columns key_col, 'restriction_id' and
+                'in_place'.
+            key_col (str): Column holding the date (or date ID) of each row.
+            restrictions (mapping or sequence of str): Restriction names by restriction_id,
+                or indexed by it.
+
+        Returns:
+            RestrictionSet: One mask per distinct key, in order of first appearance.
+
+        Raises:
+            ValueError: If data holds a restriction_id missing from restrictions.
+        """
+        if not isinstance(restrictions, Mapping):
+            restrictions = dict(enumerate(restrictions))
+        known = np.fromiter(restrictions, dtype=np.int64, count=len(restrictions))
+        restr_ids = data['restriction_id'].to_numpy().astype(np.int64)
+        ids, positions = np.unique(np.concatenate([known, restr_ids]), return_inverse=True)
+        if len(ids) > len(known):
+            raise ValueError(f"Unknown restriction IDs {np.setdiff1d(ids, known).tolist()}")
+        dtype = cls.mask_dtype(len(ids))
+        codes, keys = pd.factorize(data[key_col])
+        active = data['in_place'].to_numpy() != 0
+        bits = np.ones(1, dtype=dtype) << positions[len(known):].astype(dtype)
+        masks = np.zeros(len(keys), dtype=dtype)
+        np.bitwise_or.at(masks, codes[active], bits[active])
+        return cls(np.asarray(keys), masks, [restrictions[restr_id] for restr_id in ids], ids)
+
+    @classmethod
+    def from_db(cls, conn: sqlite3.Connection, labels: bool = True) -> "RestrictionSet":
+        """
+        Builds the masks from the DailyRestriction table of a database.
+
+        Parameters:
+            conn (sqlite3.Connection): Connection to the database.
+            labels (bool): Whether the keys are the dates rather than the date IDs.
+
+        Returns:
+            RestrictionSet: One mask per date, ordered by date ID.
+        """
+        restrictions = dict(conn.execute("SELECT restriction_id, restriction FROM Restriction;"))
+        data = pd.read_sql_query(
+            "SELECT r.date_id, d.date, r.restriction_id, r.in_place FROM DailyRestriction r "
+            "JOIN Date d USING (date_id) ORDER BY r.date_id;", conn
+            )
+        return cls.from_long(data, 'date' if labels else 'date_id', restrictions)
+
+    def bits(self, restrictions: Iterable[str]) -> int:
+        """
+        Builds the mask with the bits of the given restrictions set.
+
+        Parameters:
+            restrictions (iterable of str): Restriction names.
+
+        Returns:
+            int: The combined mask.
+
+        Raises:
+            KeyError: If a restriction is unknown.
+        """
+        mask = 0
+        for restr in restrictions:
+            mask |= 1 << self._bits[restr]
+        return mask
+
+    def active_on(self, key: Any) -> list[str]:
+        """
+        Lists the restrictions in place on a date.
+
+        Parameters:
+            key (Any): The date (or date ID).
+
+        Returns:
+            list[str]: Names of the restrictions in place.
+
+        Raises:
+            KeyError: If the date is unknown.
+        """
+        if self._index is None:
+            self._index = pd.Index(self.keys)
+        mask = int(self.masks[self._index.get_loc(key)])
+        return [restr for restr, bit in self._bits.items() if mask >> bit & 1]
+
+    def days_with(self, *restrictions: str) -> np.ndarray:
+        """
+        Finds the dates on which all of the given restrictions were in place.
+
+        Parameters:
+            restrictions (str): Restriction names.
+
+        Returns:
+            np.ndarray: The matching dates (or date IDs).
+        """
+        mask = self.masks.dtype.type(self.bits(restrictions))
+        return self.keys[(self.masks & mask) == mask]
+
+    def days_with_any(self, *restrictions: str) -> np.ndarray:
+        """
+        Finds the dates on which at least one of the given restrictions was in place.
+
+        Parameters:
+            restrictions (str): Restriction names.
+
+        Returns:
+            np.ndarray: The matching dates (or date IDs).
+        """
+        mask = self.masks.dtype.type(self.bits(restrictions))
+        return self.keys[(self.masks & mask) != 0]
+
+    def count_active(self) -> np.ndarray:
+        """
+        Counts the restrictions in place on each date.
+
+        Returns:
+            np.ndarray: Number of restrictions in place, aligned with keys.
+        """
+        return _popcount(self.masks)
+
+    def totals(self, by_id: bool = False) -> dict[Union[str, int], int]:
+        """
+        Counts the dates on which each restriction was in place.
+
+        Parameters:
+            by_id (bool): Whether to key the counts by restriction ID rather than name.
+
+        Returns:
+            dict: Dictionary with restriction names (or IDs) as keys and numbers of
+            dates as values.
+        """
+        shifts = np.arange(len(self.restrictions), dtype=self.masks.dtype)
+        counts = ((self.masks[:, None] >> shifts) & 1).sum(axis=0)
+        labels = self.restriction_ids if by_id else self.restrictions
+        return {label: int(count) for label, count in zip(labels, counts)}
+
+    def to_frame(self, key_col: str = 'date') -> pd.DataFrame:
+        """
+        Converts the masks to a DataFrame. Its attrs['restriction_ids'] lists the
+        restriction ID of each bit, so the masks can be read back.
+
+        Parameters:
+            key_col (str): Name of the key column.
+
+        Returns:
+            pd.DataFrame: DataFrame with columns key_col and 'mask'.
+        """
+        frame = pd.DataFrame({key_col: self.keys, 'mask': self.masks})
+        frame.attrs['restriction_ids'] = list(self.restriction_ids)
+        return frame
+
+    def __len__(self) -> int:
+        return len(self.masks)
@@ -0,0 +1,142 @@
+"""
+This script provides helpers to stream query results from SQLite in batches fetched
+with fetchmany, so that memory use stays bounded by the batch size rather than the
+size of the result, as fetchall would.
+
+Functions:
+    - open_stream(): Runs a query and returns its column names with an iterator over
+      its rows in batches.
+    - iter_batches(): Runs a query and yields its result batch by batch, as lists of
+      rows, DataFrames or NumPy arrays.
+    - iter_rows(): Runs a query and yields its rows one at a time.
+    - print_pages(): Prints rows page by page under their column names.
+"""
+import sys
+from typing import Iterable, Iterator, Optional, Sequence, TextIO, Union
+import sqlite3
+import numpy as np
+import pandas as pd
+
+OUTPUTS = ('rows', 'frame', 'numpy')
+
+def _fetch(cursor: sqlite3.Cursor, batch_size: int) -> Iterator[list[tuple]]:
+    """Yields the rows of a cursor batch by batch, closing it at the end."""
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        cursor.close()
+
+def open_stream(conn: sqlite3.Connection, query: str, params: Union[Sequence, dict] = (),
+                batch_size: int = 10_000) -> tuple[list[str], Iterator[list[tuple]]]:
+    """
+    Runs a query and returns the names of its columns with an iterator over its rows in
+    batches of at most batch_size, which closes the cursor once exhausted or closed.
+
+    Parameters:
+        conn (sqlite3.Connection): Connection to run the query on.
+        query (str): The query, with ? or :name placeholders for params.
+        params (sequence or dict): Parameters bound to the query.
+        batch_size (int): Number of rows fetched at a time.
+
+    Returns:
+        tuple[list[str], iterator of list[tuple]]: The column names and the batches.
+
+    Raises:
+        ValueError: If batch_size is not positive.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+    cursor = conn.execute(query, params)
+    columns = [description[0] for description in cursor.description or ()]
+    return columns, _fetch(cursor, batch_size)
+
+def iter_batches(conn: sqlite3.Connection, query: str, params: Union[Sequence, dict] = (),
+                 batch_size: int = 10_000, output: str = 'rows'
+                 ) -> Iterator[Union[list[tuple], pd.DataFrame, np.ndarray]]:
+    """
+    Runs a query and yields its result in batches of at most batch_size rows. Only one
+    batch is held at a time.
+
+    Parameters:
+        conn (sqlite3.Connection): Connection to run the query on.
+        query (str): The query, with ? or :name placeholders for params.
+        params (sequence or dict): Parameters bound to the query.
+        batch_size (int): Number of rows fetched at a time.
+        output (str): Type of the batches: 'rows' for lists of tuples, 'frame' for
+            DataFrames named after the result columns, or 'numpy' for 2-D arrays,
+            suited to results whose columns share a type.
+
+    Yields:
+        list[tuple], pd.DataFrame or np.ndarray: The next batch of rows.
+
+    Raises:
+        ValueError: If output is not one of OUTPUTS or batch_size is not positive.
+    """
+    if output not in OUTPUTS:
+        raise ValueError(f"output must be one of {OUTPUTS}, got {output!r}")
+    columns, batches = open_stream(conn, query, params, batch_size)
+    for rows in batches:
+        if output == 'frame':
+            yield pd.DataFrame.from_records(rows, columns=columns)
+        elif output == 'numpy':
+            yield np.array(rows)
+        else:
+            yield rows
+
+def iter_rows(conn: sqlite3.Connection, query: str, params: Union[Sequence, dict] = (),
+              batch_size: int = 10_000) -> Iterator[tuple]:
+    """
+    Runs a query and yields its rows one at a time, fetching them in batches.
+
+    Parameters:
+        conn (sqlite3.Connection): Connection to run the query on.
+        query (str): The query, with ? or :name placeholders for params.
+        params (sequence or dict): Parameters bound to the query.
+        batch_size (int): Number of rows fetched at a time.
+
+    Yields:
+        tuple: The next row.
+    """
+    for rows in iter_batches(conn, query, params, batch_size):
+        yield from rows
+
+def print_pages(rows: Iterable[tuple], columns: Sequence[str], page_size: int = 50,
+                max_pages: Optional[int] = None, file: Optional[TextIO] = None) -> int:
+    """
+    Prints rows under their column names, with a marker line starting each page. Rows
+    are consumed one at a time, so a streamed result is printed in constant memory.
+
+    Parameters:
+        rows (iterable of tuple): The rows to print.
+        columns (sequence of str): Names of the columns.
+        page_size (int): Number of rows per page.
+        max_pages (int): Number of pages after which printing stops, all are printed if
+            not given.
+        file (TextIO): Stream to print to, standard output by default.
+
+    Returns:
+        int: Number of rows printed.
+
+    Raises:
+        ValueError: If page_size is not positive.
+    """
+    if page_size < 1:
+        raise ValueError(f"page_size must be positive, got {page_size}")
+    file = file if file is not None else sys.stdout
+    printed = 0
+    for row in rows:
+        if printed % page_size == 0:
+            page = printed // page_size
+            if max_pages is not None and page >= max_pages:
+                print("-- more rows not shown --", file=file)
+                break
+            if page == 0:
+                print(' | '.join(columns), file=file)
+            print(f"-- page {page + 1}, from row {printed + 1} --", file=file)
+        print(row, file=file)
+        printed += 1
+    return printed
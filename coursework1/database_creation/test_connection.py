@@ -0,0 +1,75 @@
+"""
+Tests for the ConnectionPool class.
+"""
+import sqlite3
+import threading
+import pytest
+from connection import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """ConnectionPool over a database holding an empty Date table."""
+    with ConnectionPool(str(tmp_path / "test.db")) as pool:
+        with pool.transaction() as conn:
+            conn.execute("CREATE TABLE Date (date TEXT NOT NULL, date_id INTEGER PRIMARY KEY)")
+        yield pool
+
+
+def test_connection_is_reused_within_a_thread(pool):
+    assert pool.connection() is pool.connection()
+
+
+def test_threads_get_their_own_connection(pool):
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(pool.connection()))
+    thread.start()
+    thread.join()
+    assert seen[0] is not pool.connection()
+
+
+def test_transaction_commits_on_success(pool):
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO Date VALUES ('2020-01-01', 1)")
+    with sqlite3.connect(pool.db_path) as other:
+        assert other.execute("SELECT COUNT(*) FROM Date").fetchone() == (1,)
+
+
+def test_nested_transaction_rolls_back_as_a_whole(pool):
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO Date VALUES ('2020-01-01', 1)")
+            with pool.transaction() as inner:
+                inner.execute("INSERT INTO Date VALUES ('2020-01-02', 1)")
+    with pool.transaction() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM Date").fetchone() == (0,)
+
+
+def test_failed_nested_block_only_undoes_its_own_changes(pool):
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO Date VALUES ('2020-01-01', 1)")
+        with pytest.raises(sqlite3.IntegrityError):
+            with pool.transaction() as inner:
+                inner.execute("INSERT INTO Date VALUES ('2020-01-02', 2)")
+                inner.execute("INSERT INTO Date VALUES ('2020-01-03', 1)")
+        conn.execute("INSERT INTO Date VALUES ('2020-01-04', 4)")
+    with pool.transaction() as conn:
+        assert conn.execute("SELECT date_id FROM Date ORDER BY date_id").fetchall() == [(1,), (4,)]
+
+
+def test_nested_block_does_not_commit_the_enclosing_one(pool):
+    with pytest.raises(RuntimeError):
+        with pool.transaction():
+            with pool.transaction() as inner:
+                inner.execute("INSERT INTO Date VALUES ('2020-01-01', 1)")
+            raise RuntimeError("outer block failed")
+    with pool.transaction() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM Date").fetchone() == (0,)
+
+
+def test_close_closes_every_connection(pool):
+    conn = pool.connection()
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert pool.connection() is not conn
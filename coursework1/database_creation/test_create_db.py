@@ -0,0 +1,201 @@
+"""
+Tests for the DatabaseManager and Tables classes, run against temporary databases.
+"""
+import os
+import sqlite3
+import pandas as pd
+import pytest
+from create_db import DatabaseManager, Tables
+
+DATASETS = os.path.join(os.path.dirname(__file__), "..", "datasets")
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """DatabaseManager over an empty database holding a single Date table."""
+    manager = DatabaseManager(str(tmp_path / "test.db"))
+    manager.create_table("Date", {"date": "TEXT NOT NULL", "date_id": "INTEGER PRIMARY KEY"})
+    return manager
+
+
+def fetch_all(db_path, query):
+    """Runs a query on a fresh connection and returns every row."""
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(query).fetchall()
+
+
+def test_bulk_insert_streams_generator_in_chunks(manager):
+    rows = ((f"2020-01-{i:02d}", i) for i in range(1, 26))
+    rate = manager.insert_data("Date", rows, bulk=True, chunk_size=4)
+    assert rate > 0
+    assert fetch_all(manager._db, "SELECT COUNT(*) FROM Date") == [(25,)]
+
+
+def test_bulk_insert_rolls_back_whole_load_on_error(manager):
+    rows = [("2020-01-01", 1), ("2020-01-02", 2), ("2020-01-03", 1)]
+    with pytest.raises(sqlite3.IntegrityError):
+        manager.insert_data("Date", rows, bulk=True, chunk_size=1)
+    assert fetch_all(manager._db, "SELECT COUNT(*) FROM Date") == [(0,)]
+
+
+def test_nested_bulk_insert_rolls_back_only_its_rows(manager):
+    with manager._pool.transaction() as conn:
+        conn.execute("INSERT INTO Date VALUES ('2020-01-01', 1)")
+        with pytest.raises(sqlite3.IntegrityError):
+            manager.insert_data("Date", [("a", 11), ("b", 11)], bulk=True, chunk_size=1)
+        with pytest.raises(ValueError):
+            manager.insert_data("Date", [("c", 12)], bulk=True, pragmas={"synchronous": "OFF"})
+    assert fetch_all(manager._db, "SELECT date_id FROM Date") == [(1,)]
+
+
+def test_bulk_insert_restores_pragmas(manager):
+    before = fetch_all(manager._db, "PRAGMA journal_mode")
+    manager.insert_data(
+        "Date", [("2020-01-01", 1)], bulk=True, pragmas={"journal_mode": "MEMORY"}
+        )
+    assert fetch_all(manager._db, "PRAGMA journal_mode") == before
+
+
+def test_insert_joins_the_enclosing_transaction(manager):
+    with pytest.raises(RuntimeError):
+        with manager._pool.transaction() as conn:
+            conn.execute("INSERT INTO Date VALUES ('2020-01-01', 1)")
+            manager.insert_data("Date", [("2020-01-02", 2)])
+            raise RuntimeError("outer block failed")
+    assert fetch_all(manager._db, "SELECT COUNT(*) FROM Date") == [(0,)]
+    with pytest.raises(sqlite3.IntegrityError):
+        manager.insert_data("Date", [("2020-01-03", 3), ("2020-01-04", 3)])
+    assert fetch_all(manager._db, "SELECT COUNT(*) FROM Date") == [(0,)]
+
+
+def test_generate_records_insert_rates(tmp_path):
+    tables = Tables(
+        str(tmp_path / "covid.db"),
+        daily_path=os.path.join(DATASETS, "restrictions_daily.csv"),
+        weekly_path=os.path.join(DATASETS, "restrictions_weekly.csv"),
+        summary_path=os.path.join(DATASETS, "restrictions_summary.csv")
+    )
+    tables.generate()
+    assert set(tables.insert_rates) == {
+        "Date", "Week", "Restriction", "Source",
+        "DailyRestriction", "WeeklyRestriction", "SummaryRestriction"
+    }
+    assert fetch_all(tables._db, "SELECT COUNT(*) FROM DailyRestriction") == [
+        (len(tables.daily_restriction_df),)
+    ]
+
+
+def write_datasets(folder, daily_rows, weekly_rows):
+    """Writes the first rows of the bundled datasets to a folder and returns their paths."""
+    paths = []
+    for name, rows in (("daily", daily_rows), ("weekly", weekly_rows), ("summary", None)):
+        data = pd.read_csv(os.path.join(DATASETS, f"restrictions_{name}.csv"))
+        path = str(folder / f"restrictions_{name}.csv")
+        data.iloc[:rows].to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def test_incremental_update_appends_only_new_rows(tmp_path):
+    db_path = str(tmp_path / "covid.db")
+    full_path = str(tmp_path / "full.db")
+    Tables(db_path, *write_datasets(tmp_path, 1000, 150)).generate()
+    ids_before = fetch_all(db_path, "SELECT date, date_id FROM Date")
+
+    paths = write_datasets(tmp_path, None, None)
+    tables = Tables(db_path, *paths)
+    tables.generate(incremental=True)
+    Tables(full_path, *paths).generate()
+
+    assert len(tables.daily_restriction_df) == 10 * (len(tables.daily) - 1000)
+    assert tables.summary_restriction_df.empty
+    assert set(ids_before) <= set(fetch_all(db_path, "SELECT date, date_id FROM Date"))
+    for table in ("Date", "Week", "DailyRestriction", "WeeklyRestriction"):
+        query = f"SELECT * FROM {table} ORDER BY 1, 2"
+        assert fetch_all(db_path, query) == fetch_all(full_path, query)
+
+
+def test_incremental_update_adds_same_day_events_from_the_same_source(tmp_path):
+    db_path = str(tmp_path / "covid.db")
+    paths = write_datasets(tmp_path, None, None)
+    summary = pd.read_csv(paths[2])
+    same_day = summary[summary["date"] == "2021-12-13"]
+    assert len(same_day) == 2 and same_day["source"].nunique() == 1
+    summary.drop(same_day.index[1]).to_csv(paths[2], index=False)
+    Tables(db_path, *paths).generate()
+
+    summary.to_csv(paths[2], index=False)
+    tables = Tables(db_path, *paths)
+    tables.generate(incremental=True)
+    assert len(tables.summary_restriction_df) == 10
+    full_path = str(tmp_path / "full.db")
+    Tables(full_path, *paths).generate()
+    query = "SELECT * FROM SummaryRestriction ORDER BY 1, 2, 3, 4"
+    assert fetch_all(db_path, query) == fetch_all(full_path, query)
+
+
+def test_incremental_update_is_idempotent(tmp_path):
+    db_path = str(tmp_path / "covid.db")
+    paths = write_datasets(tmp_path, None, None)
+    Tables(db_path, *paths).generate(incremental=True)
+    before = fetch_all(db_path, "SELECT COUNT(*) FROM SummaryRestriction")
+    tables = Tables(db_path, *paths)
+    tables.generate(incremental=True)
+    assert tables.daily_restriction_df.empty
+    assert fetch_all(db_path, "SELECT COUNT(*) FROM SummaryRestriction") == before
+
+
+def test_dependencies_follow_foreign_keys(tmp_path):
+    tables = Tables(str(tmp_path / "covid.db"), *write_datasets(tmp_path, None, None))
+    deps = tables.dependencies()
+    assert deps["Date"] == set()
+    assert deps["SummaryRestriction"] == {"Date", "Restriction", "Source"}
+
+
+def test_parallel_generate_matches_sequential(tmp_path):
+    paths = write_datasets(tmp_path, None, None)
+    sequential = Tables(str(tmp_path / "sequential.db"), *paths)
+    sequential.generate()
+    parallel = Tables(str(tmp_path / "parallel.db"), *paths, parallel=True, max_workers=2)
+    parallel.generate()
+    for table in Tables.SCHEMA:
+        query = f"SELECT * FROM {table}"
+        assert sorted(fetch_all(parallel._db, query)) == sorted(fetch_all(sequential._db, query))
+
+
+def test_frames_are_built_on_first_access_only(tmp_path):
+    tables = Tables(str(tmp_path / "covid.db"), *write_datasets(tmp_path, None, None))
+    assert tables._frames_cache == {}
+    tables.t_date()
+    assert set(tables._frames_cache) == {"date_df"}
+    assert tables.date_df is tables.date_df
+
+
+def test_frames_are_rebuilt_when_datasets_change(tmp_path):
+    paths = write_datasets(tmp_path, 1000, None)
+    tables = Tables(str(tmp_path / "covid.db"), *paths)
+    assert len(tables.date_df) == 999
+    write_datasets(tmp_path, None, None)
+    os.utime(paths[0], ns=(0, 0))
+    assert len(tables.date_df) == len(tables.dates_map) > 999
+    assert set(tables._frames_cache) == {"date_df"}
+
+
+def test_streaming_generate_matches_full_load(tmp_path):
+    paths = write_datasets(tmp_path, None, None)
+    full = Tables(str(tmp_path / "full.db"), *paths)
+    full.generate()
+    streamed = Tables(str(tmp_path / "streamed.db"), *paths, chunksize=100)
+    assert streamed.daily is None
+    streamed.generate()
+    queries = (
+        "SELECT d.date, r.restriction_id, r.in_place FROM DailyRestriction r "
+        "JOIN Date d USING (date_id)",
+        "SELECT w.week_start, r.restriction_id, r.in_place FROM WeeklyRestriction r "
+        "JOIN Week w USING (week_id)",
+        "SELECT d.date, s.source, r.restriction_id, r.in_place FROM SummaryRestriction r "
+        "JOIN Date d USING (date_id) JOIN Source s USING (source_id)",
+    )
+    for query in queries:
+        assert sorted(fetch_all(streamed._db, query)) == sorted(fetch_all(full._db, query))
+    assert streamed.insert_rates["DailyRestriction"] > 0
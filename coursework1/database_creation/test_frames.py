@@ -0,0 +1,83 @@
+"""
+Tests for the Frames class, checking the restriction tables against the
+row-by-row construction they were originally built with.
+"""
+import os
+import pandas as pd
+import pytest
+from frames import Frames, read_restrictions
+
+DATASETS = os.path.join(os.path.dirname(__file__), "..", "datasets")
+
+
+@pytest.fixture(scope="module")
+def frames():
+    """Frames loaded from the bundled datasets."""
+    return Frames(
+        os.path.join(DATASETS, "restrictions_daily.csv"),
+        os.path.join(DATASETS, "restrictions_weekly.csv"),
+        os.path.join(DATASETS, "restrictions_summary.csv")
+    )
+
+
+def legacy_restriction_df(frames, data, key_col, key_map, key_name, with_source=False):
+    """Row-by-row reference implementation of the restriction tables."""
+    res = []
+    for i, key in enumerate(data[key_col].tolist()):
+        for restr, restr_id in frames.restrs_map.items():
+            row = {key_name: key_map[key]}
+            if with_source:
+                row['source_id'] = frames.sources_map[data['source'].iloc[i]]
+            row['restriction_id'] = restr_id
+            row['in_place'] = int(data[restr].iloc[i])
+            res.append(row)
+    return pd.DataFrame(res)
+
+
+def test_daily_restriction_parity(frames):
+    expected = legacy_restriction_df(frames, frames.daily, 'date', frames.dates_map, 'date_id')
+    pd.testing.assert_frame_equal(frames.get_daily_restriction_df(), expected)
+
+
+def test_weekly_restriction_parity(frames):
+    expected = legacy_restriction_df(
+        frames, frames.weekly, 'week_start', frames.weeks_map, 'week_id'
+        )
+    pd.testing.assert_frame_equal(frames.get_weekly_restriction_df(), expected)
+
+
+def test_summary_restriction_parity(frames):
+    expected = legacy_restriction_df(
+        frames, frames.summary, 'date', frames.dates_map, 'date_id', with_source=True
+        )
+    pd.testing.assert_frame_equal(frames.get_summary_restriction_df(), expected)
+
+
+def test_restriction_columns_are_integer(frames):
+    for df in (frames.get_daily_restriction_df(), frames.get_summary_restriction_df()):
+        assert all(pd.api.types.is_integer_dtype(dtype) for dtype in df.dtypes)
+
+
+@pytest.mark.parametrize("extension, write", [
+    (".parquet", lambda df, path: df.to_parquet(path)),
+    (".arrow", lambda df, path: df.to_feather(path)),
+])
+def test_read_restrictions_columnar_formats(tmp_path, extension, write):
+    pytest.importorskip("pyarrow")
+    csv_path = os.path.join(DATASETS, "restrictions_summary.csv")
+    expected = read_restrictions(csv_path)
+    path = str(tmp_path / f"summary{extension}")
+    write(expected, path)
+    pd.testing.assert_frame_equal(read_restrictions(path), expected)
+    chunks = list(read_restrictions(path, chunksize=7))
+    assert [len(chunk) for chunk in chunks] == [7, 7, 7, 7, 2]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+
+def test_read_restrictions_narrows_only_the_flag_columns(tmp_path):
+    path = str(tmp_path / "daily.csv")
+    pd.DataFrame({"date": ["2020-01-01"], "wfh": [1], "cases": [300], "rate": [0.5]}
+                 ).to_csv(path, index=False)
+    data = read_restrictions(path)
+    assert data["wfh"].dtype == "uint8"
+    assert data["cases"].tolist() == [300] and data["rate"].tolist() == [0.5]
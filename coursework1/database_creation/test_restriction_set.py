@@ -0,0 +1,91 @@
+"""
+Tests for the RestrictionSet class.
+"""
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+from create_db import Tables
+from restriction_set import RestrictionSet
+
+DATASETS = os.path.join(os.path.dirname(__file__), "..", "datasets")
+
+
+@pytest.fixture(scope="module")
+def daily():
+    """The bundled daily dataset."""
+    return pd.read_csv(os.path.join(DATASETS, "restrictions_daily.csv"))
+
+
+@pytest.fixture(scope="module")
+def restriction_set(daily):
+    """RestrictionSet of the bundled daily dataset."""
+    return RestrictionSet.from_wide(daily, 'date')
+
+
+def test_masks_use_smallest_dtype(restriction_set):
+    assert restriction_set.masks.dtype == np.uint16
+    assert RestrictionSet.mask_dtype(8) == np.uint8
+    with pytest.raises(ValueError):
+        RestrictionSet.mask_dtype(65)
+
+
+def test_totals_match_column_sums(daily, restriction_set):
+    expected = {col: int(daily[col].sum()) for col in daily.columns[1:]}
+    assert restriction_set.totals() == expected
+
+
+def test_count_active_matches_row_sums(daily, restriction_set):
+    expected = daily.iloc[:, 1:].sum(axis=1).to_numpy()
+    np.testing.assert_array_equal(restriction_set.count_active(), expected)
+
+
+def test_active_on(daily, restriction_set):
+    row = daily.iloc[400]
+    expected = [col for col in daily.columns[1:] if row[col] == 1]
+    assert restriction_set.active_on(row['date']) == expected
+
+
+def test_days_with(daily, restriction_set):
+    both = daily[(daily['pubs_closed'] == 1) & (daily['wfh'] == 1)]['date']
+    either = daily[(daily['pubs_closed'] == 1) | (daily['curfew'] == 1)]['date']
+    assert restriction_set.days_with('pubs_closed', 'wfh').tolist() == both.tolist()
+    assert restriction_set.days_with_any('pubs_closed', 'curfew').tolist() == either.tolist()
+
+
+def test_mask_table_matches_wide_dataset(tmp_path, daily):
+    db_path = str(tmp_path / "covid.db")
+    Tables(
+        db_path,
+        daily_path=os.path.join(DATASETS, "restrictions_daily.csv"),
+        weekly_path=os.path.join(DATASETS, "restrictions_weekly.csv"),
+        summary_path=os.path.join(DATASETS, "restrictions_summary.csv"),
+        masks=True
+    ).generate()
+    with sqlite3.connect(db_path) as conn:
+        from_db = RestrictionSet.from_db(conn)
+        stored = dict(conn.execute(
+            "SELECT d.date, m.mask FROM DailyRestrictionMask m JOIN Date d USING (date_id)"
+            ))
+    # 2021-12-13 is listed twice, the second row adding wfh to the first
+    expected = RestrictionSet.from_wide(daily.drop_duplicates('date', keep='last'), 'date')
+    assert from_db.keys.tolist() == expected.keys.tolist()
+    np.testing.assert_array_equal(from_db.masks, expected.masks)
+    assert stored == dict(zip(expected.keys.tolist(), expected.masks.tolist()))
+
+
+def test_from_long_maps_sparse_ids_to_bits():
+    data = pd.DataFrame({'date_id': [1, 1, 1, 2, 2],
+                         'restriction_id': [5, 70, 12, 70, 5],
+                         'in_place': [1, 1, 0, 1, 0]})
+    restr_set = RestrictionSet.from_long(data, 'date_id', {70: 'curfew', 5: 'wfh', 12: 'pubs'})
+    assert restr_set.restrictions == ['wfh', 'pubs', 'curfew']
+    assert restr_set.restriction_ids == [5, 12, 70]
+    assert restr_set.masks.dtype == np.uint8 and restr_set.masks.tolist() == [0b101, 0b100]
+    assert restr_set.active_on(1) == ['wfh', 'curfew']
+    assert restr_set.totals() == {'wfh': 1, 'pubs': 0, 'curfew': 2}
+    assert restr_set.totals(by_id=True) == {5: 1, 12: 0, 70: 2}
+    assert restr_set.to_frame('date_id').attrs['restriction_ids'] == [5, 12, 70]
+    with pytest.raises(ValueError, match="Unknown restriction IDs \\[70\\]"):
+        RestrictionSet.from_long(data, 'date_id', {5: 'wfh', 12: 'pubs'})
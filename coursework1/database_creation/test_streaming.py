@@ -0,0 +1,65 @@
+"""
+Tests for streaming query results in batches.
+"""
+import io
+import sqlite3
+import tracemalloc
+import numpy as np
+import pytest
+from streaming import iter_batches, iter_rows, open_stream, print_pages
+
+ROWS = 200_000
+
+
+@pytest.fixture
+def conn():
+    """In-memory database holding a large DailyRestriction table."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE DailyRestriction (date_id INTEGER, restriction_id INTEGER, "
+                 "in_place INTEGER);")
+    conn.executemany("INSERT INTO DailyRestriction VALUES (?, ?, ?);",
+                     ((i // 10, i % 10, i % 2) for i in range(ROWS)))
+    yield conn
+    conn.close()
+
+
+def test_batches_cover_the_result_in_each_output(conn):
+    query = "SELECT * FROM DailyRestriction WHERE restriction_id = ?;"
+    expected = conn.execute(query, (3,)).fetchall()
+    batches = list(iter_batches(conn, query, (3,), batch_size=7000))
+    assert [len(b) for b in batches] == [7000, 7000, 6000]
+    assert [row for batch in batches for row in batch] == expected
+    frames = list(iter_batches(conn, query, (3,), batch_size=7000, output='frame'))
+    assert list(frames[0].columns) == ['date_id', 'restriction_id', 'in_place']
+    arrays = list(iter_batches(conn, query, (3,), batch_size=7000, output='numpy'))
+    assert np.array_equal(np.concatenate(arrays), np.array(expected))
+    with pytest.raises(ValueError):
+        next(iter_batches(conn, query, (3,), output='dict'))
+
+
+def test_streaming_memory_is_bounded_by_the_batch(conn):
+    tracemalloc.start()
+    rows = iter_rows(conn, "SELECT * FROM DailyRestriction;", batch_size=1000)
+    assert sum(1 for _ in rows) == ROWS
+    streamed = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    rows = conn.execute("SELECT * FROM DailyRestriction;").fetchall()
+    loaded = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert len(rows) == ROWS
+    assert streamed * 10 < loaded
+
+
+def test_print_pages(conn):
+    columns, batches = open_stream(conn, "SELECT * FROM DailyRestriction;", batch_size=5)
+    out = io.StringIO()
+    printed = print_pages((row for batch in batches for row in batch), columns,
+                          page_size=5, max_pages=2, file=out)
+    batches.close()
+    lines = out.getvalue().splitlines()
+    assert printed == 10
+    assert lines[0] == "date_id | restriction_id | in_place"
+    assert lines[1] == "-- page 1, from row 1 --" and lines[7] == "-- page 2, from row 6 --"
+    assert lines[-1] == "-- more rows not shown --"
+    with pytest.raises(ValueError):
+        print_pages([(1,)], ["x"], page_size=0, file=out)
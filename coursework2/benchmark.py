@@ -0,0 +1,183 @@
+"""
+Micro-benchmark of repeated queries through Queries: the per-restriction count of
+queries.txt, restricted to the days up to a date, run many times with different
+restrictions and dates.
+
+The copy of the database gets an index covering the query, so that the time spent
+preparing statements is not hidden behind full table scans, and one on the key of
+DailyRestriction for the CRUD benchmark.
+
+It compares opening a connection per query, formatting the values into the SQL text
+(a new statement to compile on every call), binding them as parameters with the
+statement cache disabled, and binding them with the statement cache enabled.
+
+With --crud, it instead times the CRUD layer of design.py on DailyRestriction
+records: created, updated and deleted one call (and one transaction) per record,
+then in batches of one executemany each, read back page by page, and written in
+batches again with a change log, which is then replayed and compacted.
+
+With --diagrams, it times the chart endpoints of design.Diagrams over synthetic daily
+histories of growing length, reporting the time to precompute the aggregates once
+and the time and size of each response, which should stay flat.
+
+Usage:
+    python -m coursework2.benchmark --repeat 20000
+    python -m coursework2.benchmark --crud 100000
+    python -m coursework2.benchmark --diagrams 10 100 1000
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from coursework2.design import CRUD, ChangesLog, Diagrams
+from coursework2.sql_queries import Queries
+
+DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "covid_copy.db")
+TXT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries.txt")
+COUNT = ("SELECT restriction_id, COUNT(*) AS restriction_count FROM DailyRestriction "
+         "WHERE in_place = 1 AND restriction_id = ? AND date_id <= ? GROUP BY restriction_id;")
+
+
+def bench(db_path, repeat):
+    params = [(i % 10, (i * 37) % 1416) for i in range(repeat)]
+    literal = COUNT.replace("?", "{}")
+    timings = {}
+
+    start = time.perf_counter()
+    for args in params[:max(1, repeat // 10)]:
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(literal.format(*args)).fetchall()
+    timings["connection per query"] = (time.perf_counter() - start) * 10
+
+    for name, cached, query in (("formatted SQL text", 256, literal),
+                                ("bound parameters, no statement cache", 0, COUNT),
+                                ("bound parameters, statement cache", 256, COUNT)):
+        queries = Queries(db_path, TXT_FILE, cached_statements=cached)
+        start = time.perf_counter()
+        if query is literal:
+            for args in params:
+                queries.execute(literal.format(*args))
+        else:
+            for args in params:
+                queries.execute(query, args)
+        timings[name] = time.perf_counter() - start
+        queries.close()
+
+    for name, seconds in timings.items():
+        print(f"{name}: {seconds / repeat * 1e6:.1f} us/query")
+    return timings
+
+
+def bench_crud(db_path, rows, batch_size=10_000):
+    records = [(100_000 + i // 10, i % 10, i % 2) for i in range(rows)]
+    flipped = [(day, restriction, 1 - flag) for day, restriction, flag in records]
+    keys = [(day, restriction) for day, restriction, _ in records]
+    batches = range(0, rows, batch_size)
+    crud = CRUD(db_path)
+    timings = {}
+
+    # every per-record call commits, so only a tenth of the records are timed
+    sample = max(1, rows // 10)
+    for name, method, data in (("create", crud.create, records), ("update", crud.update, flipped),
+                               ("delete", crud.delete, keys)):
+        start = time.perf_counter()
+        for record in data[:sample]:
+            method("DailyRestriction", [record])
+        timings[f"{name}, per record"] = (time.perf_counter() - start) * rows / sample
+    crud.delete("DailyRestriction", keys)
+
+    for name, method, data in (("create", crud.create, records), ("update", crud.update, flipped)):
+        start = time.perf_counter()
+        for i in batches:
+            method("DailyRestriction", data[i:i + batch_size])
+        timings[f"{name}, batched"] = time.perf_counter() - start
+    start = time.perf_counter()
+    read = sum(len(page) for page in crud.iter_pages("DailyRestriction", limit=batch_size,
+                                                     where="date_id >= ?", params=(100_000,)))
+    timings["read, keyset pages"] = time.perf_counter() - start
+    assert read == rows
+    start = time.perf_counter()
+    for i in batches:
+        crud.delete("DailyRestriction", keys[i:i + batch_size])
+    timings["delete, batched"] = time.perf_counter() - start
+
+    # the same batches, appended to a change log in the same transactions, once the
+    # dates they refer to exist
+    crud.create("Date", [(f"day {day}", day) for day in range(100_000, 100_000 + rows // 10)])
+    crud.log = ChangesLog(db_path, crud._pool)
+    crud.log.snapshot("DailyRestriction")
+    for name, method, data in (("create", crud.create, records), ("update", crud.update, flipped),
+                               ("delete", crud.delete, keys)):
+        start = time.perf_counter()
+        for i in batches:
+            method("DailyRestriction", data[i:i + batch_size])
+        timings[f"{name}, batched and logged"] = time.perf_counter() - start
+    start = time.perf_counter()
+    crud.log.replay("DailyRestriction")
+    timings["replay of the log"] = time.perf_counter() - start
+    start = time.perf_counter()
+    crud.log.compact("DailyRestriction")
+    timings["compaction of the log"] = time.perf_counter() - start
+    crud.close()
+
+    for name, seconds in timings.items():
+        print(f"{name}: {seconds:.2f} s for {rows} records")
+    return timings
+
+
+def bench_diagrams(years, width=1000, repeat=20):
+    rng = np.random.default_rng(0)
+    summary = pd.DataFrame({'date': ['2020-03-23'], 'restriction': ['Lockdown 1']})
+    for n_years in years:
+        days = n_years * 365
+        # restrictions switching on and off every few weeks
+        flags = (rng.random((days // 20 + 1, 10)) < 0.4).repeat(20, axis=0)[:days]
+        daily = pd.DataFrame(flags.astype(np.uint8), columns=[f"r{i}" for i in range(10)])
+        daily.insert(0, 'date', (np.datetime64('1900-01-01') + np.arange(days)).astype(str))
+        diagrams = Diagrams(daily, pd.DataFrame(), summary)
+        start = time.perf_counter()
+        diagrams.plot_bar_graph()
+        built = time.perf_counter() - start
+        for method in Diagrams.METHODS:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                response = diagrams.plot_lockdown_timeline(width=width, method=method)
+            seconds = (time.perf_counter() - start) / repeat
+            print(f"{n_years} years ({days} days), {method}: precomputed in {built:.3f} s, "
+                  f"{seconds * 1e3:.2f} ms/response, {len(response['x'])} points, "
+                  f"{len(json.dumps(response)) / 1024:.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times repeated parameterized queries")
+    parser.add_argument('--repeat', type=int, default=20_000, help="number of queries per mode")
+    parser.add_argument('--crud', type=int, metavar='ROWS',
+                        help="times CRUD on ROWS records instead")
+    parser.add_argument('--diagrams', type=int, nargs='+', metavar='YEARS',
+                        help="times the chart endpoints on histories of YEARS years instead")
+    args = parser.parse_args()
+    if args.diagrams:
+        bench_diagrams(args.diagrams)
+        return
+    with tempfile.TemporaryDirectory() as folder:
+        db_path = os.path.join(folder, "covid.db")
+        shutil.copyfile(DB, db_path)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE INDEX idx_restriction_date "
+                         "ON DailyRestriction (restriction_id, in_place, date_id);")
+            # updates and deletes find their rows by key
+            conn.execute("CREATE INDEX idx_daily_key "
+                         "ON DailyRestriction (date_id, restriction_id);")
+        if args.crud:
+            bench_crud(db_path, args.crud)
+        else:
+            bench(db_path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
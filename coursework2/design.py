@@ -1,86 +1,937 @@
-from ..coursework1.data_exploration.main import DataPreparation
+import inspect
+import json
+import zlib
+from collections import OrderedDict
+from contextlib import nullcontext
+from urllib.parse import parse_qsl, urlsplit
+import numpy as np
 import pandas as pd
 
+from coursework1.data_exploration.main import DataPreparation
+from coursework1.database_creation.connection import ConnectionPool
+
+
 class Graph:
-    def __init__(self) -> None:
-        self.adjency_list = []
-    
-    def add_node(self, val, edges):
-        pass
+    """
+    Directed weighted graph stored as a CSR (compressed sparse row) adjacency index.
+
+    The edges leaving node i are targets[offsets[i]:offsets[i + 1]], sorted, with their
+    weights at the same positions in weights, so the whole graph is held in three
+    NumPy arrays rather than a Python list per node. Nodes can be any hashable label
+    and are mapped to their position by a dict.
+
+    Edges added one at a time go to a pending buffer, merged into the arrays once it
+    grows past a quarter of the graph (or when neighbours are next read), so insertion
+    is amortized O(log E) instead of O(E). Adding an edge that exists adds to its weight.
+    """
+    def __init__(self, directed=True) -> None:
+        self.directed = directed
+        self.labels = []
+        self._index = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.targets = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.int64)
+        self._pending = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, node):
+        return node in self._index
+
+    @property
+    def number_of_edges(self):
+        self._compact()
+        return len(self.targets)
+
+    @classmethod
+    def from_frame(cls, data, source, target, weight=None, directed=True):
+        """
+        Builds a graph in bulk from a DataFrame with one row per edge. Repeated edges
+        are merged, summing their weights (or counting them if weight is not given). In
+        an undirected graph, each row gives the edge in both directions.
+        """
+        graph = cls(directed)
+        codes, labels = pd.factorize(pd.concat([data[source], data[target]], ignore_index=True))
+        graph.labels = list(labels)
+        graph._index = {label: i for i, label in enumerate(graph.labels)}
+        weights = data[weight].to_numpy() if weight is not None else np.ones(len(data), np.int64)
+        sources, targets = codes[:len(data)], codes[len(data):]
+        if not directed:
+            loops = sources == targets
+            sources, targets = (np.concatenate([sources, targets[~loops]]),
+                                np.concatenate([targets, sources[~loops]]))
+            weights = np.concatenate([weights, weights[~loops]])
+        graph._build(sources, targets, weights)
+        return graph
+
+    @classmethod
+    def transitions(cls, daily, date_col='date_id', restriction_col='restriction_id',
+                    in_place_col='in_place'):
+        """
+        Graph of restriction transitions from DailyRestriction rows: an edge A -> B for
+        every day t on which A is in place and B is in place on the next day, weighted by
+        the number of such days.
+        """
+        active = daily.loc[daily[in_place_col] == 1, [date_col, restriction_col]]
+        day = pd.Series(np.arange(daily[date_col].nunique()),
+                        index=np.sort(daily[date_col].unique()))
+        active = pd.DataFrame({'day': day[active[date_col]].to_numpy(),
+                               'node': active[restriction_col].to_numpy()})
+        following = active.assign(day=active['day'] - 1)
+        pairs = active.merge(following, on='day', suffixes=('_from', '_to'))
+        return cls.from_frame(pairs, 'node_from', 'node_to')
+
+    @classmethod
+    def co_occurrence(cls, daily, date_col='date_id', restriction_col='restriction_id',
+                      in_place_col='in_place'):
+        """
+        Undirected graph of restrictions in place on the same day, weighted by the
+        number of days they were in place together.
+        """
+        active = daily.loc[daily[in_place_col] == 1, [date_col, restriction_col]]
+        pairs = active.merge(active, on=date_col, suffixes=('_from', '_to'))
+        pairs = pairs[pairs[f"{restriction_col}_from"] < pairs[f"{restriction_col}_to"]]
+        return cls.from_frame(pairs, f"{restriction_col}_from", f"{restriction_col}_to",
+                              directed=False)
+
+    def _build(self, sources, targets, weights):
+        """Rebuilds the arrays from edge lists, merging repeated edges."""
+        n = len(self.labels)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights)
+        if len(sources):
+            keys = sources * max(n, 1) + targets
+            keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            weights = np.bincount(inverse, weights=weights).astype(weights.dtype)
+            sources, targets = sources[first], targets[first]
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=self.offsets[1:])
+        self.targets = targets.astype(np.int32 if n < 2**31 else np.int64)
+        self.weights = weights
+
+    def _edge_list(self):
+        """Sources, targets and weights of the edges in the arrays."""
+        counts = np.diff(self.offsets)
+        return np.repeat(np.arange(len(counts)), counts), self.targets, self.weights
+
+    def _compact(self):
+        """Merges the pending edges, and the nodes added since, into the arrays."""
+        if not self._pending and len(self.offsets) == len(self.labels) + 1:
+            return
+        sources, targets, weights = self._edge_list()
+        if self._pending:
+            pending = np.array(list(self._pending), dtype=np.int64).reshape(-1, 2)
+            sources = np.concatenate([sources, pending[:, 0]])
+            targets = np.concatenate([targets, pending[:, 1]])
+            weights = np.concatenate([weights, np.array(list(self._pending.values()))])
+        self._pending = {}
+        self._build(sources, targets, weights)
+
+    def _row(self, i):
+        """Positions of the edges leaving the node at position i in the arrays."""
+        if i + 1 >= len(self.offsets):
+            return slice(0, 0)
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def _position(self, node):
+        if node not in self._index:
+            raise KeyError(f"No node {node!r} in the graph")
+        return self._index[node]
+
+    def add_node(self, val, edges=()):
+        """Adds a node, if it is new, and edges from it to each node of edges."""
+        if val not in self._index:
+            self._index[val] = len(self.labels)
+            self.labels.append(val)
+        for node in edges:
+            self.add_edge(val, node)
 
-    def add_edge(self, node_from, node_to):
-        pass
+    def add_edge(self, node_from, node_to, weight=1):
+        """Adds an edge, adding its nodes if they are new, or adds weight to an existing one."""
+        self.add_node(node_from)
+        self.add_node(node_to)
+        i, j = self._index[node_from], self._index[node_to]
+        pairs = [(i, j), (j, i)] if not self.directed and i != j else [(i, j)]
+        for pair in pairs:
+            self._pending[pair] = self._pending.get(pair, 0) + weight
+        if len(self._pending) > max(1024, len(self.targets) // 4):
+            self._compact()
 
     def remove_node(self, node):
-        pass
+        """Removes a node with every edge to or from it, in O(V + E)."""
+        i = self._position(node)
+        self._compact()
+        sources, targets, weights = self._edge_list()
+        keep = (sources != i) & (targets != i)
+        sources, targets = sources[keep], targets[keep]
+        del self.labels[i]
+        self._index = {label: k for k, label in enumerate(self.labels)}
+        self._build(sources - (sources > i), targets - (targets > i), weights[keep])
 
     def remove_edge(self, node_from, node_to):
-        pass
+        """Removes an edge (both directions in an undirected graph), in O(E)."""
+        if not self.has_edge(node_from, node_to):
+            raise KeyError(f"No edge {node_from!r} -> {node_to!r} in the graph")
+        self._compact()
+        i, j = self._index[node_from], self._index[node_to]
+        for u, v in ([(i, j), (j, i)] if not self.directed and i != j else [(i, j)]):
+            row = self._row(u)
+            position = row.start + np.searchsorted(self.targets[row], v)
+            self.targets = np.delete(self.targets, position)
+            self.weights = np.delete(self.weights, position)
+            self.offsets[u + 1:] -= 1
 
-    def has_edge(self, node):
-        pass
+    def has_node(self, node):
+        return node in self._index
+
+    def has_edge(self, node_from, node_to):
+        """Whether an edge exists, looked up in the pending edges, else searched in its row."""
+        i, j = self._index.get(node_from), self._index.get(node_to)
+        if i is None or j is None:
+            return False
+        if (i, j) in self._pending:
+            return True
+        row = self.targets[self._row(i)]
+        position = np.searchsorted(row, j)
+        return bool(position < len(row) and row[position] == j)
+
+    def weight(self, node_from, node_to):
+        """Weight of an edge, 0 if it does not exist."""
+        self._compact()
+        i, j = self._position(node_from), self._position(node_to)
+        row = self._row(i)
+        position = row.start + np.searchsorted(self.targets[row], j)
+        if position < row.stop and self.targets[position] == j:
+            return self.weights[position].item()
+        return 0
+
+    def neighbors(self, node):
+        """Nodes the edges leaving a node lead to."""
+        self._compact()
+        return [self.labels[j] for j in self.targets[self._row(self._position(node))]]
+
+    def _expand(self, frontier):
+        """Sources and targets of every edge leaving the nodes of a frontier, vectorized."""
+        starts, stops = self.offsets[frontier], self.offsets[frontier + 1]
+        counts = stops - starts
+        sources = np.repeat(frontier, counts)
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return sources, self.targets[positions]
+
+    def _bfs(self, i, stop=None):
+        """Distances and parents of the nodes reached from position i, level by level."""
+        self._compact()
+        distance = np.full(len(self.labels), -1, dtype=np.int64)
+        parent = np.full(len(self.labels), -1, dtype=np.int64)
+        distance[i] = 0
+        frontier, level = np.array([i], dtype=np.int64), 0
+        while len(frontier) and (stop is None or distance[stop] < 0):
+            level += 1
+            sources, targets = self._expand(frontier)
+            new = distance[targets] < 0
+            targets, first = np.unique(targets[new], return_index=True)
+            distance[targets] = level
+            parent[targets] = sources[new][first]
+            frontier = targets
+        return distance, parent
+
+    def bfs(self, start):
+        """Nodes reachable from start with their distance in edges, in breadth-first order."""
+        distance, _ = self._bfs(self._position(start))
+        reached = np.flatnonzero(distance >= 0)
+        order = reached[np.argsort(distance[reached], kind='stable')]
+        return {self.labels[i]: int(distance[i]) for i in order}
+
+    def shortest_path(self, source, target):
+        """Nodes of a path from source to target with the fewest edges, None if there is none."""
+        i, j = self._position(source), self._position(target)
+        distance, parent = self._bfs(i, stop=j)
+        if distance[j] < 0:
+            return None
+        path = [j]
+        while path[-1] != i:
+            path.append(parent[path[-1]])
+        return [self.labels[k] for k in reversed(path)]
+
+# columns of each table with their type, and the columns identifying a row
+TABLES = {
+    'Date': ({'date': str, 'date_id': int}, ('date_id',)),
+    'Week': ({'week_start': str, 'week_id': int}, ('week_id',)),
+    'Restriction': ({'restriction': str, 'restriction_id': int}, ('restriction_id',)),
+    'Source': ({'source': str, 'source_id': int}, ('source_id',)),
+    'DailyRestriction': ({'date_id': int, 'restriction_id': int, 'in_place': int},
+                         ('date_id', 'restriction_id')),
+    'WeeklyRestriction': ({'week_id': int, 'restriction_id': int, 'in_place': int},
+                          ('week_id', 'restriction_id')),
+    'SummaryRestriction': ({'date_id': int, 'restriction_id': int, 'source_id': int,
+                            'in_place': int}, ('date_id', 'restriction_id', 'source_id')),
+}
+FACTS = ('DailyRestriction', 'WeeklyRestriction', 'SummaryRestriction')
+# columns of ChangeLog read by history, every one but the records
+HISTORY_COLUMNS = ('change_id', 'logged_at', 'table_name', 'operation', 'record_count')
+
+
+def compact_frame(data, types):
+    """Stores the integer columns of a table in their smallest type and text ones as categories."""
+    for col, kind in types.items():
+        if kind is int:
+            data[col] = pd.to_numeric(data[col], downcast='integer')
+        elif not isinstance(data[col].dtype, pd.CategoricalDtype):
+            data[col] = data[col].astype('category')
+    return data
+
+
+def apply_batch(state, operation, batch, key):
+    """
+    Applies a CRUD batch to a DataFrame of a table as SQLite applies it to the table:
+    create appends the records, update sets the columns of every row with the key of a
+    record (the last record with a key winning) and delete drops every row with the
+    key of a record.
+    """
+    if operation == 'create':
+        return pd.concat([state, batch[list(state.columns)]], ignore_index=True)
+    key = list(key)
+    batch = batch.drop_duplicates(key, keep='last')
+    positions = pd.MultiIndex.from_frame(batch[key]).get_indexer(
+        pd.MultiIndex.from_frame(state[key]))
+    matched = positions >= 0
+    if operation == 'delete':
+        return state[~matched].reset_index(drop=True)
+    state = state.copy()
+    for col in batch.columns.difference(key):
+        if isinstance(state[col].dtype, pd.CategoricalDtype):
+            state[col] = state[col].astype(object)
+        values = state[col].to_numpy(copy=True)
+        values[matched] = batch[col].to_numpy()[positions[matched]]
+        state[col] = values
+    return state
 
-    def has_node(self, node_from, node_to):
-        pass
 
 class Database:
-    def __init__(self, conn_str) -> None:
+    """
+    Access to the coursework database with an in-memory cache of its tables.
+
+    A table is read from SQLite on first use and then served from memory, with its
+    integer columns downcast and its text columns stored as categories. Batches
+    written through CRUD are applied to the cached tables once committed, so reads stay
+    coherent without going back to disk. Tables changed by other means must be
+    dropped with invalidate. Once the cached tables take more than max_bytes, the
+    least recently used are evicted. A table larger than max_bytes on its own is
+    served but not kept.
+
+    The fact tables are available as daily, weekly and summary, and the batches logged
+    by a ChangesLog as changes.
+    """
+    def __init__(self, conn_str, pool=None, max_bytes=64 * 2**20) -> None:
         self.conn_str = conn_str
-        self.daily = pd.DataFrame()
-        self.weekly = pd.DataFrame()
-        self.summary = pd.DataFrame()
-        self.changes = pd.DataFrame()
+        self._pool = pool if pool is not None else ConnectionPool(conn_str)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._tables = OrderedDict()
+
+    daily = property(lambda self: self.get_table('DailyRestriction'))
+    weekly = property(lambda self: self.get_table('WeeklyRestriction'))
+    summary = property(lambda self: self.get_table('SummaryRestriction'))
+    changes = property(lambda self: self.history())
+
+    @staticmethod
+    def schema(table):
+        """Column types and key columns of a table, refusing tables outside TABLES."""
+        if table not in TABLES:
+            raise ValueError(f"Unknown table {table!r}, expected one of {list(TABLES)}")
+        return TABLES[table]
 
     def get_db(self):
-        pass
+        """The calling thread's connection to the database."""
+        return self._pool.connection()
+
+    def get_table(self, table):
+        """
+        Returns a table as a DataFrame, read from SQLite only if it is not cached. A table
+        read inside a transaction may hold uncommitted rows, so it is not cached.
+        """
+        if table in self._tables:
+            self.hits += 1
+            self._tables.move_to_end(table)
+            return self._tables[table].copy(deep=False)
+        self.misses += 1
+        types, _ = self.schema(table)
+        conn = self.get_db()
+        data = compact_frame(
+            pd.read_sql_query(f"SELECT {', '.join(types)} FROM {table};", conn), types
+            )
+        if not (self._pool.in_transaction() or conn.in_transaction):
+            self._cache(table, data)
+        return data.copy(deep=False)
+
+    def history(self, table=None):
+        """
+        Reads the batches logged by a ChangesLog, without their records, oldest first.
+        Empty if nothing was ever logged to the database.
+        """
+        conn = self.get_db()
+        logged = conn.execute("SELECT 1 FROM sqlite_master "
+                              "WHERE type = 'table' AND name = 'ChangeLog';").fetchone()
+        if logged is None:
+            return pd.DataFrame(columns=list(HISTORY_COLUMNS))
+        predicate = " WHERE table_name = ?" if table else ""
+        return pd.read_sql_query(
+            f"SELECT {', '.join(HISTORY_COLUMNS)} FROM ChangeLog{predicate} ORDER BY change_id;",
+            conn, params=(table,) if table else None)
+
+    def _cache(self, table, data):
+        """Keeps a table in the cache, evicting the least recently used ones beyond max_bytes."""
+        self._tables[table] = data
+        self._tables.move_to_end(table)
+        while self.cache_size() > self.max_bytes and self._tables:
+            self._tables.popitem(last=False)
+
+    def cache_size(self):
+        """Memory taken by the cached tables, in bytes."""
+        return int(sum(data.memory_usage(deep=True).sum() for data in self._tables.values()))
+
+    def cached_tables(self):
+        """Names of the cached tables, least recently used first."""
+        return list(self._tables)
+
+    def invalidate(self, table=None):
+        """Drops a table, or every table, from the cache."""
+        if table is None:
+            self._tables.clear()
+        else:
+            self._tables.pop(table, None)
+
+    def _apply(self, table, operation, columns, rows):
+        """Applies a committed batch to the cached copy of its table, if there is one."""
+        if table not in self._tables:
+            return
+        types, key = self.schema(table)
+        batch = pd.DataFrame(rows, columns=list(columns))
+        data = apply_batch(self._tables[table], operation, batch, key)
+        self._cache(table, compact_frame(data, types))
 
-    def get_table(self):
-        pass
+    def close(self):
+        self._pool.close()
 
 class CRUD(Database):
-    def __init__(self, conn_str) -> None:
-        super().__init__(conn_str)
+    """
+    Create, read, update and delete rows of the tables in TABLES in batches.
+
+    Records are given as a DataFrame or as an iterable of dicts or of tuples in the
+    order of the table's columns. A batch is validated once, as a whole, then written
+    with a single executemany in one transaction, so it is written entirely or not at
+    all and costs one commit however many records it holds. Inside an enclosing
+    transaction the batch runs under a savepoint of its own, which a failing record
+    rolls back with the log entry even if the enclosing block catches the error.
+
+    Update and delete find each row by its key columns, which the fact tables need an
+    index on to avoid a scan per record.
+
+    With a ChangesLog, each batch is also appended to the log, in the same transaction.
+    """
+    def __init__(self, conn_str, pool=None, log=None) -> None:
+        super().__init__(conn_str, pool)
+        self.log = log
+
+    def validate(self, table, records, columns=None):
+        """
+        Checks a batch of records against the schema of a table and returns them as
+        tuples of Python values in the order of columns (every column by default).
+        Raises ValueError if a column is missing, a value is null or of the wrong type,
+        or an in_place flag is not 0 or 1.
+        """
+        types, _ = self.schema(table)
+        columns = list(columns or types)
+        if isinstance(records, pd.DataFrame):
+            data = records
+        else:
+            records = list(records)
+            data = pd.DataFrame.from_records(
+                records, columns=None if records and isinstance(records[0], dict) else columns
+                )
+        missing = [col for col in columns if col not in data.columns]
+        if missing:
+            raise ValueError(f"Missing columns for {table}: {missing}")
+        data = data[columns]
+        if data.isna().any().any():
+            nulls = data.isna().sum()
+            raise ValueError(f"Null values in {table}: {nulls[nulls > 0].to_dict()}")
+        values = {}
+        for col in columns:
+            if types[col] is int:
+                converted = pd.to_numeric(data[col], errors='coerce')
+                if converted.isna().any() or (converted % 1 != 0).any():
+                    raise ValueError(f"Non-integer values in {table}.{col}")
+                values[col] = converted.astype(np.int64)
+                if col == 'in_place' and not values[col].isin((0, 1)).all():
+                    raise ValueError(f"in_place must be 0 or 1 in {table}")
+            else:
+                values[col] = data[col].astype(str)
+        return list(zip(*(values[col].tolist() for col in columns)))
+
+    def create(self, table, records):
+        """Inserts a batch of records, returning the number of rows inserted."""
+        columns = list(self.schema(table)[0])
+        rows = self.validate(table, records, columns)
+        query = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                 f"VALUES ({', '.join('?' * len(columns))});")
+        return self._write(table, 'create', query, columns, rows)
+
+    def _write(self, table, operation, query, columns, rows, params=None):
+        """
+        Runs a batch in one transaction, or a savepoint when nested, appending it to the
+        log first if there is one, then applies it to the cached table once committed.
+        """
+        with self._pool.transaction() as conn:
+            if self.log is not None:
+                self.log.append(table, operation, columns, rows, conn)
+            count = conn.executemany(query, rows if params is None else params).rowcount
+        if conn.in_transaction:
+            # the batch joined an enclosing transaction, which may still be rolled back
+            self.invalidate(table)
+        else:
+            self._apply(table, operation, columns, rows)
+        return count
+
+    def read(self, table, after=None, limit=1000, where=None, params=()):
+        """
+        Reads one page of a table, returning its rows as tuples with the key to pass as
+        after to read the next page, None after the last one.
 
-    def create():
-        pass
+        Pages are keyset-paginated on rowid (the id column of the dimension tables): a
+        page starts with a seek on the rowid past the end of the previous page instead
+        of skipping over it with OFFSET, so reading any page costs the same.
+        """
+        columns = list(self.schema(table)[0])
+        clauses = ([where] if where else []) + (["rowid > ?"] if after is not None else [])
+        predicate = f" WHERE {' AND '.join(f'({c})' for c in clauses)}" if clauses else ""
+        query = (f"SELECT rowid, {', '.join(columns)} FROM {table}{predicate} "
+                 f"ORDER BY rowid LIMIT {int(limit)};")
+        params = tuple(params) + ((after,) if after is not None else ())
+        rows = self.get_db().execute(query, params).fetchall()
+        next_key = rows[-1][0] if len(rows) == limit else None
+        return [row[1:] for row in rows], next_key
 
-    def read():
-        pass
+    def iter_pages(self, table, limit=1000, where=None, params=()):
+        """Yields every page of a table read with read."""
+        after = None
+        while True:
+            rows, after = self.read(table, after, limit, where, params)
+            if rows:
+                yield rows
+            if after is None:
+                return
 
-    def update():
-        pass
+    def update(self, table, records, columns=None):
+        """
+        Sets the columns of the rows identified by the key columns of each record,
+        every non-key column by default, and returns the number of rows updated.
+        Tuples give the key columns first, then the columns to set.
+        """
+        types, key = self.schema(table)
+        columns = list(columns or [col for col in types if col not in key])
+        rows = self.validate(table, records, list(key) + columns)
+        query = (f"UPDATE {table} SET {', '.join(f'{col} = ?' for col in columns)} "
+                 f"WHERE {' AND '.join(f'{col} = ?' for col in key)};")
+        params = [row[len(key):] + row[:len(key)] for row in rows]
+        return self._write(table, 'update', query, list(key) + columns, rows, params)
+
+    def delete(self, table, records):
+        """Deletes the rows identified by the key columns of each record, returning how many."""
+        _, key = self.schema(table)
+        rows = self.validate(table, records, key)
+        query = f"DELETE FROM {table} WHERE {' AND '.join(f'{col} = ?' for col in key)};"
+        return self._write(table, 'delete', query, key, rows)
+
+# table and column each id column of the fact tables refers to
+REFERENCES = {'date_id': ('Date', 'date_id'), 'week_id': ('Week', 'week_id'),
+              'restriction_id': ('Restriction', 'restriction_id'),
+              'source_id': ('Source', 'source_id')}
+# ids looked up per query when checking the references of a batch
+LOOKUP_SIZE = 500
+OPERATIONS = ('create', 'update', 'delete')
 
-    def delete():
-        pass
 
 class ChangesLog(Database):
-    def __init__(self, conn_str, new_entry) -> None:
-        super().__init__(conn_str)
-        self.new_entry = new_entry
+    """
+    Append-only log of the batches written through CRUD, kept in the database itself.
+
+    Each batch is one row of ChangeLog, its records stored together as JSON, appended
+    in the same transaction as the batch so the log and the tables never disagree and
+    a batch costs one more statement rather than one per record. ChangeSnapshot holds
+    copies of the tables as of a change. They are never taken while a batch is written,
+    which would hold the write lock for a dump of the whole table, but by snapshot and
+    by compact, which snapshots the tables with snapshot_every batches logged since
+    their last snapshot and drops the snapshots and log entries it makes redundant.
+    A table with no snapshot is replayed from empty, so one that already holds rows
+    should be snapshot before its changes are logged. change_id is AUTOINCREMENT, so the ids
+    of dropped entries are never given to new ones, which replay would otherwise take
+    for changes already in a snapshot.
+    """
+    def __init__(self, conn_str, pool=None, snapshot_every=100) -> None:
+        super().__init__(conn_str, pool)
+        self.snapshot_every = snapshot_every
+        self.new_entry = None
+        with self._pool.transaction() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS ChangeLog (
+                change_id INTEGER PRIMARY KEY AUTOINCREMENT, logged_at TEXT NOT NULL,
+                table_name TEXT NOT NULL, operation TEXT NOT NULL,
+                columns TEXT NOT NULL, records TEXT NOT NULL, record_count INTEGER NOT NULL);""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS ChangeSnapshot (
+                snapshot_id INTEGER PRIMARY KEY, change_id INTEGER NOT NULL,
+                table_name TEXT NOT NULL, columns TEXT NOT NULL, records BLOB NOT NULL);""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_change_table "
+                         "ON ChangeLog (table_name, change_id);")
+
+    def is_valid(self, table, records, constraints=None, conn=None):
+        """
+        Checks a whole batch of records at once and returns a boolean array, True for
+        the records meeting every constraint.
+
+        constraints maps columns to a collection of allowed values or to a function
+        taking the column as a Series and returning a boolean mask. By default, in_place
+        must be 0 or 1 and the id columns of the fact tables must exist in the tables
+        they refer to, looked up on conn (the calling thread's connection by default)
+        so that rows inserted earlier in its transaction count. Columns missing from
+        records are not checked.
+        """
+        types, _ = self.schema(table)
+        if constraints is None:
+            conn = conn if conn is not None else self.get_db()
+            constraints = {'in_place': (0, 1)} if 'in_place' in types else {}
+            if table in FACTS:
+                constraints.update({col: self._ids(conn, *REFERENCES[col], records[col])
+                                    for col in types if col in REFERENCES and col in records})
+        valid = np.ones(len(records), dtype=bool)
+        for col, constraint in constraints.items():
+            if col not in records.columns:
+                continue
+            if callable(constraint):
+                valid &= np.asarray(constraint(records[col]), dtype=bool)
+            else:
+                valid &= records[col].isin(constraint).to_numpy()
+        return valid
+
+    @staticmethod
+    def _ids(conn, table, col, values):
+        """
+        The distinct values of a batch column found in the key column of the table it
+        refers to, looked up by key a few hundred at a time rather than reading the table.
+        """
+        values = pd.unique(values.to_numpy())
+        found = []
+        for start in range(0, len(values), LOOKUP_SIZE):
+            chunk = values[start:start + LOOKUP_SIZE].tolist()
+            found += [row[0] for row in conn.execute(
+                f"SELECT {col} FROM {table} WHERE {col} IN ({', '.join('?' * len(chunk))});",
+                chunk)]
+        return found
+
+    def append(self, table, operation, columns, rows, conn=None):
+        """
+        Appends a batch to the log, after checking it with is_valid. Called by CRUD before
+        running the batch, on the connection of its transaction.
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"operation must be one of {OPERATIONS}, got {operation!r}")
+        with self._transaction(conn) as conn:
+            if operation != 'delete':
+                records = pd.DataFrame(rows, columns=list(columns))
+                valid = self.is_valid(table, records, conn=conn)
+                if not valid.all():
+                    raise ValueError(f"Records breaking the constraints of {table} at "
+                                     f"positions {np.flatnonzero(~valid)[:10].tolist()}")
+            self.new_entry = {'table_name': table, 'operation': operation,
+                              'columns': list(columns), 'record_count': len(rows)}
+            conn.execute("INSERT INTO ChangeLog (logged_at, table_name, operation, columns, "
+                         "records, record_count) VALUES (datetime('now'), ?, ?, ?, ?, ?);",
+                         (table, operation, json.dumps(list(columns)), json.dumps(rows), len(rows)))
+
+    def _transaction(self, conn):
+        """The pool's transaction, or a no-op context when running on a given connection."""
+        return nullcontext(conn) if conn is not None else self._pool.transaction()
 
-    def is_valid(table, constraints):
-        pass
+    def snapshot(self, table, conn=None):
+        """Stores a copy of a table as of the last change logged, compressed JSON."""
+        columns = list(self.schema(table)[0])
+        with self._transaction(conn) as conn:
+            change_id = conn.execute(
+                "SELECT COALESCE(MAX(change_id), 0) FROM ChangeLog;").fetchone()[0]
+            rows = conn.execute(f"SELECT {', '.join(columns)} FROM {table};").fetchall()
+            conn.execute("INSERT INTO ChangeSnapshot (change_id, table_name, columns, records) "
+                         "VALUES (?, ?, ?, ?);", (change_id, table, json.dumps(columns),
+                                                  zlib.compress(json.dumps(rows).encode())))
+
+    def replay(self, table, until=None):
+        """
+        Rebuilds a table as it was after the change until (the last change by default)
+        from the closest snapshot at or before it and the batches logged after it, or
+        from an empty table and every batch logged if the table has no snapshot. Raises
+        ValueError if the table has snapshots but none that old, as the batches before
+        them may have been compacted.
+        """
+        types, key = self.schema(table)
+        until = until if until is not None else float('inf')
+        conn = self.get_db()
+        snapshot = conn.execute(
+            "SELECT change_id, columns, records FROM ChangeSnapshot WHERE table_name = ? "
+            "AND change_id <= ? ORDER BY change_id DESC LIMIT 1;", (table, until)).fetchone()
+        if snapshot is not None:
+            start = snapshot[0]
+            state = pd.DataFrame(json.loads(zlib.decompress(snapshot[2])),
+                                 columns=json.loads(snapshot[1]))
+        elif conn.execute("SELECT 1 FROM ChangeSnapshot WHERE table_name = ? LIMIT 1;",
+                          (table,)).fetchone() is None:
+            start, state = 0, pd.DataFrame(columns=list(types))
+        else:
+            raise ValueError(f"No snapshot of {table} at or before change {until}")
+        batches = conn.execute(
+            "SELECT operation, columns, records FROM ChangeLog WHERE table_name = ? "
+            "AND change_id > ? AND change_id <= ? ORDER BY change_id;",
+            (table, start, until))
+        for operation, batch_columns, records in batches:
+            batch = pd.DataFrame(json.loads(records), columns=json.loads(batch_columns))
+            state = apply_batch(state, operation, batch, key)
+        return state
+
+    def compact(self, table=None):
+        """
+        Snapshots, for one table or all of them, those with snapshot_every batches logged
+        since their latest snapshot, or any batch if they have none, then drops every
+        snapshot but the latest and the log entries it already covers. Returns the number
+        of log entries dropped.
+        """
+        tables = [table] if table else list(TABLES)
+        dropped = 0
+        with self._pool.transaction() as conn:
+            for name in tables:
+                latest = conn.execute("SELECT MAX(change_id) FROM ChangeSnapshot "
+                                      "WHERE table_name = ?;", (name,)).fetchone()[0]
+                pending = conn.execute(
+                    "SELECT COUNT(*) FROM ChangeLog WHERE table_name = ? AND change_id > ?;",
+                    (name, latest if latest is not None else 0)).fetchone()[0]
+                if pending and (latest is None or (self.snapshot_every
+                                                   and pending >= self.snapshot_every)):
+                    self.snapshot(name, conn)
+                    latest = conn.execute("SELECT MAX(change_id) FROM ChangeSnapshot "
+                                          "WHERE table_name = ?;", (name,)).fetchone()[0]
+                if latest is None:
+                    continue
+                conn.execute("DELETE FROM ChangeSnapshot WHERE table_name = ? AND change_id < ?;",
+                             (name, latest))
+                dropped += conn.execute("DELETE FROM ChangeLog WHERE table_name = ? "
+                                        "AND change_id <= ?;", (name, latest)).rowcount
+        return dropped
 
 class Diagrams(DataPreparation):
-    def __init__(self, daily: pd.DataFrame, weekly: pd.DataFrame, summary: pd.DataFrame) -> None:
-        super().__init__(daily, weekly, summary)
-    
-    def plot_lockdown_timeline(self):
-        pass
+    """
+    Data behind the dashboard charts, sized for the width they are drawn at.
 
-    def plot_bar_graph(self):
-        pass
+    Each endpoint returns a JSON serializable dict. The daily count of restrictions in
+    place is kept as a pyramid of aggregates: level k holds, for buckets of 2**k
+    consecutive days, their sum and the days of their minimum and maximum. A request
+    is answered from the coarsest level that still gives the points the chart can
+    show, so its cost and size depend on width, not on the length of the history.
 
-    def restriction_timeline(self):
-        pass
+    With region_col, the daily rows are per region and every endpoint takes a region,
+    all regions being summed if none is given.
+    """
+    PAGES = {'lockdown_timeline': 'plot_lockdown_timeline', 'bar_graph': 'plot_bar_graph',
+             'restriction_timeline': 'restriction_timeline'}
+    METHODS = ('minmax', 'lttb')
+    # query parameters that are not strings, with the type to parse them as
+    PARAM_TYPES = {'width': int, 'max_events': int, 'spacing': float}
 
-    def _goto_page(self, hyperlink):
-        pass
+    def __init__(self, daily: pd.DataFrame, weekly: pd.DataFrame, summary: pd.DataFrame,
+                 region_col=None) -> None:
+        super().__init__(daily, weekly, summary)
+        self.region_col = region_col
+        self._series = {}
+        events = self.summary[['date', 'restriction']].assign(
+            date=pd.to_datetime(self.summary['date'], errors='coerce')
+            ).dropna().sort_values('date', kind='stable')
+        self._event_days = events['date'].to_numpy('datetime64[D]')
+        self._event_labels = events['restriction'].to_numpy()
+
+    def _daily_series(self, region=None):
+        """
+        Days, pyramid of the counts of restrictions in place and running totals of the
+        days each restriction was in place, for a region, built on first use.
+        """
+        if region not in self._series:
+            data = self.daily
+            keys = ['date']
+            if self.region_col is not None:
+                keys.append(self.region_col)
+                if region is not None:
+                    data = data[data[self.region_col] == region]
+            data = data.drop_duplicates(keys, keep='last')
+            cols = [col for col in self.flag_columns(data) if col != self.region_col]
+            flags = pd.DataFrame(data[cols].to_numpy() == 1, columns=cols)
+            flags['date'] = pd.to_datetime(data['date']).to_numpy()
+            per_day = flags.groupby('date', sort=True).sum()
+            totals = np.zeros((len(per_day) + 1, len(cols)), dtype=np.int64)
+            np.cumsum(per_day.to_numpy(), axis=0, out=totals[1:])
+            self._series[region] = (per_day.index.to_numpy('datetime64[D]'),
+                                    self._pyramid(per_day.sum(axis=1).to_numpy(np.int64)),
+                                    cols, totals)
+        return self._series[region]
 
+    @staticmethod
+    def _pyramid(values):
+        """Levels of aggregates of values over buckets of 1, 2, 4... consecutive days."""
+        positions = np.arange(len(values))
+        level = {'sum': values, 'min': values, 'max': values,
+                 'argmin': positions, 'argmax': positions}
+        levels = [level]
+        while len(level['sum']) > 1:
+            even = len(level['sum']) - len(level['sum']) % 2
+            a = {name: col[0:even:2] for name, col in level.items()}
+            b = {name: col[1:even:2] for name, col in level.items()}
+            lower, higher = b['min'] < a['min'], b['max'] > a['max']
+            merged = {
+                'sum': a['sum'] + b['sum'],
+                'min': np.where(lower, b['min'], a['min']),
+                'max': np.where(higher, b['max'], a['max']),
+                'argmin': np.where(lower, b['argmin'], a['argmin']),
+                'argmax': np.where(higher, b['argmax'], a['argmax']),
+            }
+            if even < len(level['sum']):
+                merged = {name: np.append(col, level[name][-1]) for name, col in merged.items()}
+            level = merged
+            levels.append(level)
+        return levels
 
+    @staticmethod
+    def _day_range(days, start, end):
+        """Positions of the first day on or after start and past the last on or before end."""
+        first = 0 if start is None else np.searchsorted(days, np.datetime64(start, 'D'))
+        stop = len(days) if end is None else np.searchsorted(days, np.datetime64(end, 'D'),
+                                                             side='right')
+        return int(first), int(stop)
 
+    @staticmethod
+    def _minmax(levels, first, stop, buckets):
+        """
+        Positions of the minimum and maximum of every bucket between first and stop, in
+        the finest level of levels with at most buckets buckets there, and that level.
+        """
+        k = 0
+        while k + 1 < len(levels) and ((stop - 1) >> k) - (first >> k) + 1 > buckets:
+            k += 1
+        level = levels[k]
+        window = slice(first >> k, ((stop - 1) >> k) + 1)
+        positions = np.unique(np.concatenate([level['argmin'][window], level['argmax'][window]]))
+        # the buckets at the edges may reach past the range
+        return positions[(positions >= first) & (positions < stop)], k
 
+    @staticmethod
+    def lttb(x, y, threshold):
+        """
+        Largest-Triangle-Three-Buckets: keeps threshold points of a series, the first, the
+        last and from each bucket in between the one forming the largest triangle with
+        the point kept before it and the mean of the next bucket. Returns their positions.
+        """
+        n = len(x)
+        if threshold >= n:
+            return np.arange(n)
+        if threshold < 3:
+            return np.array([0, n - 1])[:threshold]
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+        kept = np.empty(threshold, dtype=np.int64)
+        kept[0], kept[-1] = 0, n - 1
+        for i in range(threshold - 2):
+            lo, hi = edges[i], edges[i + 1]
+            nxt = slice(hi, edges[i + 2] if i + 2 < len(edges) else n)
+            mean_x, mean_y = x[nxt].mean(), y[nxt].mean()
+            a = kept[i]
+            areas = np.abs((x[a] - mean_x) * (y[lo:hi] - y[a])
+                           - (x[a] - x[lo:hi]) * (mean_y - y[a]))
+            kept[i + 1] = lo + int(np.argmax(areas))
+        return kept
 
+    def plot_lockdown_timeline(self, start=None, end=None, width=1000, method='minmax',
+                               region=None):
+        """
+        Number of restrictions in place per day between start and end, as at most width
+        points: the minimum and maximum of buckets of days ('minmax'), or points chosen
+        by LTTB among those of twice as many buckets ('lttb').
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"method must be one of {self.METHODS}, got {method!r}")
+        if width < 2:
+            raise ValueError(f"width must be at least 2 points, got {width}")
+        days, levels, _, _ = self._daily_series(region)
+        first, stop = self._day_range(days, start, end)
+        if stop <= first:
+            return {'x': [], 'y': [], 'level': 0}
+        buckets = width // 2 if method == 'minmax' else width
+        positions, level = self._minmax(levels, first, stop, buckets)
+        values = levels[0]['sum'][positions]
+        if method == 'lttb' and len(positions) > width:
+            kept = self.lttb(days[positions].astype(np.int64), values, width)
+            positions, values = positions[kept], values[kept]
+        return {'x': days[positions].astype(str).tolist(), 'y': values.tolist(), 'level': level}
 
+    def plot_bar_graph(self, start=None, end=None, region=None):
+        """Number of days each restriction was in place between start and end."""
+        days, _, cols, totals = self._daily_series(region)
+        first, stop = self._day_range(days, start, end)
+        counts = totals[max(stop, first)] - totals[first]
+        return {'labels': cols, 'values': counts.tolist()}
 
+    def restriction_timeline(self, start=None, end=None, width=1000, max_events=100,
+                             spacing=None):
+        """
+        Summary events between start and end with the level of their label, or, when
+        there are more than max_events, the number of events in each of width buckets
+        of days.
+        """
+        first, stop = self._day_range(self._event_days, start, end)
+        if stop - first <= max_events:
+            days = self._event_days[first:stop]
+            return {'events': [
+                {'date': str(day), 'restriction': label, 'level': int(level)}
+                for day, label, level in zip(days, self._event_labels[first:stop],
+                                             self.label_levels(pd.Series(days), spacing))
+            ]}
+        low = np.datetime64(start, 'D') if start is not None else self._event_days[first]
+        high = np.datetime64(end, 'D') if end is not None else self._event_days[stop - 1]
+        edges = low + np.unique(np.linspace(0, (high - low).astype(np.int64) + 1,
+                                            width + 1).astype(np.int64))
+        counts = np.diff(np.searchsorted(self._event_days, edges))
+        return {'buckets': [
+            {'start': str(edges[i]), 'end': str(edges[i + 1] - 1), 'count': int(count)}
+            for i, count in enumerate(counts) if count
+        ]}
 
+    def _goto_page(self, hyperlink):
+        """
+        Answers a dashboard link such as "/charts/lockdown_timeline?start=2020-03-01&width=500"
+        with the endpoint its last path segment names, given the query parameters.
+        Raises ValueError for an unknown page, a parameter the endpoint does not take or
+        a number that does not parse.
+        """
+        url = urlsplit(hyperlink)
+        page = url.path.rstrip('/').rsplit('/', 1)[-1]
+        if page not in self.PAGES:
+            raise ValueError(f"Unknown page {page!r}, expected one of {list(self.PAGES)}")
+        endpoint = getattr(self, self.PAGES[page])
+        accepted = inspect.signature(endpoint).parameters
+        params = dict(parse_qsl(url.query))
+        unknown = [name for name in params if name not in accepted]
+        if unknown:
+            raise ValueError(f"Unknown parameters for {page}: {unknown}, "
+                             f"expected some of {list(accepted)}")
+        for name, convert in self.PARAM_TYPES.items():
+            if name in params:
+                try:
+                    params[name] = convert(params[name])
+                except ValueError:
+                    raise ValueError(f"{name} must be {convert.__name__}, "
+                                     f"got {params[name]!r}") from None
+        return endpoint(**params)
@@ -1,28 +1,179 @@
+import os
+import re
 import sqlite3
+from coursework1.database_creation.connection import ConnectionPool
+from coursework1.database_creation.streaming import iter_batches, open_stream, print_pages
+
+# size of the LRU cache of compiled statements each connection keeps, keyed on the SQL text
+STATEMENT_CACHE_SIZE = 256
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+DELETE = re.compile(r'\s*DELETE\s+FROM\s+"?(\w+)"?\s*(?:WHERE\s+(.*?))?\s*;?\s*$',
+                    re.IGNORECASE | re.DOTALL)
+QUERY_NAME = re.compile(r'--\s*name:\s*(\w+)')
+# characters opening a string literal or a quoted identifier, with the one closing it
+QUOTES = {"'": "'", '"': '"', '`': '`', '[': ']'}
+
+# parsed scripts by absolute path, with the size and modification time they were read at
+_SCRIPTS = {}
+
+
+def iter_statements(lines):
+    """
+    Splits SQL text, given as an iterable of lines such as an open file, into statements
+    and yields them as (name, statement) pairs, one statement at a time.
+
+    A semicolon ends a statement only outside string literals, quoted identifiers and
+    comments, and only once sqlite3.complete_statement accepts the text, so that the
+    statements in the body of a trigger are not split. A statement preceded by a
+    "-- name: <name>" comment is named after it, other statements get None.
+    """
+    current, name, quote, block_comment = [], None, None, False
+    for line in lines:
+        i, start = 0, 0
+        while i < len(line):
+            char = line[i]
+            if block_comment:
+                if line.startswith('*/', i):
+                    block_comment = False
+                    i += 1
+            elif quote is not None:
+                if char == quote:
+                    quote = None
+            elif char in QUOTES:
+                quote = QUOTES[char]
+            elif line.startswith('--', i):
+                # comments before a statement are dropped, those inside it are kept
+                if not ''.join(current).strip() and not line[start:i].strip():
+                    match = QUERY_NAME.match(line, i)
+                    if match:
+                        name = match.group(1)
+                    current, start = [], len(line)
+                break
+            elif line.startswith('/*', i):
+                block_comment = True
+                i += 1
+            elif char == ';':
+                current.append(line[start:i + 1])
+                start = i + 1
+                statement = ''.join(current).strip()
+                if sqlite3.complete_statement(statement):
+                    if statement.rstrip(';').strip():
+                        yield name, statement
+                    current, name = [], None
+            i += 1
+        current.append(line[start:])
+    statement = ''.join(current).strip()
+    if statement:
+        yield name, statement
+
+
+def load_script(txt_file):
+    """
+    Parses a SQL script into its list of statements and a dict mapping the names of the
+    named statements to their position. The result is cached until the size or the
+    modification time of the file change.
+    """
+    path = os.path.abspath(txt_file)
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    cached = _SCRIPTS.get(path)
+    if cached is None or cached[0] != version:
+        with open(path, 'r', encoding='utf-8') as file:
+            pairs = list(iter_statements(file))
+        names = {name: i for i, (name, _) in enumerate(pairs) if name is not None}
+        cached = _SCRIPTS[path] = (version, [statement for _, statement in pairs], names)
+    return cached[1], cached[2]
+
 
 class Queries:
-    def __init__(self, db, txt_file) -> None:
+    """
+    Runs the queries of a SQL script file, and any other statement, on a database.
+
+    Statements run on the calling thread's connection from a ConnectionPool, which
+    can be shared with other objects or is created over db. Each connection keeps
+    the last cached_statements compiled statements in an LRU cache keyed on the SQL
+    text, so statements with their values bound as parameters are compiled once per
+    connection. The statements of the script are parsed on first use, and parsed
+    again once the file changes. A statement preceded by a "-- name: <name>" comment
+    can be fetched by that name with query.
+
+    Attributes:
+        _db (str): Path to the SQLite database.
+        _pool (ConnectionPool): Pool providing the connections used by every query.
+        _txt_file (str): Path to the SQL script holding the queries.
+    """
+    def __init__(self, db, txt_file, pool=None, cached_statements=STATEMENT_CACHE_SIZE) -> None:
         self._db = db
-        self.queries = self.get_queries(txt_file)
+        # sqlite3 keeps compiled statements in a per-connection LRU cache keyed on the SQL
+        # text, so a statement run again with other bound parameters is not parsed again
+        self._pool = pool if pool is not None else ConnectionPool(
+            db, cached_statements=cached_statements
+            )
+        self._txt_file = txt_file
+
+    @property
+    def queries(self):
+        """Statements of the query file, parsed on first use and again once it changes."""
+        return load_script(self._txt_file)[0]
+
+    def query(self, name):
+        """Statement of the query file named by a "-- name: <name>" comment."""
+        statements, names = load_script(self._txt_file)
+        if name not in names:
+            raise KeyError(f"No query named {name!r} in {self._txt_file}")
+        return statements[names[name]]
+
+    @staticmethod
+    def quote_identifier(name):
+        """Quotes a table or column name, refusing anything but a plain identifier."""
+        if not IDENTIFIER.fullmatch(name):
+            raise ValueError(f"Invalid SQL identifier: {name!r}")
+        return f'"{name}"'
+
+    def execute(self, query, params=()):
+        """
+        Runs one statement with bound parameters and returns its rows. Values must be
+        passed as params, with ? or :name placeholders in the query, never formatted
+        into it: the query text then stays the same across calls and is compiled once
+        per connection.
+        """
+        with self._pool.transaction() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def execute_many(self, query, seq_of_params):
+        """Runs one statement for each set of bound parameters and returns the rows changed."""
+        with self._pool.transaction() as conn:
+            return conn.executemany(query, seq_of_params).rowcount
 
     @staticmethod
     def get_queries(txt_file):
-        queries = []
-        with open(txt_file, 'r') as file:
-            lines = file.readlines()
-            current_query = ""
-            for line in lines:
-                current_query += line
-                if line.strip().endswith(';'):
-                    queries.append(current_query.strip())
-                    current_query = ""
-        return queries
-    
-    def select_query(self, query):
-        with sqlite3.connect(self._db) as conn:
+        return list(load_script(txt_file)[0])
+
+    def iter_query(self, query, params=(), batch_size=10_000, output='rows'):
+        """
+        Runs a query and yields its result in batches fetched with fetchmany, as lists of
+        rows, DataFrames ('frame') or NumPy arrays ('numpy'). Unlike select_query, only one
+        batch is held in memory at a time.
+        """
+        yield from iter_batches(self._pool.connection(), query, params, batch_size, output)
+
+    def print_query(self, query, params=(), page_size=50, max_pages=None):
+        """Streams the result of a query and prints it page by page, returning the rows printed."""
+        columns, batches = open_stream(self._pool.connection(), query, params, page_size)
+        try:
+            return print_pages((row for batch in batches for row in batch), columns,
+                               page_size, max_pages)
+        finally:
+            batches.close()
+
+    def close(self):
+        self._pool.close()
+
+    def select_query(self, query, params=()):
+        with self._pool.transaction() as conn:
             cursor = conn.cursor()
             try:
-                cursor.execute(query)
+                cursor.execute(query, params)
                 results = cursor.fetchall()
                 print("Query successful")
                 return results
@@ -30,45 +181,69 @@ class Queries:
                 print(f"Database error occurred: {db_err}")
                 return
 
-    def mod_query(self, query):
-        with sqlite3.connect(self._db) as conn:
+    def mod_query(self, query, params=()):
+        with self._pool.transaction() as conn:
             cursor = conn.cursor()
             try:
-                cursor.execute(query)
+                cursor.execute(query, params)
                 print("Query successful")
             except sqlite3.DatabaseError as db_err:
                 print(f"Database error occurred: {db_err}")
             return
 
-    def del_query(self, query):
-        with sqlite3.connect(self._db) as conn:
-            cursor = conn.cursor()
-            try:
-                if "WHERE" in query:
-                    table_name = query.split("FROM")[1].split("WHERE")[0].strip()
-                    where_clause = query.split("WHERE")[1].strip()
-                else:
-                    table_name = query.split("FROM")[1].strip()
-                    where_clause = ""
-                select_query = f"SELECT * FROM {table_name} WHERE {where_clause}" if where_clause else f"SELECT * FROM {table_name}"
-                cursor.execute(select_query)
-                deleted_rows = cursor.fetchall()
-                cursor.execute(query)
-                conn.commit()
-                print("Query successful")
-                return deleted_rows
-            except sqlite3.DatabaseError as db_err:
-                print(f"Database error occurred: {db_err}")
-                return []
+    def delete(self, table, where=None, params=(), batch_size=None):
+        """
+        Deletes the rows of a table matching a predicate and returns them, read by the
+        DELETE itself through its RETURNING clause rather than by a separate SELECT.
+
+        where is the SQL predicate, with ? or :name placeholders bound to params, and
+        every row is deleted if it is not given. With batch_size, rows are deleted at most
+        batch_size at a time, by rowid, so that no single statement has to hold every
+        deleted row. The batches run in one immediate transaction, which takes the write
+        lock up front: other writers cannot change the table until every batch is done.
+        """
+        table = self.quote_identifier(table)
+        predicate = f" WHERE {where}" if where else ""
+        if batch_size is None:
+            with self._pool.transaction() as conn:
+                return conn.execute(f"DELETE FROM {table}{predicate} RETURNING *;",
+                                    params).fetchall()
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+        query = (f"DELETE FROM {table} WHERE rowid IN "
+                 f"(SELECT rowid FROM {table}{predicate} LIMIT {int(batch_size)}) RETURNING *;")
+        deleted_rows = []
+        with self._pool.transaction() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE;")
+            while True:
+                rows = conn.execute(query, params).fetchall()
+                deleted_rows.extend(rows)
+                if len(rows) < batch_size:
+                    return deleted_rows
+
+    def del_query(self, query, params=(), batch_size=None):
+        match = DELETE.match(query)
+        if match is None:
+            print(f"Not a DELETE statement: {query}")
+            return []
+        table_name, where_clause = match.groups()
+        try:
+            deleted_rows = self.delete(table_name, where_clause, params, batch_size)
+            print("Query successful")
+            return deleted_rows
+        except (sqlite3.DatabaseError, ValueError) as db_err:
+            print(f"Database error occurred: {db_err}")
+            return []
 
 def main():
-    queries = Queries("..coursework1/database_creation/covid.db", "queries.txt")
-    restrictions = queries.select_query(queries.queries_list[0])
-    queries.mod_query(queries.queries_list[1])
-    queries.mod_query(queries.queries_list[2])
-    queries.mod_query(queries.queries_list[3])
-    restrictions = queries.select_query(queries.queries_list[4])
-    restrictions = queries.select_query(queries.queries_list[5])
+    queries = Queries("../coursework1/database_creation/covid.db", "queries.txt")
+    restrictions = queries.select_query(queries.query("restriction_counts"))
+    queries.mod_query(queries.query("insert_date"))
+    queries.mod_query(queries.query("delete_date"))
+    queries.mod_query(queries.query("update_date"))
+    restrictions = queries.select_query(queries.query("restriction_totals_until"))
+    restrictions = queries.select_query(queries.query("summary_sources"))
 
 
 
@@ -0,0 +1,277 @@
+"""
+Tests for the Graph, CRUD, ChangesLog, table cache and Diagrams endpoints of design.py.
+"""
+import os
+import shutil
+import sqlite3
+import pandas as pd
+import pytest
+import numpy as np
+from coursework2.design import CRUD, ChangesLog, Diagrams, Graph
+
+DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "covid_copy.db")
+
+
+@pytest.fixture
+def daily():
+    """DailyRestriction rows for 4 days and 3 restrictions."""
+    in_place = {1: [1, 1, 0, 0], 2: [0, 1, 1, 0], 3: [0, 0, 1, 1]}
+    return pd.DataFrame([
+        {'date_id': day, 'restriction_id': restriction, 'in_place': flag}
+        for restriction, flags in in_place.items() for day, flag in enumerate(flags)
+    ])
+
+
+def test_transitions_and_co_occurrence(daily):
+    graph = Graph.transitions(daily)
+    assert graph.weight(1, 1) == 1 and graph.weight(1, 2) == 2 and graph.weight(2, 3) == 2
+    assert not graph.has_edge(3, 1) and graph.number_of_edges == 6
+    together = Graph.co_occurrence(daily)
+    assert together.weight(1, 2) == together.weight(2, 1) == 1
+    assert not together.has_edge(1, 3)
+
+
+def test_incremental_edges_match_bulk_construction():
+    edges = pd.DataFrame({'a': list("aabbcd"), 'b': list("bcccda"), 'w': [1, 2, 3, 4, 5, 6]})
+    bulk = Graph.from_frame(edges, 'a', 'b', weight='w')
+    graph = Graph()
+    for row in edges.itertuples():
+        graph.add_edge(row.a, row.b, row.w)
+    assert graph.has_edge('b', 'c') and not graph.has_edge('c', 'b')
+    for row in edges.itertuples():
+        assert graph.weight(row.a, row.b) == bulk.weight(row.a, row.b)
+    assert graph.weight('b', 'c') == 7
+    graph.add_node('e', ['a'])
+    assert 'e' in graph and graph.neighbors('e') == ['a']
+
+
+def test_remove_and_shortest_paths():
+    graph = Graph()
+    for node_from, node_to in [(1, 2), (2, 3), (3, 4), (1, 5), (5, 4)]:
+        graph.add_edge(node_from, node_to)
+    assert graph.shortest_path(1, 4) == [1, 5, 4]
+    assert graph.bfs(1) == {1: 0, 2: 1, 5: 1, 3: 2, 4: 2}
+    graph.remove_node(5)
+    assert graph.shortest_path(1, 4) == [1, 2, 3, 4]
+    graph.remove_edge(2, 3)
+    assert graph.shortest_path(1, 4) is None and graph.has_edge(3, 4)
+    assert not graph.has_node(5) and len(graph) == 4
+    with pytest.raises(KeyError):
+        graph.remove_edge(2, 3)
+
+
+@pytest.fixture
+def crud(tmp_path):
+    """CRUD on a copy of the coursework database."""
+    db_path = str(tmp_path / "covid.db")
+    shutil.copyfile(DB, db_path)
+    res = CRUD(db_path)
+    yield res
+    res.close()
+
+
+def test_crud_batches_round_trip(crud):
+    records = pd.DataFrame({'date_id': [9000, 9000, 9001], 'restriction_id': [1, 2, 1],
+                            'in_place': [1, 0, 1]})
+    assert crud.create('DailyRestriction', records) == 3
+    assert crud.update('DailyRestriction', [{'date_id': 9000, 'restriction_id': 2,
+                                             'in_place': 1}]) == 1
+    pages = list(crud.iter_pages('DailyRestriction', limit=2, where="date_id >= ?",
+                                 params=(9000,)))
+    assert pages == [[(9000, 1, 1), (9000, 2, 1)], [(9001, 1, 1)]]
+    assert crud.delete('DailyRestriction', [(9000, 1), (9000, 2), (9001, 1)]) == 3
+    assert len(crud.get_table('DailyRestriction')) == len(crud.daily) == 14160
+
+
+def test_invalid_batch_is_rejected_whole(crud):
+    with pytest.raises(ValueError, match="in_place"):
+        crud.create('DailyRestriction', [(9000, 1, 1), (9000, 2, 5)])
+    with pytest.raises(ValueError, match="Missing"):
+        crud.create('Date', [{'date': "2024-01-01"}])
+    with pytest.raises(ValueError, match="Unknown table"):
+        crud.read('Date; DROP TABLE Date')
+    rows, after = crud.read('DailyRestriction', where="date_id >= ?", params=(9000,))
+    assert rows == [] and after is None
+
+
+def test_change_log_replays_snapshots_and_batches(crud):
+    crud.log = ChangesLog(crud.conn_str, crud._pool, snapshot_every=2)
+    crud.log.snapshot('DailyRestriction')
+    for day in range(1, 6):
+        crud.create('DailyRestriction', [(day, 1, 1), (day, 2, 0)])
+    crud.update('DailyRestriction', [(1, 2, 1)])
+    crud.delete('DailyRestriction', [(2, 1)])
+    assert crud.log.history()['operation'].tolist() == ['create'] * 5 + ['update', 'delete']
+    key = ['date_id', 'restriction_id', 'in_place']
+    current = crud.get_table('DailyRestriction').sort_values(key, ignore_index=True)
+    replayed = crud.log.replay('DailyRestriction').sort_values(key, ignore_index=True)
+    pd.testing.assert_frame_equal(replayed, current, check_dtype=False)
+    assert len(crud.log.replay('DailyRestriction', until=1)) == 14162
+    snapshots = "SELECT COUNT(*) FROM ChangeSnapshot;"
+    assert crud.get_db().execute(snapshots).fetchone() == (1,)
+    assert crud.log.compact() == 7
+    assert crud.get_db().execute(snapshots).fetchone() == (1,) and crud.changes.empty
+    pd.testing.assert_frame_equal(
+        crud.log.replay('DailyRestriction').sort_values(key, ignore_index=True), current,
+        check_dtype=False)
+    with pytest.raises(ValueError, match="No snapshot"):
+        crud.log.replay('DailyRestriction', until=1)
+
+
+def test_change_log_keeps_batches_written_after_compacting(crud):
+    crud.log = ChangesLog(crud.conn_str, crud._pool)
+    crud.create('DailyRestriction', [(1, 1, 1)])
+    crud.create('DailyRestriction', [(2, 1, 1)])
+    crud.log.snapshot('DailyRestriction')
+    assert crud.log.compact() == 2
+    crud.create('DailyRestriction', [(3, 1, 1)])
+    assert crud.log.history()['change_id'].tolist() == [3]
+    key = ['date_id', 'restriction_id', 'in_place']
+    pd.testing.assert_frame_equal(
+        crud.log.replay('DailyRestriction').sort_values(key, ignore_index=True),
+        crud.get_table('DailyRestriction').sort_values(key, ignore_index=True),
+        check_dtype=False)
+
+
+def test_change_log_replays_a_table_without_snapshot_from_empty(crud):
+    crud.log = ChangesLog(crud.conn_str, crud._pool)
+    crud.create('DailyRestriction', [(1, 1, 1), (2, 1, 0)])
+    crud.delete('DailyRestriction', [(2, 1)])
+    replayed = crud.log.replay('DailyRestriction')
+    assert replayed.values.tolist() == [[1, 1, 1]]
+    assert crud.log.compact('DailyRestriction') == 2
+    assert len(crud.log.replay('DailyRestriction')) == len(crud.daily)
+
+
+def test_change_log_sees_ids_written_earlier_in_the_transaction(crud):
+    crud.log = ChangesLog(crud.conn_str)
+    with crud._pool.transaction():
+        crud.create('Date', [("2030-01-01", 9000)])
+        assert crud.create('DailyRestriction', [(9000, 1, 1)]) == 1
+    assert crud.log.history('DailyRestriction')['record_count'].tolist() == [1]
+    crud.log.close()
+
+
+def test_failed_batch_leaves_nothing_in_a_caught_outer_transaction(crud):
+    crud.log = ChangesLog(crud.conn_str, crud._pool)
+    crud.get_db().execute("CREATE TRIGGER reject_3 BEFORE INSERT ON DailyRestriction "
+                          "WHEN new.date_id = 3 BEGIN SELECT RAISE(ABORT, 'rejected'); END;")
+    with crud._pool.transaction():
+        with pytest.raises(sqlite3.IntegrityError, match="rejected"):
+            crud.create('DailyRestriction', [(1, 1, 1), (2, 1, 1), (3, 1, 1)])
+    assert len(crud.get_table('DailyRestriction')) == 14160
+    assert crud.log.history().empty
+
+
+def test_change_log_rejects_invalid_batches(crud):
+    crud.log = ChangesLog(crud.conn_str, crud._pool)
+    batch = pd.DataFrame({'date_id': [1, 99999], 'restriction_id': [1, 1], 'in_place': [1, 1]})
+    assert crud.log.is_valid('DailyRestriction', batch).tolist() == [True, False]
+    assert crud.log.is_valid('DailyRestriction', batch,
+                             {'date_id': lambda col: col < 10}).tolist() == [True, False]
+    with pytest.raises(ValueError, match="positions \\[1\\]"):
+        crud.create('DailyRestriction', batch)
+    assert crud.log.history().empty
+    assert len(crud.get_table('DailyRestriction')) == 14160
+
+
+def test_cache_is_read_through_and_write_through(crud):
+    daily = crud.daily
+    assert (crud.hits, crud.misses) == (0, 1) and daily['in_place'].dtype == 'int8'
+    crud.create('DailyRestriction', [(9000, 1, 1), (9000, 2, 0)])
+    crud.update('DailyRestriction', [(9000, 2, 1)])
+    crud.delete('DailyRestriction', [(1, 1)])
+    crud.create('Restriction', [("curfew", 10)])
+    cached = crud.daily.sort_values(['date_id', 'restriction_id', 'in_place'], ignore_index=True)
+    assert (crud.hits, crud.misses) == (1, 1)
+    crud.invalidate()
+    fresh = crud.daily.sort_values(['date_id', 'restriction_id', 'in_place'], ignore_index=True)
+    pd.testing.assert_frame_equal(cached, fresh)
+    assert crud.get_table('Restriction')['restriction'].dtype == 'category'
+    with crud._pool.transaction():
+        crud.update('Restriction', [(10, "night curfew")])
+    assert 'Restriction' not in crud.cached_tables()
+    assert "night curfew" in crud.get_table('Restriction')['restriction'].tolist()
+
+
+def test_cache_never_keeps_rows_of_a_rolled_back_transaction(crud):
+    with pytest.raises(RuntimeError):
+        with crud._pool.transaction():
+            crud.create('Restriction', [("zzz", 999)])
+            assert len(crud.get_table('Restriction')) == 11
+            raise RuntimeError
+    assert 'Restriction' not in crud.cached_tables()
+    assert len(crud.get_table('Restriction')) == 10
+
+
+def test_changes_lists_the_logged_batches(crud):
+    assert crud.changes.empty
+    crud.log = ChangesLog(crud.conn_str, crud._pool)
+    crud.create('DailyRestriction', [(1, 1, 1)])
+    crud.delete('DailyRestriction', [(1, 1)])
+    assert crud.changes['operation'].tolist() == ['create', 'delete']
+
+
+def test_cache_evicts_least_recently_used_tables(crud):
+    crud.get_table('Date')
+    crud.max_bytes = crud.cache_size() + 2000
+    crud.get_table('Source')
+    crud.get_table('Restriction')
+    crud.get_table('Source')
+    assert crud.cached_tables() == ['Restriction', 'Source']
+    assert crud.cache_size() <= crud.max_bytes
+    crud.max_bytes = 0
+    assert len(crud.daily) == 14160 and crud.cached_tables() == []
+
+
+@pytest.fixture
+def diagrams():
+    """Diagrams over 1000 days of two regions, with a spike on day 500 in the north."""
+    days = (np.datetime64('2020-01-01') + np.arange(1000)).astype(str)
+    frames = []
+    for region in ("north", "south"):
+        flags = np.zeros((1000, 3), dtype=np.uint8)
+        flags[100:300, 0] = 1
+        if region == "north":
+            flags[500, :] = 1
+        frame = pd.DataFrame(flags, columns=['a', 'b', 'c'])
+        frame.insert(0, 'date', days)
+        frames.append(frame.assign(region=region))
+    summary = pd.DataFrame({'date': days[::5], 'restriction': [f"event {i}" for i in range(200)]})
+    return Diagrams(pd.concat(frames), pd.DataFrame(), summary, region_col='region')
+
+
+def test_timeline_is_downsampled_to_the_width(diagrams):
+    for method in Diagrams.METHODS:
+        response = diagrams.plot_lockdown_timeline(width=40, method=method)
+        assert len(response['x']) <= 40 and response['level'] > 0
+        assert max(response['y']) == 3 and min(response['y']) == 0
+        assert response['x'] == sorted(response['x'])
+    south = diagrams.plot_lockdown_timeline(width=40, region="south")
+    assert max(south['y']) == 1
+    zoomed = diagrams.plot_lockdown_timeline('2020-05-01', '2020-05-20', width=40)
+    assert zoomed['level'] == 0 and len(zoomed['x']) == 20 and zoomed['x'][0] == '2020-05-01'
+
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    y = np.zeros(1000)
+    y[321] = 5
+    kept = Diagrams.lttb(np.arange(1000), y, 10)
+    assert len(kept) == 10 and kept[0] == 0 and kept[-1] == 999 and 321 in kept
+
+
+def test_bar_graph_events_and_links(diagrams):
+    assert diagrams.plot_bar_graph(region="south")['values'] == [200, 0, 0]
+    assert diagrams.plot_bar_graph('2020-04-10', '2020-04-19')['values'] == [20, 0, 0]
+    events = diagrams._goto_page("/charts/restriction_timeline?start=2020-01-01&end=2020-01-31")
+    assert [event['date'] for event in events['events']][:2] == ['2020-01-01', '2020-01-06']
+    buckets = diagrams.restriction_timeline(width=10, max_events=50)['buckets']
+    assert len(buckets) == 10 and sum(bucket['count'] for bucket in buckets) == 200
+    response = diagrams._goto_page("/charts/lockdown_timeline?width=20&method=lttb")
+    assert 0 < len(response['x']) <= 20
+    with pytest.raises(ValueError):
+        diagrams._goto_page("/charts/map")
+    with pytest.raises(ValueError, match="Unknown parameters"):
+        diagrams._goto_page("/charts/bar_graph?width=20")
+    with pytest.raises(ValueError, match="width must be int"):
+        diagrams._goto_page("/charts/lockdown_timeline?width=wide")
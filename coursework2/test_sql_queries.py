@@ -0,0 +1,105 @@
+"""
+Tests for the parameterized query API of Queries.
+"""
+import sqlite3
+import pytest
+import os
+from coursework2.sql_queries import Queries, iter_statements
+
+
+@pytest.fixture
+def queries(tmp_path):
+    """Queries on a small Date table."""
+    db_path = str(tmp_path / "covid.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE Date (date_id INTEGER PRIMARY KEY, date TEXT);")
+        conn.executemany("INSERT INTO Date VALUES (?, ?);",
+                         [(i, f"2020-01-{i + 1:02d}") for i in range(10)])
+    txt_file = tmp_path / "queries.txt"
+    txt_file.write_text("SELECT * FROM Date;\n")
+    res = Queries(db_path, str(txt_file), cached_statements=16)
+    yield res
+    res.close()
+
+
+def test_parameters_are_bound_not_interpolated(queries):
+    rows = queries.select_query("SELECT date FROM Date WHERE date_id = ?;", (3,))
+    assert rows == [("2020-01-04",)]
+    injected = "2020-01-01' OR '1'='1"
+    assert queries.execute("SELECT * FROM Date WHERE date = ?;", (injected,)) == []
+
+
+def test_execute_many_and_named_parameters(queries):
+    assert queries.execute_many("INSERT INTO Date VALUES (?, ?);", [(10, "a"), (11, "b")]) == 2
+    assert queries.execute("SELECT date FROM Date WHERE date_id = :id;", {"id": 11}) == [("b",)]
+
+
+def test_del_query_returns_deleted_rows(queries):
+    deleted = queries.del_query("DELETE FROM Date WHERE date_id >= ?;", (8,))
+    assert deleted == [(8, "2020-01-09"), (9, "2020-01-10")]
+    assert queries.execute("SELECT COUNT(*) FROM Date;") == [(8,)]
+
+
+def test_identifiers_are_validated():
+    assert Queries.quote_identifier("Date") == '"Date"'
+    with pytest.raises(ValueError):
+        Queries.quote_identifier("Date; DROP TABLE Date")
+
+
+def test_statements_split_on_semicolons_outside_strings_and_comments():
+    script = [
+        "-- name: first\n",
+        "SELECT 'a;b', \"c;d\" FROM t; SELECT 2; /* skip; this */\n",
+        "SELECT 3 -- trailing; comment\n",
+        "FROM [x;y];\n",
+    ]
+    statements = list(iter_statements(script))
+    assert [name for name, _ in statements] == ["first", None, None]
+    assert statements[0][1] == "SELECT 'a;b', \"c;d\" FROM t;"
+    assert statements[1][1] == "SELECT 2;"
+    assert statements[2][1].endswith("FROM [x;y];")
+    assert all(sqlite3.complete_statement(sql) for _, sql in statements)
+
+
+def test_trigger_body_is_one_statement():
+    script = ("CREATE TRIGGER t AFTER INSERT ON Date BEGIN\n"
+              "  UPDATE Date SET date = 'x;' WHERE date_id = new.date_id;\n"
+              "  DELETE FROM Date WHERE date_id < 0;\n"
+              "END;\nSELECT 1;\n")
+    statements = [sql for _, sql in iter_statements(script.splitlines(keepends=True))]
+    assert len(statements) == 2
+    assert statements[0].endswith("END;")
+
+
+def test_named_queries_are_reloaded_when_the_file_changes(queries, tmp_path):
+    txt_file = tmp_path / "queries.txt"
+    assert queries.queries == ["SELECT * FROM Date;"]
+    txt_file.write_text("-- name: count\nSELECT COUNT(*) FROM Date;\n"
+                        "-- name: first\nSELECT date FROM Date WHERE date_id = 0;\n")
+    stat = os.stat(txt_file)
+    os.utime(txt_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert queries.execute(queries.query("count")) == [(10,)]
+    assert queries.select_query(queries.query("first")) == [("2020-01-01",)]
+    assert Queries.get_queries(str(txt_file))[1] == queries.query("first")
+    with pytest.raises(KeyError):
+        queries.query("missing")
+
+
+def test_delete_returns_rows_in_batches(queries):
+    deleted = queries.delete("Date", "date_id % 2 = ?", (0,), batch_size=2)
+    assert sorted(deleted) == [(i, f"2020-01-{i + 1:02d}") for i in range(0, 10, 2)]
+    assert queries.execute("SELECT COUNT(*) FROM Date;") == [(5,)]
+    assert queries.delete("Date", "date_id > :id", {"id": 100}) == []
+    assert len(queries.delete("Date")) == 5
+
+
+def test_delete_rolls_back_every_batch_on_error(queries):
+    # the third batch fails, after two batches have already deleted their rows
+    queries.execute("CREATE TRIGGER keep_7 BEFORE DELETE ON Date WHEN old.date_id = 7 "
+                    "BEGIN SELECT RAISE(ABORT, 'date 7 is kept'); END;")
+    with pytest.raises(sqlite3.IntegrityError, match="date 7 is kept"):
+        queries.delete("Date", batch_size=3)
+    assert queries.execute("SELECT COUNT(*) FROM Date;") == [(10,)]
+    with pytest.raises(ValueError):
+        queries.delete("Date; DROP TABLE Date", "1")
+    assert queries.execute("SELECT COUNT(*) FROM Date;") == [(10,)]